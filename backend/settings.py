@@ -228,6 +228,7 @@ from pathlib import Path
 from logging.handlers import RotatingFileHandler
 from datetime import timedelta
 from decouple import config, Csv
+from celery.schedules import crontab
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -355,6 +356,119 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Cache: Redis when CACHE_REDIS_URL is set (shared by every worker), per-process memory otherwise
+CACHE_REDIS_URL = config('CACHE_REDIS_URL', default='')
+CACHES = {
+    'default': (
+        {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': CACHE_REDIS_URL}
+        if CACHE_REDIS_URL else
+        {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+    ),
+}
+
+# Embedding Snapshot (memory-mapped by every web/Celery worker on the node)
+EMBEDDING_SNAPSHOT_DIR = config('EMBEDDING_SNAPSHOT_DIR', default=str(BASE_DIR / 'snapshots' / 'embeddings'))
+EMBEDDING_SNAPSHOT_CHECK_SECONDS = config('EMBEDDING_SNAPSHOT_CHECK_SECONDS', default=5, cast=int)
+EMBEDDING_SNAPSHOT_REBUILD_SECONDS = config('EMBEDDING_SNAPSHOT_REBUILD_SECONDS', default=60, cast=int)  # debounce after feature writes
+
+# In-process track vector indexes reload when another process bumps the shared version
+TRACK_INDEX_CHECK_SECONDS = config('TRACK_INDEX_CHECK_SECONDS', default=5, cast=int)
+
+# Audio analysis profile for feature extraction; bump FEATURE_EXTRACTOR_VERSION
+# (music/utils/feature_extraction.py) when changing it so backfills re-run
+FEATURE_ANALYSIS_PROFILE = {
+    'sample_rate': 22050,     # resample target in Hz (None = native rate)
+    'max_duration': 120.0,    # seconds analysed per track (None = whole file)
+    'segment_count': 1,       # >1 splits max_duration into segments around demo_start_time
+    'segment_spacing': None,  # seconds between segment centres (None = 2x segment length)
+}
+
+# Fitted per-feature scaling applied when TrackFeature embeddings are written
+FEATURE_SCALER_DIR = config('FEATURE_SCALER_DIR', default=str(BASE_DIR / 'artifacts' / 'feature_scaler'))
+
+# Similar-track search: 'ivf' (approximate, index built with each embedding snapshot) or 'exact';
+# raise NPROBE for recall, lower for latency
+TRACK_ANN_BACKEND = config('TRACK_ANN_BACKEND', default='ivf')
+TRACK_ANN_NPROBE = config('TRACK_ANN_NPROBE', default=8, cast=int)
+
+# Batch interaction ingestion (POST /api/v1/interactions/batch/)
+INTERACTION_BATCH_MAX_EVENTS = config('INTERACTION_BATCH_MAX_EVENTS', default=5000, cast=int)
+INTERACTION_BATCH_CHUNK_SIZE = config('INTERACTION_BATCH_CHUNK_SIZE', default=500, cast=int)
+
+# Write-behind buffer for listening history (Redis list drained by Celery beat)
+LISTEN_BUFFER_ENABLED = config('LISTEN_BUFFER_ENABLED', default=True, cast=bool)
+LISTEN_BUFFER_REDIS_URL = config('LISTEN_BUFFER_REDIS_URL', default=CELERY_BROKER_URL)
+LISTEN_BUFFER_MAX_EVENTS = config('LISTEN_BUFFER_MAX_EVENTS', default=200000, cast=int)  # full buffer -> 503 + Retry-After
+LISTEN_BUFFER_DRAIN_BATCH = config('LISTEN_BUFFER_DRAIN_BATCH', default=2000, cast=int)
+LISTEN_BUFFER_DRAIN_SECONDS = config('LISTEN_BUFFER_DRAIN_SECONDS', default=5, cast=int)
+LISTEN_BUFFER_LOCK_SECONDS = config('LISTEN_BUFFER_LOCK_SECONDS', default=60, cast=int)
+
+# Track counters: increments spread over this many rows per track; reads cached briefly
+TRACK_COUNTER_SHARDS = config('TRACK_COUNTER_SHARDS', default=8, cast=int)
+TRACK_COUNTER_CACHE_SECONDS = config('TRACK_COUNTER_CACHE_SECONDS', default=5, cast=int)
+
+# Public most_liked playlist: top tracks by likes, each like halving in weight every HALF_LIFE days
+MOST_LIKED_PLAYLIST_SIZE = config('MOST_LIKED_PLAYLIST_SIZE', default=50, cast=int)
+MOST_LIKED_WINDOW_DAYS = config('MOST_LIKED_WINDOW_DAYS', default=30, cast=int)
+MOST_LIKED_HALF_LIFE_DAYS = config('MOST_LIKED_HALF_LIFE_DAYS', default=7, cast=float)
+MOST_LIKED_REFRESH_SECONDS = config('MOST_LIKED_REFRESH_SECONDS', default=3600, cast=int)
+
+# Trending: exponentially decayed per-track event scores
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=24.0, cast=float)
+TRENDING_EPOCH_DAYS = config('TRENDING_EPOCH_DAYS', default=7, cast=int)  # how often stored scores are rebased
+TRENDING_WEIGHTS = {'stream': 1.0, 'listen': 1.0, 'comment': 2.0, 'like': 3.0}
+TRENDING_SNAPSHOT_SECONDS = config('TRENDING_SNAPSHOT_SECONDS', default=30, cast=int)
+TRENDING_SNAPSHOT_SIZE = config('TRENDING_SNAPSHOT_SIZE', default=500, cast=int)
+
+# Item-item collaborative filtering (neighbour table rebuilt offline, memory-mapped at serve time)
+ITEM_CF_DIR = config('ITEM_CF_DIR', default=str(BASE_DIR / 'artifacts' / 'item_cf'))
+ITEM_CF_NEIGHBOURS = config('ITEM_CF_NEIGHBOURS', default=50, cast=int)  # top-K kept per track
+ITEM_CF_WEIGHTS = {'stream': 1.0, 'listen': 1.0, 'comment': 2.0, 'like': 4.0}
+ITEM_CF_HISTORY_LIMIT = config('ITEM_CF_HISTORY_LIMIT', default=500, cast=int)  # recent events read per user
+ITEM_CF_CHECK_SECONDS = config('ITEM_CF_CHECK_SECONDS', default=30, cast=int)  # how often workers re-read CURRENT
+
+# Implicit-feedback matrix factorization (ALS), trained offline from the same weighted matrix as ITEM_CF
+MF_DIR = config('MF_DIR', default=str(BASE_DIR / 'artifacts' / 'implicit_mf'))
+MF_FACTORS = config('MF_FACTORS', default=32, cast=int)
+MF_REGULARIZATION = config('MF_REGULARIZATION', default=0.1, cast=float)
+MF_ALPHA = config('MF_ALPHA', default=20.0, cast=float)  # confidence = 1 + alpha * strength
+MF_ITERATIONS = config('MF_ITERATIONS', default=15, cast=int)
+MF_CHECK_SECONDS = config('MF_CHECK_SECONDS', default=30, cast=int)  # how often workers re-read CURRENT
+
+# Hybrid ranking: per-source weights (0 disables a source), candidates per source, per-user latency budget
+HYBRID_WEIGHTS = {'content': 1.0, 'collaborative': 1.0, 'factors': 0.5, 'trending': 0.3}
+HYBRID_CANDIDATES = config('HYBRID_CANDIDATES', default=200, cast=int)
+HYBRID_TOP_K = config('HYBRID_TOP_K', default=20, cast=int)
+HYBRID_LATENCY_BUDGET_MS = config('HYBRID_LATENCY_BUDGET_MS', default=50.0, cast=float)
+
+# Served recommendations: shared cache entry per user, fronted by a per-process LRU
+RECOMMENDATION_CACHE_SECONDS = config('RECOMMENDATION_CACHE_SECONDS', default=86400, cast=int)
+RECOMMENDATION_LRU_SIZE = config('RECOMMENDATION_LRU_SIZE', default=10000, cast=int)
+RECOMMENDATION_LRU_SECONDS = config('RECOMMENDATION_LRU_SECONDS', default=30, cast=int)  # staleness bound across processes
+
+# Nightly full recommendation run: users split into this many id-range shards, one Celery task each
+RECOMMENDATION_SHARDS = config('RECOMMENDATION_SHARDS', default=8, cast=int)
+RECOMMENDATION_NIGHTLY_HOUR = config('RECOMMENDATION_NIGHTLY_HOUR', default=3, cast=int)
+
+# Incremental refresh after a like: one recompute per user per debounce window
+LIKE_REFRESH_DEBOUNCE_SECONDS = config('LIKE_REFRESH_DEBOUNCE_SECONDS', default=10, cast=int)
+
+# Periodic tasks (synced into django_celery_beat's database scheduler)
+CELERY_BEAT_SCHEDULE = {
+    'drain-listen-buffer': {
+        'task': 'music.tasks.drain_listen_buffer_task',
+        'schedule': LISTEN_BUFFER_DRAIN_SECONDS,
+    },
+    'rebuild-most-liked-playlist': {
+        'task': 'playlists.tasks.rebuild_most_liked_playlist_task',
+        'schedule': MOST_LIKED_REFRESH_SECONDS,
+    },
+    'nightly-recommendations': {
+        'task': 'music.tasks.generate_recommendations_task',
+        'schedule': crontab(hour=RECOMMENDATION_NIGHTLY_HOUR, minute=0),
+    },
+}
+
 # CORS
 CORS_ALLOW_ALL_ORIGINS = True
 
@@ -20,6 +20,7 @@ from music.views import (
     TrackStatisticsViewSet,
     MyTracksView,
     TracksByArtistView,
+    TrendingTracksView,
 )
 
 # Playlist Views
@@ -29,6 +30,7 @@ from playlists.views import (
     RecommendationViewSet,
     UserRecommendationView,
     RecommendedTracksView,
+    HybridRecommendationView,
 )
 
 # Subscription Views
@@ -91,10 +93,12 @@ urlpatterns = [
     # Custom music views
     path('api/v1/my-tracks/', MyTracksView.as_view(), name='my-tracks'),
     path('api/v1/moderate/artist/<int:artist_id>/tracks/', TracksByArtistView.as_view(), name='artist-tracks-moderator'),
+    path('api/v1/trending/', TrendingTracksView.as_view(), name='trending-tracks'),
 
     # User personalized recommendations
     path('api/v1/user-recommendations/', UserRecommendationView.as_view(), name='user-recommendations'),
     path('api/v1/recommended-tracks/', RecommendedTracksView.as_view(), name='recommended-tracks'),
+    path('api/v1/hybrid-recommendations/', HybridRecommendationView.as_view(), name='hybrid-recommendations'),
 
     # Swagger & Redoc
     re_path(r'^swagger/$', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
@@ -1,9 +1,10 @@
 # music/admin.py
-from music.tasks import extract_features_task
+from music.tasks import extract_features_task, generate_recommendations_task
 from django.contrib import admin
-from .models import Track, TrackFeature, Interaction, ListeningHistory, TrackStatistics
+from django.db.models import F, Max, Sum
+from django.db.models.functions import Coalesce, Greatest
+from .models import Track, TrackFeature, Interaction, ListeningHistory, TrackStatistics, FeatureCacheEntry
 from celery import shared_task
-import subprocess
 
 # ✅ Track Admin
 @admin.register(Track)
@@ -64,17 +65,49 @@ class ListeningHistoryAdmin(admin.ModelAdmin):
 # ✅ Track Statistics Admin
 @admin.register(TrackStatistics)
 class TrackStatisticsAdmin(admin.ModelAdmin):
-    list_display = ['track', 'plays_count', 'likes_count', 'comments_count', 'updated_at']
+    list_display = ['track', 'plays', 'likes', 'comments', 'last_counted']
     list_filter = ['updated_at']
     search_fields = ['track__title']
-    ordering = ['-updated_at']
+
+    def get_ordering(self, request):
+        return ['-last_counted']  # An annotation, so not declarable as `ordering`
+
+    def get_queryset(self, request):
+        # Counters live partly in TrackStatisticsShard rows: total them in the list query
+        shards = 'track__statistics_shards__'
+        return self.model._default_manager.annotate(
+            plays_total=F('plays_count') + Coalesce(Sum(f'{shards}plays_count'), 0),
+            likes_total=F('likes_count') + Coalesce(Sum(f'{shards}likes_count'), 0),
+            comments_total=F('comments_count') + Coalesce(Sum(f'{shards}comments_count'), 0),
+            last_counted=Greatest('updated_at', Coalesce(Max(f'{shards}updated_at'), 'updated_at')),
+        )
+
+    @admin.display(description='Plays', ordering='plays_total')
+    def plays(self, obj):
+        return obj.plays_total
+
+    @admin.display(description='Likes', ordering='likes_total')
+    def likes(self, obj):
+        return obj.likes_total
+
+    @admin.display(description='Comments', ordering='comments_total')
+    def comments(self, obj):
+        return obj.comments_total
+
+    @admin.display(description='Updated at', ordering='last_counted')
+    def last_counted(self, obj):
+        return obj.last_counted
+
+# ✅ Feature Cache Admin
+@admin.register(FeatureCacheEntry)
+class FeatureCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ['content_hash', 'extractor_version', 'created_at']
+    list_filter = ['extractor_version']
+    search_fields = ['content_hash']
+    ordering = ['-created_at']
 
 # ✅ Celery Task for Regenerating Recommendations
 @shared_task
 def regenerate_recommendations_task():
-    """Call the management command to regenerate all user recommendations."""
-    try:
-        subprocess.run(["python", "manage.py", "generate_recommendations"], check=True)
-        return "Successfully regenerated recommendations."
-    except subprocess.CalledProcessError as e:
-        return f"Error regenerating recommendations: {e}"
+    """Kept for schedules that still name it: dispatches the in-process fan-out."""
+    return generate_recommendations_task()
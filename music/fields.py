@@ -0,0 +1,79 @@
+# music/fields.py
+
+import json
+import numpy as np
+from django.db import models
+
+# Packed vectors start with this header. JSON text can never begin with a NUL
+# byte, so rows written by the old JSONField are told apart unambiguously.
+VECTOR_HEADER = b'\x00f32'
+VECTOR_DTYPE = np.dtype('<f4')
+
+
+def pack_vector(vector):
+    """
+    Packs a sequence of floats into header + little-endian float32 bytes.
+    """
+    return VECTOR_HEADER + np.asarray(vector, dtype=VECTOR_DTYPE).ravel().tobytes()
+
+
+def vector_payload(raw):
+    """
+    Returns the packed float32 payload for a raw column value.
+
+    Accepts packed bytes, memoryview, and legacy JSON text (str or bytes)
+    left behind by the old JSONField column. Returns None for empty values.
+    """
+    if raw is None:
+        return None
+    if isinstance(raw, memoryview):
+        raw = raw.tobytes()
+    if isinstance(raw, str):
+        raw = raw.encode('utf-8')
+    if raw.startswith(VECTOR_HEADER):
+        return raw[len(VECTOR_HEADER):] or None
+
+    # Legacy JSON row
+    values = json.loads(raw)
+    if not values:
+        return None
+    return np.asarray(values, dtype=VECTOR_DTYPE).tobytes()
+
+
+def unpack_vector(raw):
+    """
+    Decodes a raw column value into a list of floats (or None).
+    """
+    payload = vector_payload(raw)
+    if payload is None:
+        return None
+    return np.frombuffer(payload, dtype=VECTOR_DTYPE).tolist()
+
+
+class Float32VectorField(models.BinaryField):
+    """
+    Stores a fixed-length float vector as packed float32 bytes.
+
+    Python-side the value is a plain list of floats, same as the JSONField it
+    replaces. Bulk readers should skip the per-row decode and go through
+    music.utils.recommendations.load_embedding_matrix instead.
+    """
+    description = "Packed float32 vector"
+
+    def from_db_value(self, value, expression, connection):
+        return unpack_vector(value)
+
+    def to_python(self, value):
+        if value is None or isinstance(value, list):
+            return value
+        return unpack_vector(value)
+
+    def get_prep_value(self, value):
+        if value is None:
+            return None
+        if isinstance(value, (bytes, memoryview)):
+            return bytes(value)
+        return pack_vector(value)
+
+    def value_to_string(self, obj):
+        return json.dumps(self.value_from_object(obj))
@@ -0,0 +1,68 @@
+# music/management/commands/backfill_features.py
+
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from music.utils.batch_extraction import Checkpoint, run_backfill, tracks_needing_features
+from music.utils.feature_extraction import FEATURE_EXTRACTOR_VERSION
+
+class Command(BaseCommand):
+    help = "Extract audio features in parallel for tracks with missing or stale TrackFeature rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Extraction processes')
+        parser.add_argument('--batch-size', type=int, default=100, help='Tracks per bulk write')
+        parser.add_argument('--limit', type=int, default=None, help='Only process this many tracks')
+        parser.add_argument('--force', action='store_true', help='Re-extract every approved track')
+        parser.add_argument(
+            '--checkpoint',
+            default=str(settings.BASE_DIR / 'logs' / 'backfill_features.checkpoint.json'),
+            help='Checkpoint file used to resume an interrupted run',
+        )
+        parser.add_argument('--retry-failed', action='store_true', help='Retry tracks that failed in earlier runs')
+
+    def handle(self, *args, **kwargs):
+        checkpoint = Checkpoint(kwargs['checkpoint'])
+        if kwargs['retry_failed']:
+            checkpoint.failed.clear()
+        skip = checkpoint.done | checkpoint.failed
+
+        storage = None
+        jobs = []
+        for track in tracks_needing_features(force=kwargs['force']).only('id', 'audio_file', 'duration', 'demo_start_time').iterator():
+            if track.id in skip:
+                continue
+            storage = storage or track.audio_file.storage
+            jobs.append((track.id, storage.path(track.audio_file.name), track.duration, track.demo_start_time))
+            if kwargs['limit'] and len(jobs) >= kwargs['limit']:
+                break
+
+        if not jobs:
+            self.stdout.write(self.style.WARNING('No tracks need feature extraction.'))
+            return
+
+        self.stdout.write(
+            f'Extracting features (v{FEATURE_EXTRACTOR_VERSION}) for {len(jobs)} tracks '
+            f'on {kwargs["workers"]} workers...'
+        )
+
+        def report(stats):
+            self.stdout.write(
+                f"  {stats['done']} done, {stats['failed']} failed, "
+                f"cache {stats['cache_hits']} hits / {stats['cache_misses']} misses | "
+                f"{stats['tracks_per_sec']:.2f} tracks/s, {stats['audio_seconds_per_sec']:.1f} audio-s/s"
+            )
+
+        stats = run_backfill(
+            jobs,
+            workers=max(1, kwargs['workers']),
+            batch_size=max(1, kwargs['batch_size']),
+            checkpoint=checkpoint,
+            on_batch=report,
+        )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Backfill finished: {stats['done']} extracted, {stats['failed']} failed in {stats['elapsed']:.1f}s, "
+            f"cache {stats['cache_hits']} hits / {stats['cache_misses']} misses "
+            f"({stats['tracks_per_sec']:.2f} tracks/s, {stats['audio_seconds_per_sec']:.1f} audio-s/s)."
+        ))
@@ -0,0 +1,79 @@
+# music/management/commands/backfill_trending.py
+
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from music.models import Interaction, ListeningHistory, TrackTrend
+from music.utils.keyset import keyset_rows
+from music.utils.trending import SNAPSHOT_HALF_LIVES, current_epoch, forward_weight, half_life_seconds, trending_snapshot
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild every TrackTrend score by replaying Interaction and ListeningHistory. "
+        "Events recorded while it runs are overwritten, so run it during quiet hours."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows fetched per round trip')
+        parser.add_argument(
+            '--hours', type=float, default=None,
+            help=f'How far back to replay (default: {SNAPSHOT_HALF_LIVES} half-lives)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk_create')
+
+    def handle(self, *args, **kwargs):
+        started = time.perf_counter()
+        now = timezone.now()
+        epoch = current_epoch(now)
+        hours = kwargs['hours'] or half_life_seconds() * SNAPSHOT_HALF_LIVES / 3600
+        since = now - timedelta(hours=hours)
+        weights = settings.TRENDING_WEIGHTS
+        chunk_size = max(1, kwargs['chunk_size'])
+
+        scores = defaultdict(float)
+        latest = {}
+        replayed = 0
+
+        def replay(rows):
+            nonlocal replayed
+            for track_id, kind, at in rows:
+                weight = weights.get(kind)
+                if weight:
+                    scores[track_id] += forward_weight(weight, at, epoch)
+                    latest[track_id] = max(at, latest.get(track_id, at))
+                replayed += 1
+                if replayed % (chunk_size * 20) == 0:
+                    self.stdout.write(f'  replayed {replayed} events...')
+
+        # ✅ Read both tables in keyset chunks, never the whole history in memory
+        replay(keyset_rows(
+            Interaction.objects.filter(created_at__gte=since), ['track_id', 'interaction_type', 'created_at'], chunk_size,
+        ))
+        replay(
+            (track_id, 'listen', listened_at)
+            for track_id, listened_at in keyset_rows(
+                ListeningHistory.objects.filter(listened_at__gte=since), ['track_id', 'listened_at'], chunk_size,
+            )
+        )
+
+        with transaction.atomic():
+            TrackTrend.objects.all().delete()
+            TrackTrend.objects.bulk_create(
+                [
+                    TrackTrend(track_id=track_id, score=score, epoch=epoch, updated_at=latest[track_id])
+                    for track_id, score in scores.items()
+                ],
+                batch_size=max(1, kwargs['batch_size']),
+            )
+        trending_snapshot.invalidate()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Replayed {replayed} events from the last {hours:.0f}h into {len(scores)} trending scores '
+            f'in {elapsed:.1f}s.'
+        ))
@@ -0,0 +1,69 @@
+# music/management/commands/benchmark_ann.py
+
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from music.utils.ann import ExactIndex, IVFIndex
+
+class Command(BaseCommand):
+    help = "Benchmark approximate vs exact similar-track search on synthetic embeddings."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10000,100000,1000000', help='Comma-separated catalog sizes')
+        parser.add_argument('--dim', type=int, default=9, help='Embedding dimension')
+        parser.add_argument('--queries', type=int, default=200, help='Queries per size')
+        parser.add_argument('--k', type=int, default=10, help='Neighbours per query')
+        parser.add_argument('--nprobe', default='1,4,8,16,32', help='Comma-separated nprobe values to try')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **kwargs):
+        rng = np.random.default_rng(kwargs['seed'])
+        k = kwargs['k']
+        nprobes = [int(n) for n in kwargs['nprobe'].split(',')]
+
+        for size in (int(s) for s in kwargs['sizes'].split(',')):
+            vectors = self.synthetic_embeddings(rng, size, kwargs['dim'])
+            queries = rng.choice(size, min(kwargs['queries'], size), replace=False)
+
+            exact = ExactIndex(vectors)
+            truth, exact_latencies = self.run(exact, vectors, queries, k)
+
+            started = time.perf_counter()
+            ivf = IVFIndex(vectors)
+            build_seconds = time.perf_counter() - started
+
+            self.stdout.write(self.style.SUCCESS(
+                f'\n{size:,} tracks (dim={vectors.shape[1]}, k={k}, {len(queries)} queries, '
+                f'{ivf.n_lists} lists, IVF build {build_seconds:.2f}s)'
+            ))
+            self.stdout.write(f"  {'engine':<16}{'recall@k':>10}{'p50 ms':>10}{'p99 ms':>10}")
+            self.report('exact', 1.0, exact_latencies)
+
+            for nprobe in nprobes:
+                results, latencies = self.run(ivf, vectors, queries, k, nprobe=nprobe)
+                recall = np.mean([
+                    len(set(found) & set(expected)) / max(len(expected), 1)
+                    for found, expected in zip(results, truth)
+                ])
+                self.report(f'ivf nprobe={nprobe}', recall, latencies)
+
+    def synthetic_embeddings(self, rng, size, dim):
+        # Clustered, non-negative vectors resemble real audio features better than pure noise
+        centers = rng.random((64, dim), dtype=np.float32)
+        labels = rng.integers(0, len(centers), size)
+        return np.abs(centers[labels] + rng.normal(0, 0.08, (size, dim)).astype(np.float32))
+
+    def run(self, index, vectors, queries, k, **options):
+        results = []
+        latencies = []
+        for position in queries:
+            started = time.perf_counter()
+            found, _ = index.search(vectors[position], k=k, exclude=[position], **options)
+            latencies.append(time.perf_counter() - started)
+            results.append(found.tolist())
+        return results, np.array(latencies) * 1000
+
+    def report(self, name, recall, latencies):
+        self.stdout.write(
+            f'  {name:<16}{recall:>10.3f}{np.percentile(latencies, 50):>10.3f}{np.percentile(latencies, 99):>10.3f}'
+        )
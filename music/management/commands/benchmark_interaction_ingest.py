@@ -0,0 +1,82 @@
+# music/management/commands/benchmark_interaction_ingest.py
+
+import json
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+from music.models import Track
+from music.views import InteractionViewSet
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Compare single-event interaction POSTs with the batch ingestion endpoint. Nothing is kept."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--events', type=int, default=2000, help='Events sent through each path')
+        parser.add_argument('--batch-size', type=int, default=500, help='Events per batch request')
+        parser.add_argument('--ndjson', action='store_true', help='Send batches as NDJSON instead of a JSON array')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **kwargs):
+        user = get_user_model().objects.order_by('id').first()
+        track_ids = list(Track.objects.values_list('id', flat=True)[:1000])
+        if user is None or not track_ids:
+            self.stdout.write(self.style.WARNING('Need at least one user and one track to benchmark.'))
+            return
+
+        rng = random.Random(kwargs['seed'])
+        events = [
+            {'track': rng.choice(track_ids), 'interaction_type': rng.choice(['like', 'stream', 'stream', 'stream'])}
+            for _ in range(kwargs['events'])
+        ]
+        factory = APIRequestFactory()
+
+        def single():
+            view = InteractionViewSet.as_view({'post': 'create'})
+            for event in events:
+                request = factory.post('/api/v1/interactions/', {**event, 'user': user.id}, format='json')
+                force_authenticate(request, user=user)
+                view(request)
+
+        def batched():
+            view = InteractionViewSet.as_view({'post': 'batch'}, **InteractionViewSet.batch.kwargs)
+            size = max(1, kwargs['batch_size'])
+            for start in range(0, len(events), size):
+                chunk = events[start:start + size]
+                if kwargs['ndjson']:
+                    body = '\n'.join(json.dumps(event) for event in chunk)
+                    request = factory.post('/api/v1/interactions/batch/', body, content_type='application/x-ndjson')
+                else:
+                    request = factory.post('/api/v1/interactions/batch/', chunk, format='json')
+                force_authenticate(request, user=user)
+                view(request)
+
+        self.stdout.write(f'Ingesting {len(events)} events per path (batch size {kwargs["batch_size"]})...')
+        results = {}
+        for name, run in (('single', single), ('batch', batched)):
+            try:
+                # Roll back so the benchmark leaves no rows behind
+                with transaction.atomic(), CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    run()
+                    elapsed = time.perf_counter() - started
+                    raise Rollback
+            except Rollback:
+                pass
+            results[name] = elapsed
+            self.stdout.write(
+                f'  {name:<6} {elapsed:8.2f}s  {len(events) / elapsed:10.0f} events/s  {len(queries)} queries'
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Batch ingestion is {results['single'] / results['batch']:.1f}x faster than single-event POSTs."
+        ))
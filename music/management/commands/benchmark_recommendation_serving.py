@@ -0,0 +1,67 @@
+# music/management/commands/benchmark_recommendation_serving.py
+
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+from playlists.models import UserRecommendation
+from playlists.utils.recommendation_cache import invalidate_recommendations, local_cache
+from playlists.views import RecommendedTracksView, UserRecommendationView
+
+
+class Command(BaseCommand):
+    help = "Measure p50/p99 latency of the recommendation endpoints from the LRU, the shared cache and the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per scenario')
+        parser.add_argument('--users', type=int, default=200, help='Distinct users sampled')
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **kwargs):
+        user_ids = list(UserRecommendation.objects.values_list('user_id', flat=True)[:kwargs['users']])
+        if not user_ids:
+            self.stdout.write(self.style.WARNING('No stored recommendations; run generate_recommendations first.'))
+            return
+
+        users = get_user_model().objects.in_bulk(user_ids)
+        rng = random.Random(kwargs['seed'])
+        sequence = [rng.choice(user_ids) for _ in range(kwargs['requests'])]
+        factory = APIRequestFactory()
+
+        scenarios = {
+            'lru': lambda user_id: None,
+            'shared cache': lambda user_id: local_cache.clear(),
+            'database': lambda user_id: invalidate_recommendations([user_id]),
+        }
+        endpoints = {
+            '/api/v1/recommended-tracks/': RecommendedTracksView.as_view(),
+            '/api/v1/user-recommendations/': UserRecommendationView.as_view(),
+        }
+
+        for path, view in endpoints.items():
+            self.stdout.write(path)
+            for name, prepare in scenarios.items():
+                latencies = []
+                with CaptureQueriesContext(connection) as queries:
+                    for user_id in sequence:
+                        prepare(user_id)
+                        request = factory.get(path)
+                        force_authenticate(request, user=users[user_id])
+                        started = time.perf_counter()
+                        response = view(request)
+                        response.render()
+                        latencies.append(time.perf_counter() - started)
+
+                latencies.sort()
+                p50 = latencies[len(latencies) // 2] * 1000
+                p99 = latencies[max(int(len(latencies) * 0.99) - 1, 0)] * 1000
+                self.stdout.write(
+                    f'  {name:<13} p50 {p50:6.2f} ms  p99 {p99:6.2f} ms  '
+                    f'{len(queries) / len(sequence):.1f} queries/request'
+                )
+
+        self.stdout.write(self.style.SUCCESS('✅ Recommendation serving benchmark finished.'))
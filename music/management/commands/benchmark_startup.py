@@ -0,0 +1,127 @@
+# music/management/commands/benchmark_startup.py
+
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules that should only be loaded by the code paths that need them
+HEAVY_MODULES = ('librosa', 'numba', 'scipy', 'sklearn', 'soundfile', 'soxr', 'mutagen')
+
+# Run in a fresh interpreter: what a web worker does before serving its first request
+STARTUP_SCRIPT = f"""
+import json, resource, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({{
+    'setup_ms': (time.perf_counter() - started) * 1000,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy': [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def parse_importtime(stderr):
+    """
+    Reads `python -X importtime` output.
+    Returns a tuple: (total ms, {top-level package: cumulative ms})
+    """
+    total_us, packages = 0, {}
+    for line in stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match or match.group(3):
+            continue  # Nested imports are already counted in their parent's cumulative time
+        cumulative = int(match.group(2))
+        total_us += cumulative
+        package = match.group(4).split('.')[0]
+        packages[package] = packages.get(package, 0) + cumulative / 1000
+    return total_us / 1000, packages
+
+
+class Command(BaseCommand):
+    help = "Measure import time and RSS of django.setup() plus URL loading in a fresh interpreter."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Fresh interpreters started per tree (medians are reported)')
+        parser.add_argument('--top', type=int, default=10, help='Slowest top-level packages listed')
+        parser.add_argument('--compare', metavar='GIT_REF', help='Also measure this git revision, e.g. HEAD~1')
+
+    def measure(self, source_dir, runs):
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(filter(None, [str(source_dir), env.get('PYTHONPATH')]))
+        samples = []
+        for _ in range(runs):
+            completed = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', STARTUP_SCRIPT],
+                cwd=source_dir, env=env, capture_output=True, text=True,
+            )
+            if completed.returncode:
+                raise CommandError(f'Startup failed in {source_dir}:\n{completed.stderr[-2000:]}')
+            result = json.loads(completed.stdout.strip().splitlines()[-1])
+            result['import_ms'], result['packages'] = parse_importtime(completed.stderr)
+            samples.append(result)
+
+        packages = {}
+        for sample in samples:
+            for package, ms in sample['packages'].items():
+                packages.setdefault(package, []).append(ms)
+        return {
+            'import_ms': statistics.median(s['import_ms'] for s in samples),
+            'setup_ms': statistics.median(s['setup_ms'] for s in samples),
+            'rss_mb': statistics.median(s['rss_mb'] for s in samples),
+            'heavy': samples[-1]['heavy'],
+            'packages': {package: statistics.median(values) for package, values in packages.items()},
+        }
+
+    def export_revision(self, ref, directory):
+        archive = subprocess.run(
+            ['git', 'archive', '--format=tar', ref], cwd=settings.BASE_DIR, capture_output=True,
+        )
+        if archive.returncode:
+            raise CommandError(f'git archive {ref} failed: {archive.stderr.decode().strip()}')
+        with tarfile.open(fileobj=BytesIO(archive.stdout)) as tar:
+            tar.extractall(directory, filter='data')
+
+    def report(self, label, stats, top):
+        self.stdout.write(label)
+        self.stdout.write(
+            f"  imports {stats['import_ms']:8.1f} ms  setup {stats['setup_ms']:8.1f} ms  "
+            f"peak RSS {stats['rss_mb']:6.1f} MB"
+        )
+        self.stdout.write(f"  heavy modules loaded: {', '.join(stats['heavy']) or 'none'}")
+        slowest = sorted(stats['packages'].items(), key=lambda item: item[1], reverse=True)[:top]
+        for package, ms in slowest:
+            self.stdout.write(f'    {package:<24} {ms:8.1f} ms')
+
+    def handle(self, *args, **kwargs):
+        runs = max(1, kwargs['runs'])
+        after = self.measure(settings.BASE_DIR, runs)
+
+        if kwargs['compare']:
+            with tempfile.TemporaryDirectory(prefix='startup-') as directory:
+                self.export_revision(kwargs['compare'], directory)
+                before = self.measure(directory, runs)
+            self.report(f"{kwargs['compare']}:", before, kwargs['top'])
+            self.report('working tree:', after, kwargs['top'])
+            self.stdout.write(
+                f"  change: imports {after['import_ms'] - before['import_ms']:+.1f} ms, "
+                f"setup {after['setup_ms'] - before['setup_ms']:+.1f} ms, "
+                f"RSS {after['rss_mb'] - before['rss_mb']:+.1f} MB"
+            )
+        else:
+            self.report('working tree:', after, kwargs['top'])
+
+        self.stdout.write(self.style.SUCCESS('✅ Startup benchmark finished.'))
@@ -0,0 +1,82 @@
+# music/management/commands/benchmark_track_counters.py
+
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from music.models import Track
+from music.utils.track_counters import apply_deltas, shard_totals
+
+
+class Command(BaseCommand):
+    help = (
+        "Hammer one track's play counter from many threads, single-row vs sharded. "
+        "Meant for MySQL; the increments are reverted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--track', type=int, default=None, help='Track to increment (default: first track)')
+        parser.add_argument('--threads', type=int, default=32)
+        parser.add_argument('--increments', type=int, default=200, help='Increments per thread')
+        parser.add_argument(
+            '--shards', type=int, nargs='+', default=None,
+            help='Shard counts to compare (default: 1 and TRACK_COUNTER_SHARDS)',
+        )
+
+    def handle(self, *args, **kwargs):
+        track_id = kwargs['track'] or Track.objects.order_by('id').values_list('id', flat=True).first()
+        if track_id is None:
+            raise CommandError('No tracks to benchmark.')
+
+        shard_options = kwargs['shards'] or sorted({1, settings.TRACK_COUNTER_SHARDS})
+        threads, increments = kwargs['threads'], kwargs['increments']
+        self.stdout.write(f'Track {track_id}: {threads} threads x {increments} increments')
+
+        for shards in shard_options:
+            before = shard_totals([track_id]).get(track_id, {}).get('plays_count', 0)
+            errors = []
+            latencies = []
+            lock = threading.Lock()
+            start_gate = threading.Barrier(threads)
+
+            def worker():
+                local = []
+                try:
+                    start_gate.wait()
+                    for _ in range(increments):
+                        started = time.perf_counter()
+                        try:
+                            apply_deltas({track_id: {'plays_count': 1}}, shards=shards)
+                        except Exception as exc:
+                            errors.append(exc)
+                            continue
+                        local.append(time.perf_counter() - started)
+                finally:
+                    connection.close()
+                    with lock:
+                        latencies.extend(local)
+
+            pool = [threading.Thread(target=worker) for _ in range(threads)]
+            started = time.perf_counter()
+            for thread in pool:
+                thread.start()
+            for thread in pool:
+                thread.join()
+            elapsed = time.perf_counter() - started
+
+            applied = shard_totals([track_id]).get(track_id, {}).get('plays_count', 0) - before
+            latencies.sort()
+            p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else 0.0
+            self.stdout.write(
+                f'  shards={shards:<3} {len(latencies) / elapsed:9.0f} increments/s  '
+                f'p99 {p99:7.2f} ms  errors {len(errors):<5} '
+                f'counted {applied}/{len(latencies)}'
+            )
+
+            # Put the counter back where it was
+            if applied:
+                apply_deltas({track_id: {'plays_count': -applied}}, shards=shards)
+
+        self.stdout.write(self.style.SUCCESS('✅ Counter benchmark finished.'))
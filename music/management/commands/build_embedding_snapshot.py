@@ -0,0 +1,15 @@
+# music/management/commands/build_embedding_snapshot.py
+
+from django.core.management.base import BaseCommand
+from music.utils.embedding_snapshot import write_snapshot
+
+class Command(BaseCommand):
+    help = "Write a versioned, memory-mappable snapshot of all track embeddings."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help='Snapshot directory (defaults to EMBEDDING_SNAPSHOT_DIR)')
+        parser.add_argument('--keep', type=int, default=3, help='Number of versions to keep on disk')
+
+    def handle(self, *args, **kwargs):
+        version, count = write_snapshot(directory=kwargs['dir'], keep=max(1, kwargs['keep']))
+        self.stdout.write(self.style.SUCCESS(f'✅ Snapshot {version} written with {count} tracks.'))
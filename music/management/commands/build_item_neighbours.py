@@ -0,0 +1,25 @@
+# music/management/commands/build_item_neighbours.py
+
+from django.core.management.base import BaseCommand
+from music.utils.item_cf import write_neighbours
+
+class Command(BaseCommand):
+    help = "Build the item-item collaborative filtering neighbour table from Interaction and ListeningHistory."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dir', default=None, help='Output directory (defaults to ITEM_CF_DIR)')
+        parser.add_argument('--neighbours', type=int, default=None, help='Neighbours kept per track (defaults to ITEM_CF_NEIGHBOURS)')
+        parser.add_argument('--chunk-size', type=int, default=2048, help='Tracks per similarity block')
+        parser.add_argument('--keep', type=int, default=3, help='Number of versions to keep on disk')
+
+    def handle(self, *args, **kwargs):
+        stats = write_neighbours(
+            directory=kwargs['dir'],
+            k=kwargs['neighbours'],
+            chunk_size=max(1, kwargs['chunk_size']),
+            keep=max(1, kwargs['keep']),
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Neighbour table {stats['version']} written: {stats['users']} users x {stats['tracks']} tracks, "
+            f"{stats['neighbours']} neighbours ({stats['bytes'] / 1e6:.1f} MB) in {stats['seconds']:.1f}s."
+        ))
@@ -1,50 +1,69 @@
 # music/management/commands/generate_recommendations.py
 
+import os
 from django.core.management.base import BaseCommand
 from django.contrib.auth import get_user_model
-from playlists.models import Recommendation
-from music.models import TrackFeature
+from music.utils.recommendations import load_embedding_matrix
+from music.utils.batch_recommendations import generate_recommendations, save_user_recommendations
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 
 User = get_user_model()
 
 class Command(BaseCommand):
     help = "Generate personalized recommendations for all users."
 
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1024, help='Users scored per matrix product (bounds memory)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Threads scoring chunks in parallel')
+        parser.add_argument('--top-n', type=int, default=10, help='Recommendations kept per user')
+        parser.add_argument('--per-user', action='store_true', help='Use the old one-user-at-a-time loop')
+
     def handle(self, *args, **kwargs):
+        if kwargs['per_user']:
+            return self.handle_per_user(top_n=kwargs['top_n'])
+
+        stats = generate_recommendations(
+            batch_size=max(1, kwargs['batch_size']),
+            workers=max(1, kwargs['workers']),
+            top_n=kwargs['top_n'],
+            on_progress=lambda done, total: self.stdout.write(f"  {done}/{total} users scored..."),
+        )
+
+        if not stats['users']:
+            self.stdout.write(self.style.WARNING('No embeddings or likes found.'))
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Recommendations generated for {stats['users']} users in {stats['seconds']:.1f}s!"
+        ))
+
+    def handle_per_user(self, top_n=10):
+        from sklearn.metrics.pairwise import cosine_similarity  # only the legacy loop needs sklearn
+
         users = User.objects.all()
-        track_features = TrackFeature.objects.select_related('track').all()
 
         # ✅ Build the matrix of all track embeddings
-        track_embeddings = []
-        track_ids = []
-
-        for tf in track_features:
-            if tf.embedding:
-                track_embeddings.append(tf.embedding)
-                track_ids.append(tf.track.id)
+        track_ids, track_embeddings = load_embedding_matrix()
+        track_ids = track_ids.tolist()
 
-        if not track_embeddings:
+        if not track_ids:
             self.stdout.write(self.style.WARNING('No embeddings found.'))
             return
 
-        track_embeddings = np.array(track_embeddings)
+        track_positions = {track_id: idx for idx, track_id in enumerate(track_ids)}
 
         for user in users:
-            liked_tracks = user.interactions.filter(interaction_type='like').values_list('track_id', flat=True)
+            liked_tracks = set(user.interactions.filter(interaction_type='like').values_list('track_id', flat=True))
 
             if not liked_tracks:
                 continue
 
             # ✅ Build user preference vector
-            liked_embeddings = []
-            for track_id in liked_tracks:
-                try:
-                    idx = track_ids.index(track_id)
-                    liked_embeddings.append(track_embeddings[idx])
-                except ValueError:
-                    continue
+            liked_embeddings = [
+                track_embeddings[track_positions[track_id]]
+                for track_id in liked_tracks
+                if track_id in track_positions
+            ]
 
             if not liked_embeddings:
                 continue
@@ -55,21 +74,17 @@ class Command(BaseCommand):
             # ✅ Calculate similarity to all tracks
             similarities = cosine_similarity(user_profile, track_embeddings).flatten()
 
-            # ✅ Get top 10 recommendations (excluding already liked)
+            # ✅ Get top N recommendations (excluding already liked)
             top_indices = similarities.argsort()[::-1]
             recommended_track_ids = []
             for idx in top_indices:
                 track_id = track_ids[idx]
                 if track_id not in liked_tracks:
                     recommended_track_ids.append(track_id)
-                if len(recommended_track_ids) == 10:
+                if len(recommended_track_ids) == top_n:
                     break
 
-            # ✅ Save to Recommendation table
-            Recommendation.objects.update_or_create(
-                user=user,
-                defaults={'recommended_track_ids': recommended_track_ids}
-            )
+            # ✅ Save to UserRecommendation
+            save_user_recommendations({user.id: recommended_track_ids})
 
         self.stdout.write(self.style.SUCCESS('✅ Recommendations generated successfully!'))
-
@@ -0,0 +1,62 @@
+# music/management/commands/reconcile_track_statistics.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from music.models import TrackStatistics
+from music.utils.track_counters import COUNTER_FIELDS, recount_statistics, shard_totals
+
+class Command(BaseCommand):
+    help = "Recompute every TrackStatistics counter from Interaction/ListeningHistory and repair drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk write')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing')
+
+    def handle(self, *args, **kwargs):
+        started = time.perf_counter()
+
+        # ✅ One GROUP BY per source table for the true values, one for the shards
+        actual = recount_statistics()
+        shards = shard_totals()
+        zero = dict.fromkeys(COUNTER_FIELDS, 0)
+
+        def expected_base(track_id):
+            # The TrackStatistics row holds whatever the shards do not
+            true_counts = actual.pop(track_id, zero)
+            sharded = shards.get(track_id, zero)
+            return {field: true_counts[field] - sharded[field] for field in COUNTER_FIELDS}
+
+        to_update, drift = [], dict.fromkeys(COUNTER_FIELDS, 0)
+        for stats in TrackStatistics.objects.only('id', 'track_id', *COUNTER_FIELDS).iterator(chunk_size=kwargs['batch_size']):
+            expected = expected_base(stats.track_id)
+            changed = False
+            for field in COUNTER_FIELDS:
+                if getattr(stats, field) != expected[field]:
+                    drift[field] += abs(getattr(stats, field) - expected[field])
+                    setattr(stats, field, expected[field])
+                    changed = True
+            if changed:
+                to_update.append(stats)
+
+        # Whatever is left has activity but no statistics row yet
+        to_create = [TrackStatistics(track_id=track_id, **expected_base(track_id)) for track_id in list(actual)]
+
+        self.stdout.write(
+            f'  {len(to_update)} rows drifted, {len(to_create)} missing | '
+            + ', '.join(f'{field} off by {total}' for field, total in drift.items())
+        )
+        if kwargs['dry_run']:
+            self.stdout.write(self.style.WARNING('Dry run: nothing written.'))
+            return
+
+        batch_size = max(1, kwargs['batch_size'])
+        with transaction.atomic():
+            TrackStatistics.objects.bulk_update(to_update, COUNTER_FIELDS, batch_size=batch_size)
+            TrackStatistics.objects.bulk_create(to_create, batch_size=batch_size, ignore_conflicts=True)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Reconciled track statistics: {len(to_update)} repaired, {len(to_create)} created in {elapsed:.1f}s.'
+        ))
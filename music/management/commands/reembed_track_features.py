@@ -0,0 +1,62 @@
+# music/management/commands/reembed_track_features.py
+
+import time
+import numpy as np
+from django.core.management.base import BaseCommand
+from music.models import TrackFeature, MOOD_MAPPING
+from music.utils.feature_scaling import EMBEDDING_FEATURES, FeatureScaler, SCALING_METHODS, current_scaler
+from music.utils.embedding_snapshot import schedule_snapshot_rebuild, write_snapshot
+
+class Command(BaseCommand):
+    help = "Rewrite every TrackFeature embedding in bulk, optionally fitting a new feature scaler first."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fit', action='store_true', help='Fit and save a new scaler from the current catalog')
+        parser.add_argument('--method', choices=SCALING_METHODS, default='standard', help='Scaling method used with --fit')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per bulk_update')
+        parser.add_argument('--snapshot', action='store_true', help='Publish a new embedding snapshot afterwards')
+
+    def handle(self, *args, **kwargs):
+        started = time.perf_counter()
+
+        # ✅ One query for every row's raw feature values
+        columns = [name for name in EMBEDDING_FEATURES if name != 'mood']
+        rows = list(TrackFeature.objects.order_by('pk').values_list('pk', *columns, 'mood'))
+        if not rows:
+            self.stdout.write(self.style.WARNING('No track features found.'))
+            return
+
+        pks = [row[0] for row in rows]
+        raw = np.array(
+            [[*row[1:-1], MOOD_MAPPING.get((row[-1] or '').lower(), 0)] for row in rows],
+            dtype=np.float64,
+        )
+
+        if kwargs['fit']:
+            scaler = FeatureScaler.fit(raw, method=kwargs['method'])
+            version = scaler.save()
+            self.stdout.write(f'  Fitted {scaler.method} scaler {version} on {len(raw)} tracks')
+        else:
+            scaler = current_scaler()
+            if scaler is None:
+                self.stdout.write(self.style.WARNING('No fitted scaler found; writing raw embeddings (use --fit).'))
+
+        # ✅ Scale the whole catalog in one vectorized pass
+        embeddings = scaler.transform(raw) if scaler is not None else raw
+
+        batch_size = max(1, kwargs['batch_size'])
+        for start in range(0, len(pks), batch_size):
+            batch = [
+                TrackFeature(pk=pk, embedding=embedding)
+                for pk, embedding in zip(pks[start:start + batch_size], embeddings[start:start + batch_size].tolist())
+            ]
+            TrackFeature.objects.bulk_update(batch, ['embedding'])
+
+        if kwargs['snapshot']:
+            version, _ = write_snapshot()
+            self.stdout.write(f'  Published embedding snapshot {version}')
+        else:
+            schedule_snapshot_rebuild()  # bulk_update skips the signal that would queue it
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'✅ Re-embedded {len(pks)} tracks in {elapsed:.1f}s.'))
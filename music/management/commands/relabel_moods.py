@@ -0,0 +1,107 @@
+# music/management/commands/relabel_moods.py
+
+import time
+from collections import Counter
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from music.models import TrackFeature, MOOD_MAPPING
+from music.utils.embedding_snapshot import schedule_snapshot_rebuild, write_snapshot
+from music.utils.feature_scaling import EMBEDDING_FEATURES, current_scaler, scale_embeddings
+from music.utils.mood import DEFAULT_MOOD_THRESHOLDS, mood_thresholds, predict_moods
+from music.utils.track_index import bump_index_version
+
+class Command(BaseCommand):
+    help = "Relabel every TrackFeature.mood from its stored features and rewrite embeddings in the same pass."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows per query and bulk_update')
+        parser.add_argument(
+            '--threshold', action='append', default=[], metavar='NAME=VALUE',
+            help=f"Override a mood threshold for this run ({', '.join(DEFAULT_MOOD_THRESHOLDS)})",
+        )
+        parser.add_argument('--dry-run', action='store_true', help='Report label changes without writing')
+        parser.add_argument('--snapshot', action='store_true', help='Publish a new embedding snapshot afterwards')
+
+    def parse_thresholds(self, options):
+        overrides = {}
+        for option in options:
+            name, _, value = option.partition('=')
+            if name not in DEFAULT_MOOD_THRESHOLDS:
+                raise CommandError(f"Unknown mood threshold '{name}'.")
+            try:
+                overrides[name] = float(value)
+            except ValueError:
+                raise CommandError(f"Threshold '{name}' needs a number, got '{value}'.")
+        return overrides
+
+    def handle(self, *args, **kwargs):
+        started = time.perf_counter()
+        thresholds = mood_thresholds(self.parse_thresholds(kwargs['threshold']))
+        batch_size = max(1, kwargs['batch_size'])
+        scaler = current_scaler()
+
+        columns = [name for name in EMBEDDING_FEATURES if name != 'mood']
+        mood_column = EMBEDDING_FEATURES.index('mood')
+        total, changes, labels = 0, Counter(), Counter()
+        last_pk = 0
+
+        while True:
+            # ✅ Keyset pagination: one query per chunk, no OFFSET scans
+            rows = list(
+                TrackFeature.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', *columns, 'mood')[:batch_size]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            total += len(rows)
+
+            pks = [row[0] for row in rows]
+            old_moods = [row[-1] for row in rows]
+            values = np.array([row[1:-1] for row in rows], dtype=np.float64)
+
+            # ✅ Label the whole chunk in one vectorized pass
+            moods = predict_moods(values, columns=columns, thresholds=thresholds)
+            labels.update(moods)
+            changes.update((old, new) for old, new in zip(old_moods, moods) if old != new)
+
+            if kwargs['dry_run']:
+                continue
+
+            raw = np.insert(values, mood_column, [MOOD_MAPPING.get(mood, 0) for mood in moods], axis=1)
+            embeddings = scale_embeddings(raw, scaler).tolist()
+            TrackFeature.objects.bulk_update(
+                [
+                    TrackFeature(pk=pk, mood=mood, embedding=embedding)
+                    for pk, mood, embedding in zip(pks, moods, embeddings)
+                ],
+                ['mood', 'embedding'],
+            )
+
+        if not total:
+            self.stdout.write(self.style.WARNING('No track features found.'))
+            return
+
+        for (old, new), count in changes.most_common():
+            self.stdout.write(f'  {old} → {new}: {count}')
+        self.stdout.write('  Labels: ' + ', '.join(f'{mood}={count}' for mood, count in labels.most_common()))
+
+        if kwargs['dry_run']:
+            self.stdout.write(self.style.WARNING(f'Dry run: {sum(changes.values())} of {total} moods would change.'))
+            return
+
+        # Mood is part of the preference vector; bulk_update skips the signals
+        bump_index_version()
+
+        if kwargs['snapshot']:
+            version, _ = write_snapshot()
+            self.stdout.write(f'  Published embedding snapshot {version}')
+        else:
+            schedule_snapshot_rebuild()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'✅ Relabelled {total} tracks ({sum(changes.values())} changed) in {elapsed:.1f}s.'
+        ))
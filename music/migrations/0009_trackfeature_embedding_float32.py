@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:23
+
+import music.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0008_track_anghami_link_track_spotify_link_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='trackfeature',
+            name='embedding',
+            field=music.fields.Float32VectorField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,49 @@
+import json
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def pack_embeddings(apps, schema_editor):
+    """
+    Rewrite legacy JSON embeddings as packed float32 bytes.
+    The field decodes both formats, so re-saving the value packs it.
+    """
+    TrackFeature = apps.get_model('music', 'TrackFeature')
+    last_pk = 0
+    while True:
+        batch = list(
+            TrackFeature.objects.filter(pk__gt=last_pk).exclude(embedding=None)
+            .order_by('pk').only('pk', 'embedding')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        TrackFeature.objects.bulk_update(batch, ['embedding'])
+        last_pk = batch[-1].pk
+
+
+def unpack_embeddings(apps, schema_editor):
+    """
+    Write embeddings back as JSON text so the column can return to JSONField.
+    """
+    TrackFeature = apps.get_model('music', 'TrackFeature')
+    connection = schema_editor.connection
+    table = connection.ops.quote_name(TrackFeature._meta.db_table)
+    rows = [
+        (json.dumps(embedding).encode('utf-8'), pk)
+        for pk, embedding in TrackFeature.objects.exclude(embedding=None).values_list('pk', 'embedding').iterator()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(f"UPDATE {table} SET embedding = %s WHERE id = %s", rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0009_trackfeature_embedding_float32'),
+    ]
+
+    operations = [
+        migrations.RunPython(pack_embeddings, unpack_embeddings),
+    ]
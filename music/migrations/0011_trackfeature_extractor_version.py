@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0010_pack_trackfeature_embeddings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trackfeature',
+            name='extractor_version',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+    ]
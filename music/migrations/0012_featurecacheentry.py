@@ -0,0 +1,27 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0011_trackfeature_extractor_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeatureCacheEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cache_key', models.CharField(max_length=64, unique=True)),
+                ('content_hash', models.CharField(db_index=True, max_length=64)),
+                ('extractor_version', models.PositiveIntegerField(db_index=True)),
+                ('features', models.JSONField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:41
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0012_featurecacheentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='listeninghistory',
+            name='listened_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0013_listeninghistory_listened_at_default'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackStatisticsShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('plays_count', models.IntegerField(default=0)),
+                ('likes_count', models.IntegerField(default=0)),
+                ('comments_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('track', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='statistics_shards', to='music.track')),
+            ],
+            options={
+                'unique_together': {('track', 'shard')},
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0014_trackstatisticsshard'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrackTrend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0.0)),
+                ('epoch', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(db_index=True)),
+                ('track', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='trend', to='music.track')),
+            ],
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:55
+
+import django.db.models.deletion
+import music.fields
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0015_tracktrend'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTasteProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('vector', music.fields.Float32VectorField(blank=True, null=True)),
+                ('like_count', models.PositiveIntegerField(default=0)),
+                ('last_like_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='taste_profile', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('music', '0016_usertasteprofile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='usertasteprofile',
+            name='embedding_version',
+            field=models.CharField(blank=True, default='', max_length=40),
+        ),
+        migrations.AddField(
+            model_name='usertasteprofile',
+            name='pending_like_ids',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
@@ -1,8 +1,11 @@
 # music/models.py
 
 from django.db import models
+from django.utils import timezone
 from users.models import Artist
 from django.conf import settings
+from music.fields import Float32VectorField
+from music.utils.feature_scaling import scale_embeddings
 
 # 🆕 Mood Mapping
 MOOD_MAPPING = {
@@ -79,7 +82,8 @@ class TrackFeature(models.Model):
     liveness = models.FloatField()
     mood = models.CharField(max_length=20, choices=MOOD_CHOICES, db_index=True)
 
-    embedding = models.JSONField(blank=True, null=True)  # ✅ New Field
+    embedding = Float32VectorField(blank=True, null=True)  # Packed float32 bytes
+    extractor_version = models.PositiveIntegerField(default=0, db_index=True)  # FEATURE_EXTRACTOR_VERSION used
 
     class Meta:
         ordering = ['track']
@@ -90,7 +94,14 @@ class TrackFeature(models.Model):
 
     def generate_embedding(self):
         """
-        Creates a numerical vector representing this track's features.
+        Creates a numerical vector representing this track's features,
+        scaled with the current fitted FeatureScaler when one exists.
+        """
+        return scale_embeddings([self.raw_features()])[0].tolist()
+
+    def raw_features(self):
+        """
+        Unscaled feature values, in EMBEDDING_FEATURES order.
         """
         mood_numeric = MOOD_MAPPING.get(self.mood.lower(), 0)
         return [
@@ -145,7 +156,7 @@ class Interaction(models.Model):
 class ListeningHistory(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     track = models.ForeignKey(Track, on_delete=models.CASCADE)
-    listened_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    listened_at = models.DateTimeField(default=timezone.now, db_index=True)  # event time; buffered listens keep it
 
     class Meta:
         ordering = ['-listened_at']
@@ -162,3 +173,65 @@ class TrackStatistics(models.Model):
 
     class Meta:
         ordering = ['-updated_at']
+
+# ------------------------------
+# Track Statistics Shard Model
+# ------------------------------
+# Increments land on one of TRACK_COUNTER_SHARDS rows per track at random, so a
+# viral track does not serialize every write on one row lock. A track's counts
+# are its TrackStatistics row plus the sum of its shards (see track_counters).
+class TrackStatisticsShard(models.Model):
+    track = models.ForeignKey(Track, on_delete=models.CASCADE, related_name='statistics_shards')
+    shard = models.PositiveSmallIntegerField()
+    plays_count = models.IntegerField(default=0)
+    likes_count = models.IntegerField(default=0)
+    comments_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('track', 'shard')
+
+# ------------------------------
+# Track Trend Model
+# ------------------------------
+# Forward-decayed trending score: the live score is
+# score * 2 ** (-(now - epoch) / half_life), so every event is a plain
+# increment of score (see music.utils.trending).
+class TrackTrend(models.Model):
+    track = models.OneToOneField(Track, on_delete=models.CASCADE, related_name='trend')
+    score = models.FloatField(default=0.0)
+    epoch = models.DateTimeField()
+    updated_at = models.DateTimeField(db_index=True)  # time of the latest event
+
+# ------------------------------
+# Feature Cache Model
+# ------------------------------
+class FeatureCacheEntry(models.Model):
+    cache_key = models.CharField(max_length=64, unique=True)  # see music.utils.feature_cache.cache_key
+    content_hash = models.CharField(max_length=64, db_index=True)  # SHA-256 of the audio bytes
+    extractor_version = models.PositiveIntegerField(db_index=True)
+    features = models.JSONField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.content_hash[:12]} (v{self.extractor_version})"
+
+# ------------------------------
+# User Taste Profile Model
+# ------------------------------
+# Running mean of the embeddings of a user's liked tracks, folded forward one
+# batch of new likes at a time (see music.utils.incremental_recommendations).
+class UserTasteProfile(models.Model):
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='taste_profile')
+    vector = Float32VectorField(blank=True, null=True)  # mean liked embedding
+    like_count = models.PositiveIntegerField(default=0)  # likes folded into the mean
+    last_like_id = models.BigIntegerField(default=0)  # highest Interaction id folded in
+    pending_like_ids = models.JSONField(default=list, blank=True)  # likes read before their track had an embedding
+    embedding_version = models.CharField(max_length=40, blank=True, default='')  # snapshot/scaler the mean was built in
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Taste profile of user {self.user_id} ({self.like_count} likes)"
@@ -1,10 +1,9 @@
 # music/recommendation_engine.py
 
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 from users.models import UserPreference
 from music.models import Track, TrackFeature
-from playlists.models import Recommendation
+from music.utils.track_index import TrackVectorIndex
 
 def generate_user_vector(user):
     """
@@ -43,11 +42,20 @@ def generate_track_vector(track):
     except TrackFeature.DoesNotExist:
         return None
 
+    return build_track_vector(track, features).reshape(1, -1)
+
+def build_track_vector(track, features):
+    """
+    Build the 1-D track vector from an already-loaded TrackFeature.
+    """
     all_genres = ["Pop", "Rock", "Hip-Hop", "Electronic", "Jazz", "Classical", "Metal", "Country", "Reggae", "Blues"]
     all_moods = ["Happy", "Sad", "Energetic", "Calm", "Angry", "Romantic", "Melancholic", "Chill"]
 
+    # Mood lives on TrackFeature and is stored lowercase ('happy')
+    track_mood = (features.mood or '').capitalize()
+
     genre_vector = np.array([1 if track.genre == genre else 0 for genre in all_genres])
-    mood_vector = np.array([1 if track.mood == mood else 0 for mood in all_moods])
+    mood_vector = np.array([1 if track_mood == mood else 0 for mood in all_moods])
 
     numeric_vector = np.array([
         features.tempo or 0,
@@ -56,9 +64,13 @@ def generate_track_vector(track):
         features.valence or 0,
     ])
 
-    full_vector = np.concatenate((genre_vector, mood_vector, numeric_vector))
+    return np.concatenate((genre_vector, mood_vector, numeric_vector))
+
+def _preference_track_vector(features):
+    return build_track_vector(features.track, features)
 
-    return full_vector.reshape(1, -1)
+# Process-wide index of approved tracks in the user-preference vector space
+preference_index = TrackVectorIndex(_preference_track_vector, name='preference')
 
 def recommend_tracks_for_user(user, num_recommendations=10):
     """
@@ -69,24 +81,10 @@ def recommend_tracks_for_user(user, num_recommendations=10):
     if user_vector is None:
         return []
 
-    all_tracks = Track.objects.filter(approval_status='approved')  # Only approved tracks
-
-    track_similarities = []
-
-    for track in all_tracks:
-        track_vector = generate_track_vector(track)
-        if track_vector is not None:
-            similarity = cosine_similarity(user_vector, track_vector)[0][0]
-            track_similarities.append((track, similarity))
-
-    # Sort tracks by similarity score, descending
-    track_similarities.sort(key=lambda x: x[1], reverse=True)
-
-    recommended_tracks = [track for track, sim in track_similarities[:num_recommendations]]
-
-    # Save recommendations into the database
-    Recommendation.objects.filter(user=user).delete()  # Clear old recommendations
-    for track in recommended_tracks:
-        Recommendation.objects.create(user=user, track=track)
+    # One matrix-vector product over the pre-normalized index
+    top_matches = preference_index.top_k(user_vector, k=num_recommendations)
 
-    return recommended_tracks
+    tracks_by_id = Track.objects.in_bulk([track_id for track_id, _ in top_matches])
+    # Not persisted: Recommendation has no user, and UserRecommendation
+    # holds the like-based rankings served by the API
+    return [tracks_by_id[track_id] for track_id, _ in top_matches if track_id in tracks_by_id]
@@ -1,5 +1,7 @@
+from django.db import models
 from rest_framework import serializers
 from music.models import Artist, Track, TrackFeature, Interaction, ListeningHistory, TrackStatistics
+from music.utils.track_counters import track_counts
 from users.serializers import ArtistSerializer as BaseArtistSerializer
 
 # now in this file you can refer to UserArtistSerializer
@@ -43,6 +45,8 @@ class TrackSerializer(serializers.ModelSerializer):
 # Track Features
 # ----------------------------
 class TrackFeatureSerializer(serializers.ModelSerializer):
+    embedding = serializers.ListField(child=serializers.FloatField(), read_only=True)
+
     class Meta:
         model = TrackFeature
         fields = '__all__'
@@ -62,6 +66,24 @@ class InteractionSerializer(serializers.ModelSerializer):
         return data
 
 
+class InteractionEventSerializer(serializers.Serializer):
+    """
+    One event of a batch ingestion request. The track is a plain id so
+    validation runs without queries; tracks are resolved for the whole
+    batch at once.
+    """
+    track = serializers.IntegerField(min_value=1)
+    interaction_type = serializers.ChoiceField(choices=Interaction.INTERACTION_TYPES)
+    comment_text = serializers.CharField(required=False, allow_null=True, allow_blank=True)
+
+    def validate(self, data):
+        if data['interaction_type'] == 'comment' and not data.get('comment_text'):
+            raise serializers.ValidationError("Comment text is required for comment interactions.")
+        if data['interaction_type'] != 'comment':
+            data['comment_text'] = None
+        return data
+
+
 # ----------------------------
 # Listening History
 # ----------------------------
@@ -71,13 +93,37 @@ class ListeningHistorySerializer(serializers.ModelSerializer):
     class Meta:
         model = ListeningHistory
         fields = ['track', 'listened_at']
+        read_only_fields = ['listened_at']
 
 
 # ----------------------------
 # Track Statistics
 # ----------------------------
+class TrackStatisticsListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        # ✅ Load every row's sharded counts in one batch
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.child.context['track_counts'] = track_counts([item.track_id for item in items])
+        return super().to_representation(items)
+
+
 class TrackStatisticsSerializer(serializers.ModelSerializer):
+    """
+    Counters are the row plus its TrackStatisticsShard rows, read through
+    the short-lived counter cache; the output shape is unchanged.
+    """
+
     class Meta:
         model = TrackStatistics
         fields = '__all__'
-        read_only_fields = ['plays_count', 'likes_count', 'comments_count', 'updated_at']
\ No newline at end of file
+        read_only_fields = ['plays_count', 'likes_count', 'comments_count', 'updated_at']
+        list_serializer_class = TrackStatisticsListSerializer
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        counts = self.context.get('track_counts')
+        if counts is None or instance.track_id not in counts:
+            counts = track_counts([instance.track_id])
+        for field, value in counts.get(instance.track_id, {}).items():
+            data[field] = self.fields[field].to_representation(value)
+        return data
\ No newline at end of file
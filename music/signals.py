@@ -1,7 +1,13 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_save
 from django.dispatch import receiver
-from music.models import Track
+from music.models import Track, TrackFeature, Interaction, ListeningHistory, UserTasteProfile
 from music.tasks import extract_features_task
+from music.utils.embedding_snapshot import schedule_snapshot_rebuild
+from music.utils.incremental_recommendations import schedule_like_refresh
+from music.utils.track_counters import apply_deltas, interaction_deltas, listen_deltas
+from music.utils.track_index import bump_index_version, registered_indexes
+from music.utils.trending import buffer_events
 
 @receiver(post_save, sender=Track)
 def enqueue_feature_extraction(sender, instance, created, **kwargs):
@@ -19,4 +25,147 @@ def enqueue_feature_extraction(sender, instance, created, **kwargs):
                 return
 
             # Enqueue the background task
-            extract_features_task.delay(instance.id)
\ No newline at end of file
+            extract_features_task.delay(instance.id)
+
+@receiver(pre_save, sender=Track)
+def remember_approval_status(sender, instance, update_fields=None, **kwargs):
+    """
+    Note the stored approval_status of an existing Track before it is
+    updated, so the indexes are only synced when it changes.
+    """
+    instance._stored_approval_status = None
+    if update_fields is not None and 'approval_status' not in update_fields:
+        instance._stored_approval_status = instance.approval_status
+    elif not instance._state.adding and instance.pk is not None:
+        instance._stored_approval_status = (
+            Track.objects.filter(pk=instance.pk).values_list('approval_status', flat=True).first()
+        )
+
+@receiver(post_save, sender=Track)
+def sync_track_indexes(sender, instance, created, **kwargs):
+    """
+    Add or drop the track from in-memory vector indexes when its
+    approval_status changes. Applied once the write commits; other
+    processes reload on the version bump. A new track has no features
+    yet, and other edits leave the indexes as they are.
+    """
+    if created or getattr(instance, '_stored_approval_status', None) == instance.approval_status:
+        return
+
+    track_id = instance.id
+
+    def apply():
+        indexes = registered_indexes(loaded_only=True)
+        feature = TrackFeature.objects.filter(track_id=track_id, track__approval_status='approved').select_related('track').first()
+        for index in indexes:
+            if feature is not None:
+                index.upsert(feature)
+            else:
+                index.remove(track_id)
+        bump_index_version(indexes)
+
+    transaction.on_commit(apply)
+
+@receiver(post_save, sender=TrackFeature)
+def refresh_track_indexes(sender, instance, **kwargs):
+    """
+    Update the track's row in every loaded vector index in place.
+    """
+    def apply():
+        indexes = registered_indexes(loaded_only=True)
+        for index in indexes:
+            index.upsert(instance)
+        bump_index_version(indexes)
+
+    transaction.on_commit(apply)
+
+@receiver(post_delete, sender=Track)
+@receiver(post_delete, sender=TrackFeature)
+def drop_from_track_indexes(sender, instance, **kwargs):
+    track_id = instance.id if sender is Track else instance.track_id
+
+    def apply():
+        indexes = registered_indexes(loaded_only=True)
+        for index in indexes:
+            index.remove(track_id)
+        bump_index_version(indexes)
+
+    transaction.on_commit(apply)
+
+@receiver(post_save, sender=TrackFeature)
+@receiver(post_delete, sender=TrackFeature)
+def republish_embedding_snapshot(sender, instance, **kwargs):
+    """
+    Keep the shared embedding snapshot from missing new or changed embeddings.
+    """
+    schedule_snapshot_rebuild()
+
+@receiver(pre_save, sender=Interaction)
+def remember_interaction_type(sender, instance, **kwargs):
+    """
+    Note the stored type of an existing Interaction before it is updated,
+    so the counters can follow a type change (e.g. like -> comment).
+    """
+    instance._stored_type = None
+    if not instance._state.adding and instance.pk is not None:
+        instance._stored_type = (
+            Interaction.objects.filter(pk=instance.pk).values_list('interaction_type', flat=True).first()
+        )
+
+@receiver(post_save, sender=Interaction)
+@receiver(post_delete, sender=Interaction)
+def count_interaction(sender, instance, created=False, **kwargs):
+    """
+    Keep TrackStatistics like/comment counters in step with Interaction rows,
+    and queue new ones for the trending scores. bulk_create callers do both
+    themselves; queryset update() calls are left to reconcile_track_statistics.
+    """
+    if kwargs['signal'] is post_save and not created:
+        stored_type = getattr(instance, '_stored_type', None)
+        if stored_type and stored_type != instance.interaction_type:
+            previous = Interaction(track_id=instance.track_id, interaction_type=stored_type)
+            deltas = interaction_deltas([previous], sign=-1)
+            for track_id, counts in interaction_deltas([instance]).items():
+                deltas[track_id].update(counts)
+            apply_deltas(deltas)
+        return
+    apply_deltas(interaction_deltas([instance], sign=1 if created else -1))
+    if created:
+        buffer_events([(instance.track_id, instance.interaction_type, instance.created_at)])
+
+@receiver(post_save, sender=Interaction)
+@receiver(post_delete, sender=Interaction)
+def refresh_on_like(sender, instance, created=False, **kwargs):
+    """
+    Queue a debounced refresh of the user's recommendations when they like
+    a track, or an existing interaction becomes a like. An unlike (a
+    deleted like, or a like changed to another type) cannot be folded out
+    of the running mean, so it drops the taste profile and the refresh
+    rebuilds it.
+    """
+    if kwargs['signal'] is post_save and not created:
+        stored_type = getattr(instance, '_stored_type', None)
+        was_like, is_like = stored_type == 'like', instance.interaction_type == 'like'
+        if was_like == is_like:
+            return
+        # A row turned into a like keeps its old id, which may already be
+        # below last_like_id and would never be folded in: rebuild either way
+        UserTasteProfile.objects.filter(user_id=instance.user_id).delete()
+    elif instance.interaction_type != 'like':
+        return
+    elif not created:
+        UserTasteProfile.objects.filter(user_id=instance.user_id).delete()
+    schedule_like_refresh(instance.user_id)
+
+@receiver(post_save, sender=ListeningHistory)
+@receiver(post_delete, sender=ListeningHistory)
+def count_listen(sender, instance, created=False, **kwargs):
+    """
+    Keep TrackStatistics.plays_count in step with ListeningHistory rows,
+    and queue new listens for the trending scores.
+    """
+    if kwargs['signal'] is post_save and not created:
+        return
+    apply_deltas(listen_deltas([instance], sign=1 if created else -1))
+    if created:
+        buffer_events([(instance.track_id, 'listen', instance.listened_at)])
@@ -1,8 +1,19 @@
+import logging
 import os
-from celery import shared_task
-import subprocess
+import time
+from celery import chord, shared_task
+from celery.signals import worker_shutting_down
+from django.conf import settings
 from music.models import Track, TrackFeature
-from music.utils.feature_extraction import extract_features
+from music.utils.feature_cache import cached_extract_features
+from music.utils.feature_extraction import FEATURE_EXTRACTOR_VERSION
+from music.utils.batch_recommendations import generate_recommendations, user_id_shards
+from music.utils.embedding_snapshot import clear_pending_rebuild, current_snapshot, open_snapshot, write_snapshot
+from music.utils.incremental_recommendations import clear_pending_refresh, refresh_user_recommendations
+from music.utils.item_cf import write_neighbours
+from music.utils.listen_buffer import drain
+
+music_logger = logging.getLogger('music')
 
 @shared_task(bind=True, max_retries=3, default_retry_delay=60)
 def extract_features_task(self, track_id):
@@ -13,29 +24,174 @@ def extract_features_task(self, track_id):
         if not os.path.exists(file_path):
             return
 
-        features = extract_features(file_path)
-
-        # Save or update track features + embedding
-        track_feature, created = TrackFeature.objects.get_or_create(track=track)
-        for key, value in features.items():
-            setattr(track_feature, key, value)
+        # Identical audio (duplicate upload, re-approval) is served from the cache
+        features, hit = cached_extract_features(file_path, anchor=track.demo_start_time)
+        if not features:
+            return f"Feature extraction failed for track {track_id}."
 
-        # ⏩ Call the embedding generator
-        track_feature.embedding = track_feature.generate_embedding()
+        # Save or update track features; save() rebuilds the embedding
+        TrackFeature.objects.update_or_create(
+            track=track,
+            defaults={**features, 'extractor_version': FEATURE_EXTRACTOR_VERSION},
+        )
 
-        track_feature.save()
+        music_logger.info(f"Features for track {track_id}: cache {'hit' if hit else 'miss'}")
+        return {'track_id': track_id, 'cache_hits': int(hit), 'cache_misses': int(not hit)}
 
     except Exception as exc:
         raise self.retry(exc=exc)
 
 
+@shared_task(bind=True, max_retries=3, default_retry_delay=60)
+def generate_recommendations_shard_task(self, shard, start, stop, snapshot_version):
+    """
+    Generates recommendations for users with start <= id < stop in this
+    worker process, scoring against one pinned embedding snapshot version
+    that is mapped once for the whole shard. Progress is published as a
+    PROGRESS state with {'shard', 'done', 'total'}.
+
+    The pinned version may be gone by the time the shard runs: pruned by
+    later publishes, or written on another node's disk. The shard then
+    scores against this worker's current snapshot, or the database when it
+    has none, and reports the version it used as 'snapshot_version'.
+
+    A failing shard is retried on its own; after the last retry it reports
+    the failure instead of raising, so the summary still runs.
+    """
+    def report(done, total):
+        self.update_state(state='PROGRESS', meta={'shard': shard, 'done': done, 'total': total})
+
+    result = {'shard': shard, 'start': start, 'stop': stop, 'attempts': self.request.retries + 1}
+    try:
+        try:
+            snapshot = open_snapshot(snapshot_version)
+        except FileNotFoundError:
+            snapshot = current_snapshot()
+            music_logger.warning(
+                f"Recommendation shard {shard}: snapshot {snapshot_version} is not available here, "
+                f"scoring against {f'snapshot {snapshot.version}' if snapshot else 'the database'}"
+            )
+        stats = generate_recommendations(
+            user_range=(start, stop),
+            on_progress=report,
+            embeddings=(snapshot.track_ids, snapshot.embeddings) if snapshot else None,
+        )
+    except Exception as exc:
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=exc)
+        music_logger.error(f"Recommendation shard {shard} [{start}, {stop}) failed: {exc}")
+        return {**result, 'failed': True, 'error': str(exc), 'users': 0, 'seconds': 0.0}
+    return {**result, **stats, 'snapshot_version': snapshot.version if snapshot else None, 'failed': False}
+
+
+@shared_task
+def summarize_recommendation_shards_task(results, dispatched_at):
+    """
+    Chord callback: per-shard timing and totals for one generation run.
+    `parallelism` is the summed shard time over the wall time; it grows
+    with the number of workers serving the shards.
+    """
+    wall = time.time() - dispatched_at
+    busy = sum(result['seconds'] for result in results)
+    summary = {
+        'shards': len(results),
+        'users': sum(result['users'] for result in results),
+        'failed_shards': [result['shard'] for result in results if result['failed']],
+        'wall_seconds': wall,
+        'shard_seconds': busy,
+        'parallelism': busy / wall if wall > 0 else 0.0,
+        'per_shard': sorted(results, key=lambda result: result['shard']),
+    }
+    for result in summary['per_shard']:
+        music_logger.info(
+            f"  shard {result['shard']:>3} [{result['start']}, {result['stop']}): {result['users']} users "
+            f"in {result['seconds']:.1f}s, attempt {result['attempts']}"
+            + (f", FAILED: {result['error']}" if result['failed'] else '')
+        )
+    music_logger.info(
+        f"Recommendations generated for {summary['users']} users over {summary['shards']} shards in "
+        f"{wall:.1f}s wall ({busy:.1f}s of shard work, x{summary['parallelism']:.1f}), "
+        f"{len(summary['failed_shards'])} failed"
+    )
+    return summary
+
+
+@shared_task
+def generate_recommendations_task(shards=None):
+    """
+    Celery task to regenerate all user recommendations (scheduled nightly).
+
+    Publishes a fresh embedding snapshot, splits users into `shards`
+    (RECOMMENDATION_SHARDS) id ranges of similar size and fans out one
+    in-process shard task per range as a chord; every shard scores against
+    the same snapshot version. Returns the task ids to poll.
+    """
+    ranges = user_id_shards(shards or settings.RECOMMENDATION_SHARDS)
+    if not ranges:
+        return {'shards': 0}
+
+    snapshot_version, _ = write_snapshot()
+    workflow = chord(
+        [
+            generate_recommendations_shard_task.s(shard, start, stop, snapshot_version)
+            for shard, (start, stop) in enumerate(ranges)
+        ],
+        summarize_recommendation_shards_task.s(time.time()),
+    )
+    result = workflow.freeze()  # assigns every task id up front so callers can poll them
+    workflow.apply_async()
+    return {
+        'shards': len(ranges),
+        'snapshot_version': snapshot_version,
+        'summary_task_id': result.id,
+        'shard_task_ids': [child.id for child in result.parent.results],
+    }
+
+
+@shared_task(ignore_result=True)
+def refresh_user_recommendations_task(user_id):
+    """
+    Debounced per-user refresh queued by new likes (see schedule_like_refresh).
+    """
+    clear_pending_refresh(user_id)
+    refresh_user_recommendations(user_id)
+
+
 @shared_task
-def generate_recommendations_task():
+def build_embedding_snapshot_task():
     """
-    Celery task to trigger full user recommendation regeneration.
+    Celery task to publish a new memory-mapped embedding snapshot.
+    Workers pick it up on their next snapshot check. Queued (debounced) by
+    feature writes, see schedule_snapshot_rebuild.
+    """
+    clear_pending_rebuild()
+    version, count = write_snapshot()
+    return f"Snapshot {version} written with {count} tracks."
+
+
+
+@shared_task
+def build_item_neighbours_task():
+    """
+    Celery task to rebuild and publish the item-item neighbour table.
+    """
+    stats = write_neighbours()
+    return f"Neighbour table {stats['version']} written: {stats['tracks']} tracks, {stats['neighbours']} neighbours."
+
+@shared_task(ignore_result=True)
+def drain_listen_buffer_task():
+    """
+    Celery beat task: bulk-writes buffered listens into ListeningHistory.
+    """
+    return drain()
+
+
+@worker_shutting_down.connect
+def drain_listen_buffer_on_shutdown(**kwargs):
+    """
+    Flush what is left in the listen buffer before the worker exits.
     """
     try:
-        subprocess.run(['python', 'manage.py', 'generate_recommendations'], check=True)
-        return "Successfully regenerated all recommendations."
-    except subprocess.CalledProcessError as e:
-        return f"Error regenerating recommendations: {e}"
+        drain()
+    except Exception as exc:
+        music_logger.error(f"Listen buffer drain on shutdown failed: {exc}")
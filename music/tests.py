@@ -1,3 +1,1156 @@
-from django.test import TestCase
+import json
+import tempfile
+from collections import defaultdict
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import soundfile as sf
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from music.fields import VECTOR_HEADER, pack_vector, unpack_vector
+from music.management.commands.benchmark_feature_extraction import reference_features
+from music.models import (
+    FeatureCacheEntry, Interaction, ListeningHistory, Track, TrackFeature, TrackStatistics, TrackStatisticsShard,
+    TrackTrend, UserTasteProfile,
+)
+from music.serializers import TrackStatisticsSerializer
+from music.tasks import generate_recommendations_shard_task, summarize_recommendation_shards_task
+from music.utils import hybrid_ranker, track_index
+from music.utils.ann import ExactIndex, IVFIndex
+from music.utils.audio_loading import AnalysisProfile, load_analysis_audio
+from music.utils.batch_extraction import Checkpoint
+from music.utils.batch_recommendations import generate_recommendations, user_id_ranges, user_id_shards
+from music.utils.embedding_snapshot import open_snapshot, snapshots, write_snapshot
+from music.utils.feature_cache import cache_key, cached_extract_features
+from music.utils.feature_extraction import FEATURE_EXTRACTOR_VERSION, analyze_signal, predict_mood
+from music.utils.implicit_mf import factor_models, factor_recommendations, save_factors, solve_rows, train_als
+from music.utils.incremental_recommendations import refresh_user_recommendations
+from music.utils.interaction_ingest import ingest_interactions
+from music.utils.item_cf import (
+    collaborative_recommendations, item_neighbours, load_interaction_matrix, neighbour_tables, write_neighbours,
+)
+from music.utils.listen_buffer import drain
+from music.utils.mood import predict_moods
+from music.utils.recommendations import load_embedding_matrix
+from music.utils.track_counters import recount_statistics, track_counts
+from music.utils.trending import current_epoch, decayed, flush_buffered_events, record_events, trending_snapshot
+from playlists.models import UserRecommendation
+from users.models import Artist, User
+
+
+def make_user(name):
+    return User.objects.create_user(username=name, email=f'{name}@example.com', password='x')
+
+
+def make_track(artist, title='Track', approval_status='approved'):
+    return Track.objects.create(artist=artist, title=title, approval_status=approval_status)
+
+
+def make_feature(track, energy=0.5, valence=0.5, mood='happy'):
+    return TrackFeature.objects.create(
+        track=track, danceability=0.5, energy=energy, valence=valence, tempo=120.0, speechiness=0.1,
+        instrumentalness=0.1, acousticness=0.1, liveness=0.1, mood=mood,
+    )
+
+
+class FakeRedis:
+    """
+    In-memory stand-in for the hash commands the trending buffer uses.
+    Pipelined commands run at once; execute() returns their results.
+    """
+
+    def __init__(self):
+        self.hashes = {}
+        self.results = []
+
+    def pipeline(self):
+        return self
+
+    def hincrbyfloat(self, key, field, value):
+        fields = self.hashes.setdefault(key, {})
+        fields[field.encode()] = float(fields.get(field.encode(), 0.0)) + value
+        self.results.append(fields[field.encode()])
+
+    def hgetall(self, key):
+        self.results.append(dict(self.hashes.get(key, {})))
+
+    def delete(self, key):
+        self.results.append(int(self.hashes.pop(key, None) is not None))
+
+    def execute(self):
+        results, self.results = self.results, []
+        return results
+
+
+class MusicTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Artifacts (snapshots, neighbour tables, factors) go to a throwaway directory
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.artifacts = Path(directory.name)
+        override = override_settings(
+            EMBEDDING_SNAPSHOT_DIR=str(self.artifacts / 'snapshots'),
+            ITEM_CF_DIR=str(self.artifacts / 'item_cf'),
+            MF_DIR=str(self.artifacts / 'implicit_mf'),
+            LISTEN_BUFFER_ENABLED=False,  # no Redis here; tests that need it mock get_client
+        )
+        override.enable()
+        self.addCleanup(override.disable)
+        for published in (snapshots, neighbour_tables, factor_models):
+            published.invalidate()
+            self.addCleanup(published.invalidate)
+        self.listener = make_user('listener')
+        self.artist = Artist.objects.create(user=make_user('artist'), display_name='Artist')
+        self.track = make_track(self.artist)
+
+
+class LikeRefreshTests(MusicTestCase):
+    def test_like_enqueues_refresh(self):
+        with mock.patch('music.tasks.refresh_user_recommendations_task.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                Interaction.objects.create(user=self.listener, track=self.track, interaction_type='like')
+
+        apply_async.assert_called_once()
+        self.assertEqual(apply_async.call_args.args[0], (self.listener.id,))
+
+    def test_burst_of_likes_enqueues_one_refresh(self):
+        other = make_track(self.artist, 'Other')
+        with mock.patch('music.tasks.refresh_user_recommendations_task.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                Interaction.objects.create(user=self.listener, track=self.track, interaction_type='like')
+            with self.captureOnCommitCallbacks(execute=True):
+                Interaction.objects.create(user=self.listener, track=other, interaction_type='like')
+
+        apply_async.assert_called_once()
+
+    def test_batch_ingest_enqueues_refresh(self):
+        events = [{'track': self.track.id, 'interaction_type': 'like'}]
+        with mock.patch('music.tasks.refresh_user_recommendations_task.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                ingest_interactions(self.listener, events)
+
+        apply_async.assert_called_once()
+
+    def test_comment_does_not_enqueue_refresh(self):
+        with mock.patch('music.tasks.refresh_user_recommendations_task.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                Interaction.objects.create(
+                    user=self.listener, track=self.track, interaction_type='comment', comment_text='Nice',
+                )
+
+        apply_async.assert_not_called()
+
+    def test_uncommitted_like_leaves_no_pending_marker(self):
+        with mock.patch('music.tasks.refresh_user_recommendations_task.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=False):
+                Interaction.objects.create(user=self.listener, track=self.track, interaction_type='like')
+
+        apply_async.assert_not_called()
+        self.assertIsNone(cache.get(f'like_refresh_pending:{self.listener.id}'))
+
+    def test_type_change_drops_profile_and_enqueues_refresh(self):
+        interaction = Interaction.objects.create(
+            user=self.listener, track=self.track, interaction_type='comment', comment_text='Nice',
+        )
+        for new_type in ('like', 'comment'):
+            UserTasteProfile.objects.create(user=self.listener, like_count=1, last_like_id=interaction.id)
+            cache.clear()
+            with mock.patch('music.tasks.refresh_user_recommendations_task.apply_async') as apply_async:
+                with self.captureOnCommitCallbacks(execute=True):
+                    interaction.interaction_type, interaction.comment_text = new_type, 'Nice'
+                    interaction.save()
+
+            apply_async.assert_called_once()
+            self.assertFalse(UserTasteProfile.objects.filter(user=self.listener).exists())
+
+
+class IncrementalRefreshTests(MusicTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tracks = [
+            make_track(self.artist, f'Track {n}') for n in range(10)
+        ]
+        for n, track in enumerate(self.tracks):
+            make_feature(track, energy=n / 10, valence=(n * 7 % 10) / 10, mood='happy' if n % 2 else 'sad')
+
+    def like(self, track):
+        Interaction.objects.create(user=self.listener, track=track, interaction_type='like')
+
+    def batch_ranking(self):
+        rankings = {}
+        with mock.patch('music.utils.batch_recommendations.save_user_recommendations', side_effect=rankings.update):
+            generate_recommendations(top_n=5)
+        return rankings[self.listener.id]
+
+    def assert_matches_batch(self, ranking):
+        expected = self.batch_ranking()
+        self.assertEqual([track_id for track_id, _ in ranking], [track_id for track_id, _ in expected])
+        for (_, score), (_, expected_score) in zip(ranking, expected):
+            self.assertAlmostEqual(score, expected_score, places=5)
+
+    def test_folds_match_the_batch_generator(self):
+        self.like(self.tracks[0])
+        self.like(self.tracks[3])
+        refresh_user_recommendations(self.listener.id, top_n=5)
+
+        # A second like of a folded track must not count twice
+        self.like(self.tracks[7])
+        self.like(self.tracks[3])
+        ranking = refresh_user_recommendations(self.listener.id, top_n=5)
+
+        self.assertEqual(UserTasteProfile.objects.get(user=self.listener).like_count, 3)
+        self.assert_matches_batch(ranking)
+
+    def test_unlike_rebuilds_the_profile(self):
+        for position in (1, 4, 8):
+            self.like(self.tracks[position])
+        refresh_user_recommendations(self.listener.id, top_n=5)
+
+        Interaction.objects.filter(user=self.listener, track=self.tracks[4]).get().delete()
+        ranking = refresh_user_recommendations(self.listener.id, top_n=5)
+
+        self.assertEqual(UserTasteProfile.objects.get(user=self.listener).like_count, 2)
+        self.assert_matches_batch(ranking)
+
+    def test_nothing_new_is_a_no_op(self):
+        self.like(self.tracks[2])
+        self.assertIsNotNone(refresh_user_recommendations(self.listener.id))
+        self.assertIsNone(refresh_user_recommendations(self.listener.id))
+
+    def test_like_of_unembedded_track_is_folded_once_embedded(self):
+        self.like(self.track)  # no TrackFeature yet
+        self.like(self.tracks[0])
+        refresh_user_recommendations(self.listener.id, top_n=5)
+        self.assertEqual(UserTasteProfile.objects.get(user=self.listener).like_count, 1)
+
+        make_feature(self.track, energy=0.9, valence=0.1)
+        self.like(self.tracks[5])
+        ranking = refresh_user_recommendations(self.listener.id, top_n=5)
+
+        profile = UserTasteProfile.objects.get(user=self.listener)
+        self.assertEqual((profile.like_count, profile.pending_like_ids), (3, []))
+        self.assert_matches_batch(ranking)
+
+    def test_new_embedding_version_rebuilds_the_profile(self):
+        self.like(self.tracks[1])
+        self.like(self.tracks[2])
+        refresh_user_recommendations(self.listener.id, top_n=5)
+
+        # A relabel or rescale rewrites embeddings and publishes a new snapshot
+        feature = TrackFeature.objects.get(track=self.tracks[1])
+        feature.energy = 0.95
+        feature.save()
+        version, _ = write_snapshot()
+        snapshots.invalidate()
+        self.like(self.tracks[6])
+        ranking = refresh_user_recommendations(self.listener.id, top_n=5)
+
+        profile = UserTasteProfile.objects.get(user=self.listener)
+        self.assertEqual((profile.embedding_version, profile.like_count), (f'snapshot:{version}', 3))
+        self.assert_matches_batch(ranking)
+
+    def test_unapproved_tracks_are_never_recommended(self):
+        rejected = make_track(self.artist, 'Rejected', approval_status='rejected')
+        make_feature(rejected, energy=0.1, valence=0.7)  # a twin of tracks[1]
+        self.like(self.tracks[1])
+
+        ranking = refresh_user_recommendations(self.listener.id, top_n=5)
+
+        self.assertNotIn(rejected.id, [track_id for track_id, _ in ranking])
+        self.assert_matches_batch(ranking)
+
+
+class BatchRecommendationTests(MusicTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tracks = [make_track(self.artist, f'Track {n}') for n in range(6)]
+        for n, track in enumerate(self.tracks):
+            make_feature(track, energy=n / 5, valence=1 - n / 5)
+        self.fan = make_user('fan')
+
+    def like(self, user, track):
+        Interaction.objects.create(user=user, track=track, interaction_type='like')
+
+    def rankings(self, **kwargs):
+        rankings = {}
+        with mock.patch('music.utils.batch_recommendations.save_user_recommendations', side_effect=rankings.update):
+            stats = generate_recommendations(top_n=3, **kwargs)
+        return rankings, stats
+
+    def test_rankings_skip_liked_and_unapproved_tracks(self):
+        self.tracks[1].approval_status = 'rejected'
+        self.tracks[1].save()
+        self.like(self.listener, self.tracks[0])
+        self.like(self.listener, self.tracks[0])  # a repeated like counts once
+
+        rankings, stats = self.rankings()
+
+        ranked = [track_id for track_id, _ in rankings[self.listener.id]]
+        self.assertEqual((stats['users'], len(ranked)), (1, 3))
+        self.assertFalse({self.tracks[0].id, self.tracks[1].id} & set(ranked))
+
+    def test_user_range_limits_the_run_and_reports_progress(self):
+        self.like(self.listener, self.tracks[0])
+        self.like(self.fan, self.tracks[5])
+        progress = mock.Mock()
+
+        rankings, stats = self.rankings(user_range=(self.fan.id, self.fan.id + 1), on_progress=progress)
+
+        self.assertEqual((list(rankings), stats['users']), ([self.fan.id], 1))
+        progress.assert_called_once_with(1, 1)
+
+    def test_stores_rankings_in_rank_order(self):
+        self.like(self.listener, self.tracks[5])
+        rankings, _ = self.rankings()
+
+        generate_recommendations(top_n=3)
+
+        through = UserRecommendation.tracks.through.objects.filter(userrecommendation__user=self.listener)
+        self.assertEqual(
+            list(through.order_by('id').values_list('track_id', flat=True)),
+            [track_id for track_id, _ in rankings[self.listener.id]],
+        )
+
+
+@override_settings(TRACK_INDEX_CHECK_SECONDS=0)
+class TrackIndexTests(MusicTestCase):
+    def setUp(self):
+        super().setUp()
+        self.index = track_index.TrackVectorIndex(lambda feature: [feature.energy, feature.valence], name='test')
+        self.addCleanup(track_index._registry.remove, self.index)
+
+    def test_local_write_is_applied_in_place(self):
+        self.assertEqual(len(self.index), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            make_feature(self.track)
+
+        with mock.patch.object(self.index, 'load') as load:
+            self.assertEqual(self.index.top_k([0.5, 0.5], k=1)[0][0], self.track.id)
+        load.assert_not_called()
+
+    def test_write_elsewhere_reloads_on_version_bump(self):
+        self.assertEqual(len(self.index), 0)
+        # As if another process wrote the row: no local signal reached the index
+        with mock.patch('music.signals.registered_indexes', return_value=[]):
+            with self.captureOnCommitCallbacks(execute=True):
+                make_feature(self.track)
+
+        self.assertEqual([track_id for track_id, _ in self.index.top_k([0.5, 0.5], k=5)], [self.track.id])
+
+    def test_rejection_removes_track(self):
+        make_feature(self.track)
+        self.assertEqual(len(self.index), 1)
+        self.track.approval_status = 'rejected'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.track.save()
+
+        self.assertEqual(len(self.index), 0)
+
+    def test_only_approval_changes_bump_the_version(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_feature(self.track)
+        version = cache.get(track_index.VERSION_KEY)
+
+        self.track.title = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.track.save()
+            make_track(self.artist, 'New')
+        self.assertEqual(cache.get(track_index.VERSION_KEY), version)
+
+        self.track.approval_status = 'rejected'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.track.save(update_fields=['title'])
+        self.assertEqual(cache.get(track_index.VERSION_KEY), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.track.save()
+        self.assertEqual(cache.get(track_index.VERSION_KEY), version + 1)
+
+
+class SnapshotRebuildTests(MusicTestCase):
+    def test_feature_writes_queue_one_rebuild(self):
+        (self.artifacts / 'snapshots').mkdir()
+        (self.artifacts / 'snapshots' / 'CURRENT').write_text('v1')
+        other = make_track(self.artist, 'Other')
+        with mock.patch('music.tasks.build_embedding_snapshot_task.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                make_feature(self.track)
+                make_feature(other)
+
+        apply_async.assert_called_once()
+
+    def test_no_rebuild_without_published_snapshot(self):
+        with mock.patch('music.tasks.build_embedding_snapshot_task.apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                make_feature(self.track)
+
+        apply_async.assert_not_called()
+
+
+class EmbeddingSnapshotTests(MusicTestCase):
+    def setUp(self):
+        super().setUp()
+        for energy in range(12):
+            make_feature(make_track(self.artist, f'Track {energy}'), energy=energy / 12, valence=1 - energy / 12)
+
+    def test_ivf_index_is_saved_with_the_snapshot(self):
+        with mock.patch('music.utils.embedding_snapshot.IVF_MIN_VECTORS', 1):
+            version, count = write_snapshot()
+        snapshot = open_snapshot(version)
+
+        index = snapshot.search_index()
+        self.assertIsInstance(index, IVFIndex)
+        self.assertEqual(count, 12)
+        # Probing every list is an exact scan
+        positions, _ = index.search(snapshot.embeddings[0], k=5, exclude=[0], nprobe=index.n_lists)
+        expected, _ = ExactIndex(snapshot.embeddings, snapshot.norms).search(snapshot.embeddings[0], k=5, exclude=[0])
+        self.assertEqual(sorted(positions.tolist()), sorted(expected.tolist()))
+
+    def test_small_catalog_uses_exact_search(self):
+        version, _ = write_snapshot()
+        self.assertIsInstance(open_snapshot(version).search_index(), ExactIndex)
+
+
+class ItemNeighbourTests(MusicTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tracks = [self.track] + [make_track(self.artist, f'Track {n}') for n in range(1, 5)]
+        fans = [make_user(f'fan{n}') for n in range(4)]
+        for fan, liked in zip(fans, ([0, 1], [0, 1, 2], [1, 2, 3], [3, 4])):
+            for position in liked:
+                Interaction.objects.create(user=fan, track=self.tracks[position], interaction_type='like')
+        ListeningHistory.objects.create(user=fans[0], track=self.tracks[2])
+        Interaction.objects.create(user=self.listener, track=self.track, interaction_type='like')
+
+    def dense_similarities(self, matrix):
+        dense = matrix.toarray().astype(np.float64)
+        normalized = dense / np.linalg.norm(dense, axis=0)
+        similarities = normalized.T @ normalized
+        np.fill_diagonal(similarities, 0.0)
+        return similarities
+
+    def test_matrix_is_the_same_in_small_chunks(self):
+        user_ids, track_ids, matrix = load_interaction_matrix()
+        with self.assertNumQueries(10):  # 5 tracks, 11 interactions, 1 listen: 3 + 6 + 1 chunks of 2
+            chunked = load_interaction_matrix(chunk_size=2)
+
+        np.testing.assert_array_equal(chunked[0], user_ids)
+        np.testing.assert_array_equal(chunked[1], track_ids)
+        self.assertEqual((chunked[2] != matrix).nnz, 0)
+
+    def test_neighbours_match_dense_cosine(self):
+        _, track_ids, matrix = load_interaction_matrix()
+        similarities = self.dense_similarities(matrix)
+        # A chunk smaller than the catalogue exercises the chunked product
+        indptr, neighbours, scores = item_neighbours(matrix, k=2, chunk_size=2)
+
+        for row in range(len(track_ids)):
+            found = slice(indptr[row], indptr[row + 1])
+            expected = np.sort(similarities[row][similarities[row] > 0])[::-1][:2]
+            np.testing.assert_allclose(scores[found], expected, rtol=1e-5)
+            np.testing.assert_allclose(scores[found], similarities[row, neighbours[found]], rtol=1e-5)
+
+    def test_recommend_sums_weighted_similarities(self):
+        write_neighbours(k=10)
+        _, track_ids, matrix = load_interaction_matrix()
+        similarities = self.dense_similarities(matrix)
+        liked = int(np.searchsorted(track_ids, self.track.id))
+
+        results = collaborative_recommendations(self.listener.id, k=10)
+
+        weight = np.log1p(settings.ITEM_CF_WEIGHTS['like'])
+        expected = {
+            int(track_ids[col]): weight * similarities[liked, col]
+            for col in np.flatnonzero(similarities[liked] > 0)
+        }
+        self.assertEqual({track_id for track_id, _ in results}, set(expected))
+        for track_id, score in results:
+            self.assertAlmostEqual(score, expected[track_id], places=5)
+        self.assertEqual([score for _, score in results], sorted((score for _, score in results), reverse=True))
+
+
+class ImplicitFactorTests(MusicTestCase):
+    strengths = np.array([
+        [2.0, 1.0, 0.0, 0.0, 0.0],
+        [1.0, 0.0, 3.0, 0.0, 0.0],
+        [0.0, 1.0, 1.0, 0.0, 2.0],
+        [0.0, 0.0, 0.0, 1.0, 1.0],
+        [1.0, 0.0, 0.0, 2.0, 0.0],
+        [0.0, 3.0, 0.0, 0.0, 1.0],
+    ], dtype=np.float32)
+
+    def matrix(self):
+        from scipy import sparse
+        return sparse.csr_matrix(self.strengths)
+
+    def test_row_solve_matches_dense_normal_equations(self):
+        fixed = np.random.default_rng(1).normal(0, 0.5, (5, 3)).astype(np.float32)
+        gram = fixed.T.astype(np.float64) @ fixed.astype(np.float64)
+        solved = solve_rows(self.matrix(), fixed, gram, regularization=0.1, alpha=2.0)
+
+        Y = fixed.astype(np.float64)
+        for row, strengths in enumerate(self.strengths):
+            confidence = np.diag(1.0 + 2.0 * strengths)
+            preference = (strengths > 0).astype(np.float64)
+            expected = np.linalg.solve(Y.T @ confidence @ Y + 0.1 * np.eye(3), Y.T @ confidence @ preference)
+            np.testing.assert_allclose(solved[row], expected, rtol=1e-4, atol=1e-6)
+
+    def test_loss_decreases_and_pool_matches_single_process(self):
+        options = dict(factors=3, regularization=0.1, alpha=2.0, iterations=5, tolerance=0.0, block_size=2)
+        users, items, history = train_als(self.matrix(), workers=1, **options)
+        losses = [stats['loss'] for stats in history]
+        self.assertEqual(len(losses), 5)
+        self.assertEqual(losses, sorted(losses, reverse=True))
+
+        pooled_users, pooled_items, _ = train_als(self.matrix(), workers=2, **options)
+        np.testing.assert_allclose(pooled_users, users, rtol=1e-5, atol=1e-6)
+        np.testing.assert_allclose(pooled_items, items, rtol=1e-5, atol=1e-6)
+
+    def test_recommend_ranks_by_dot_product(self):
+        users, items, _ = train_als(self.matrix(), factors=3, alpha=2.0, iterations=5, workers=1)
+        user_ids, track_ids = np.arange(10, 16), np.arange(100, 105)
+        save_factors(user_ids, track_ids, users, items)
+
+        results = factor_recommendations(10, k=3, exclude=[100])
+
+        scores = items @ users[0]
+        expected = [int(track_ids[col]) for col in np.argsort(-scores) if track_ids[col] != 100][:3]
+        self.assertEqual([track_id for track_id, _ in results], expected)
+        self.assertEqual(factor_recommendations(99), [])
+
+    def test_command_reads_interactions_in_fetch_size_chunks(self):
+        Interaction.objects.create(user=self.listener, track=self.track, interaction_type='like')
+        command = 'music.management.commands.train_implicit_mf'
+        with mock.patch(f'{command}.load_interaction_matrix', wraps=load_interaction_matrix) as load, \
+                mock.patch(f'{command}.connections'):  # closing it would break the test transaction
+            call_command(
+                'train_implicit_mf', '--workers=1', '--iterations=2', '--factors=2', '--fetch-size=2', stdout=StringIO(),
+            )
+
+        load.assert_called_once_with(chunk_size=2)
+        self.assertTrue(factor_models.published())
+
+
+class ListenBufferTests(MusicTestCase):
+    def buffered_client(self, raw_events, queued_trends=None):
+        """
+        Redis stand-in for drain(): the lock is free, the list holds `raw_events`
+        and the trending hash holds `queued_trends`.
+        """
+        client = mock.MagicMock()
+        client.set.return_value = True
+        client.lrange.side_effect = lambda key, start, stop: raw_events[start:stop + 1]
+        client.ltrim.side_effect = lambda key, start, stop: raw_events.__delitem__(slice(0, start))
+        client.llen.side_effect = lambda key: len(raw_events)
+        client.pipeline.return_value.execute.return_value = [queued_trends or {}, 1]
+        return client
+
+    def event(self, user_id, track_id):
+        return json.dumps({'user': user_id, 'track': track_id, 'at': timezone.now().isoformat()}).encode()
+
+    def test_drain_writes_rows_and_counters(self):
+        gone = make_track(self.artist, 'Gone')
+        raw_events = [
+            self.event(self.listener.id, self.track.id),
+            self.event(self.listener.id, self.track.id),
+            self.event(self.listener.id, gone.id),
+            b'not json',
+        ]
+        gone.delete()
+
+        with mock.patch('music.utils.listen_buffer.get_client', return_value=self.buffered_client(raw_events)):
+            stats = drain(batch_size=3)
+
+        self.assertEqual((stats['flushed'], stats['dropped'], stats['batches'], stats['depth']), (2, 2, 2, 0))
+        self.assertEqual(ListeningHistory.objects.filter(track=self.track).count(), 2)
+        self.assertEqual(track_counts([self.track.id])[self.track.id]['plays_count'], 2)
+
+    def test_drain_writes_queued_trending_increments(self):
+        epoch = int(current_epoch().timestamp())
+        gone = make_track(self.artist, 'Gone')
+        queued = {f'{self.track.id}:{epoch}'.encode(): b'3.5', f'{gone.id}:{epoch}'.encode(): b'1.0'}
+        gone.delete()
+
+        with mock.patch('music.utils.listen_buffer.get_client', return_value=self.buffered_client([], queued)):
+            stats = drain()
+
+        self.assertEqual(stats['trending'], 2)
+        self.assertEqual(list(TrackTrend.objects.values_list('track_id', 'score')), [(self.track.id, 3.5)])
+
+    def test_unknown_track_is_rejected_before_buffering(self):
+        client = APIClient()
+        client.force_authenticate(self.listener)
+        with mock.patch('music.views.buffer_listen', return_value=True) as buffer_listen:
+            missing = client.post('/api/v1/listening-history/', {'track': self.track.id + 1000}, format='json')
+            queued = client.post('/api/v1/listening-history/', {'track': self.track.id}, format='json')
+
+        self.assertEqual(missing.status_code, 400)
+        self.assertEqual(queued.status_code, 202)
+        self.assertEqual(queued.data['status'], 'queued')
+        buffer_listen.assert_called_once()
+
+
+class InteractionBatchTests(MusicTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.listener)
+        self.other = make_track(self.artist, 'Other')
+
+    def post(self, events):
+        with mock.patch('music.utils.interaction_ingest.apply_deltas') as apply_deltas, \
+                mock.patch('music.utils.interaction_ingest.record_events') as record_events, \
+                mock.patch('music.utils.interaction_ingest.schedule_like_refresh') as schedule_like_refresh:
+            response = self.client.post('/api/v1/interactions/batch/', events, format='json')
+        return response, apply_deltas, record_events, schedule_like_refresh
+
+    def test_mixed_batch_reports_each_item(self):
+        Interaction.objects.create(user=self.listener, track=self.track, interaction_type='like')
+
+        response, apply_deltas, record_events, schedule_like_refresh = self.post([
+            {'track': self.track.id, 'interaction_type': 'like'},  # already liked
+            {'track': self.other.id, 'interaction_type': 'like'},
+            {'track': self.other.id, 'interaction_type': 'like'},  # repeated in the batch
+            {'track': self.other.id, 'interaction_type': 'stream'},
+            {'track': self.other.id + 1000, 'interaction_type': 'stream'},
+            {'track': self.other.id, 'interaction_type': 'comment'},
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        counts = (response.data['created'], response.data['duplicates'], response.data['failed'])
+        self.assertEqual(counts, (2, 2, 2))
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['duplicate', 'created', 'duplicate', 'created', 'invalid', 'invalid'],
+        )
+        self.assertEqual(Interaction.objects.filter(user=self.listener, track=self.other).count(), 2)
+
+        self.assertEqual(apply_deltas.call_args.args[0], {self.other.id: {'likes_count': 1}})
+        events = sorted((track_id, kind) for track_id, kind, _ in record_events.call_args.args[0])
+        self.assertEqual(events, [(self.other.id, 'like'), (self.other.id, 'stream')])
+        schedule_like_refresh.assert_called_once_with(self.listener.id)
+
+    def test_batch_of_duplicates_is_not_an_error(self):
+        Interaction.objects.create(user=self.listener, track=self.track, interaction_type='like')
+
+        response, apply_deltas, _, schedule_like_refresh = self.post(
+            [{'track': self.track.id, 'interaction_type': 'like'}],
+        )
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [{'index': 0, 'status': 'duplicate'}])
+        apply_deltas.assert_called_once_with({})
+        schedule_like_refresh.assert_not_called()
+
+    def test_batch_of_invalid_events_is_rejected(self):
+        response, *_ = self.post([{'track': self.track.id, 'interaction_type': 'skip'}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['failed'], 1)
+
+
+class TrackCounterTests(MusicTestCase):
+    def totals(self):
+        cache.clear()  # track_counts caches briefly
+        counts = track_counts([self.track.id])[self.track.id]
+        return {field: counts[field] for field in ('plays_count', 'likes_count', 'comments_count')}
+
+    def test_shard_totals_match_reconciliation(self):
+        listeners = [make_user(f'fan{n}') for n in range(5)]
+        for user in listeners:
+            Interaction.objects.create(user=user, track=self.track, interaction_type='like')
+            ListeningHistory.objects.create(user=user, track=self.track)
+        Interaction.objects.create(user=listeners[0], track=self.track, interaction_type='comment', comment_text='Hi')
+        ingest_interactions(listeners[1], [{'track': self.track.id, 'interaction_type': 'comment', 'comment_text': 'Yo'}])
+        Interaction.objects.filter(user=listeners[2], interaction_type='like').get().delete()
+
+        self.assertEqual(self.totals(), recount_statistics()[self.track.id])
+        self.assertEqual(self.totals(), {'plays_count': 5, 'likes_count': 4, 'comments_count': 2})
+
+    def test_serializer_reports_shard_totals_without_touching_the_row(self):
+        ListeningHistory.objects.create(user=self.listener, track=self.track)
+        Interaction.objects.create(user=self.listener, track=self.track, interaction_type='like')
+        statistics = TrackStatistics.objects.get(track=self.track)
+
+        data = TrackStatisticsSerializer(statistics).data
+        self.assertEqual((data['plays_count'], data['likes_count']), (1, 1))
+        self.assertEqual((statistics.plays_count, statistics.likes_count), (0, 0))
+
+    def test_type_change_moves_the_count(self):
+        like = Interaction.objects.create(user=self.listener, track=self.track, interaction_type='like')
+        like.interaction_type = 'comment'
+        like.comment_text = 'Changed my mind'
+        like.save()
+
+        self.assertEqual(self.totals(), {'plays_count': 0, 'likes_count': 0, 'comments_count': 1})
+        self.assertEqual(self.totals(), recount_statistics()[self.track.id])
+
+    def test_list_orders_by_latest_shard_activity(self):
+        quiet = make_track(self.artist, 'Quiet')
+        ListeningHistory.objects.create(user=self.listener, track=self.track)
+        ListeningHistory.objects.create(user=self.listener, track=quiet)
+        TrackStatisticsShard.objects.filter(track=quiet).update(updated_at=timezone.now() - timedelta(days=1))
+        TrackStatistics.objects.update(updated_at=timezone.now() - timedelta(days=2))
+
+        response = APIClient().get('/api/v1/track-statistics/')
+
+        self.assertEqual([row['track'] for row in response.data['results']], [self.track.id, quiet.id])
+
+
+@override_settings(TRENDING_HALF_LIFE_HOURS=1.0, TRENDING_EPOCH_DAYS=1, TRENDING_WEIGHTS={'like': 3.0, 'listen': 1.0})
+class TrendingTests(MusicTestCase):
+    def live_score(self, track, now):
+        trend = TrackTrend.objects.get(track=track)
+        return decayed(trend.score, trend.epoch, now)
+
+    def listen(self, user):
+        ListeningHistory.objects.create(user=user, track=self.track)
+
+    def test_request_path_events_are_queued_for_the_drain(self):
+        client = FakeRedis()
+        with mock.patch('music.utils.listen_buffer.get_client', return_value=client):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.listen(self.listener)
+                self.listen(make_user('fan'))
+
+        self.assertFalse(TrackTrend.objects.exists())
+        self.assertEqual(flush_buffered_events(client), 1)
+        self.assertAlmostEqual(self.live_score(self.track, timezone.now()), 2.0, places=3)
+        self.assertEqual(flush_buffered_events(client), 0)
+
+    def test_request_path_records_directly_without_redis(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listen(self.listener)
+
+        self.assertAlmostEqual(self.live_score(self.track, timezone.now()), 1.0, places=3)
+
+    def test_forward_decay_matches_direct_decay(self):
+        now = current_epoch() + timedelta(hours=12)
+        events = [('like', 0.5), ('listen', 2.0), ('like', 3.0)]  # (kind, hours ago)
+        record_events([(self.track.id, kind, now - timedelta(hours=ago)) for kind, ago in events], now=now)
+
+        expected = sum({'like': 3.0, 'listen': 1.0}[kind] * 0.5 ** ago for kind, ago in events)
+        self.assertAlmostEqual(self.live_score(self.track, now), expected)
+        # Reading later only decays the stored score
+        self.assertAlmostEqual(self.live_score(self.track, now + timedelta(hours=1)), expected / 2)
+
+    def test_score_is_rebased_into_a_new_epoch(self):
+        epoch = current_epoch()
+        before = epoch - timedelta(hours=1)
+        after = epoch + timedelta(hours=1)
+        record_events([(self.track.id, 'like', before)], now=before)
+        record_events([(self.track.id, 'like', after)], now=after)
+
+        self.assertEqual(TrackTrend.objects.get(track=self.track).epoch, epoch)
+        self.assertAlmostEqual(self.live_score(self.track, after), 3.0 * 0.5 ** 2 + 3.0)
+
+    def test_view_hydrates_in_one_query_and_skips_rejected_tracks(self):
+        rejected = make_track(self.artist, 'Rejected')
+        now = timezone.now()
+        record_events([(self.track.id, 'like', now), (rejected.id, 'like', now), (rejected.id, 'like', now)])
+        trending_snapshot.invalidate()
+        self.addCleanup(trending_snapshot.invalidate)
+        trending_snapshot.top_k()
+        Track.objects.filter(pk=rejected.pk).update(approval_status='rejected')
+
+        with self.assertNumQueries(1):
+            response = APIClient().get('/api/v1/trending/')
+        self.assertEqual([row['track']['id'] for row in response.data], [self.track.id])
+
+
+class HybridRankerTests(MusicTestCase):
+    def rank_with_recorded_sources(self, **kwargs):
+        called = []
+
+        def source(name):
+            def fetch(user_id, liked, n):
+                called.append(name)
+                return [(self.track.id, 1.0)]
+            return fetch
+
+        fakes = {name: source(name) for name in hybrid_ranker.SOURCES}
+        with mock.patch.dict(hybrid_ranker.SOURCES, fakes):
+            ranking = hybrid_ranker.rank_for_user(self.listener.id, **kwargs)
+        return called, ranking
+
+    def test_sources_run_by_weight_and_lowest_are_skipped(self):
+        with self.assertLogs('music', 'WARNING'):
+            called, ranking = self.rank_with_recorded_sources(budget_ms=1e-6)
+
+        self.assertEqual(called, ['content'])
+        self.assertEqual(ranking['skipped'], ['collaborative', 'factors', 'trending'])
+        self.assertEqual([item['track_id'] for item in ranking['items']], [self.track.id])
+
+    def test_weights_decide_the_order(self):
+        called, _ = self.rank_with_recorded_sources(weights={'trending': 2.0, 'factors': 0.0}, budget_ms=10_000)
+
+        self.assertEqual(called, ['trending', 'content', 'collaborative'])
+
+
+class BackfillCheckpointTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'checkpoint.json'
+        artist = Artist.objects.create(user=make_user('artist'), display_name='Artist')
+        with mock.patch('music.tasks.extract_features_task.delay'):
+            self.tracks = [
+                Track.objects.create(
+                    artist=artist, title=f'Track {n}', approval_status='approved', audio_file=f'audio_files/{n}.wav',
+                )
+                for n in range(3)
+            ]
+
+    def backfill(self, **options):
+        """
+        Runs backfill_features with extraction stubbed out; returns the track ids it would extract.
+        """
+        with mock.patch('music.management.commands.backfill_features.run_backfill') as run_backfill:
+            run_backfill.return_value = defaultdict(int)
+            call_command('backfill_features', checkpoint=str(self.path), workers=1, stdout=StringIO(), **options)
+        return [job[0] for job in run_backfill.call_args.args[0]]
+
+    def test_checkpoint_round_trip(self):
+        checkpoint = Checkpoint(self.path)
+        checkpoint.done.update([1, 2])
+        checkpoint.failed.add(3)
+        checkpoint.save()
+
+        resumed = Checkpoint(self.path)
+        self.assertEqual((resumed.done, resumed.failed), ({1, 2}, {3}))
+
+    def test_checkpoint_resets_when_extractor_version_changes(self):
+        checkpoint = Checkpoint(self.path)
+        checkpoint.done.add(1)
+        checkpoint.save()
+
+        with mock.patch('music.utils.batch_extraction.FEATURE_EXTRACTOR_VERSION', FEATURE_EXTRACTOR_VERSION + 1):
+            stale = Checkpoint(self.path)
+        self.assertEqual((stale.done, stale.failed), (set(), set()))
+
+    def test_resume_skips_done_and_failed_tracks(self):
+        checkpoint = Checkpoint(self.path)
+        checkpoint.done.add(self.tracks[0].id)
+        checkpoint.failed.add(self.tracks[1].id)
+        checkpoint.save()
+
+        self.assertEqual(self.backfill(), [self.tracks[2].id])
+        self.assertEqual(self.backfill(retry_failed=True), [self.tracks[1].id, self.tracks[2].id])
+
+
+class AnalyzeSignalTests(TestCase):
+    def test_single_pass_matches_per_feature_path(self):
+        rng = np.random.default_rng(0)
+        sr = 22050
+        t = np.arange(sr * 5) / sr
+        pulse = (np.sin(2 * np.pi * 2 * t) > 0.9).astype(np.float32)
+        y = (0.3 * np.sin(2 * np.pi * 220 * t) + 0.5 * pulse * rng.standard_normal(len(t))).astype(np.float32)
+
+        expected = reference_features(y, sr)
+        features = analyze_signal(y, sr)
+
+        self.assertEqual(set(features), set(expected))
+        self.assertEqual(features['mood'], expected['mood'])
+        for name in expected.keys() - {'mood'}:
+            np.testing.assert_allclose(np.mean(features[name]), np.mean(expected[name]), rtol=1e-5, err_msg=name)
+
+
+class AudioLoadingTests(TestCase):
+    sr = 8000
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = str(Path(directory.name) / 'clip.wav')
+        self.samples = np.random.default_rng(0).uniform(-0.5, 0.5, (self.sr * 6, 2)).astype(np.float32)
+        sf.write(self.path, self.samples, self.sr, subtype='FLOAT')
+
+    def test_window_is_decoded_in_blocks_from_the_anchor(self):
+        profile = AnalysisProfile(sample_rate=None, max_duration=2.0, block_size=1000)
+        y, sr = load_analysis_audio(self.path, profile, anchor=3.0)
+
+        self.assertEqual(sr, self.sr)
+        np.testing.assert_allclose(y, self.samples[3 * sr:5 * sr].mean(axis=1), atol=1e-6)
+
+    def test_window_is_shifted_back_from_the_end(self):
+        profile = AnalysisProfile(sample_rate=None, max_duration=2.0, block_size=1000)
+        y, sr = load_analysis_audio(self.path, profile, anchor=5.5)
+
+        np.testing.assert_allclose(y, self.samples[4 * sr:].mean(axis=1), atol=1e-6)
+
+    def test_window_is_resampled_while_streaming(self):
+        profile = AnalysisProfile(sample_rate=4000, max_duration=2.0, block_size=1000)
+        y, sr = load_analysis_audio(self.path, profile, anchor=1.0)
+
+        self.assertEqual(sr, 4000)
+        self.assertLessEqual(abs(len(y) - 2 * sr), 1)
+
+    def test_full_profile_reads_the_whole_file(self):
+        y, sr = load_analysis_audio(self.path, AnalysisProfile.full())
+
+        self.assertEqual((sr, len(y)), (self.sr, len(self.samples)))
+
+    def test_segments_are_centred_on_the_anchor(self):
+        profile = AnalysisProfile(max_duration=3.0, segment_count=3)
+
+        self.assertEqual(profile.windows(60.0, anchor=30.0), [(28.0, 1.0), (30.0, 1.0), (32.0, 1.0)])
+        self.assertEqual(profile.windows(60.0, anchor=0.0), [(0.0, 1.0), (2.0, 1.0), (4.0, 1.0)])
+
+
+class FeatureCacheTests(TestCase):
+    features = {
+        'danceability': 0.5, 'energy': 0.8, 'valence': 0.7, 'tempo': 120.0, 'speechiness': 0.1,
+        'instrumentalness': 0.2, 'acousticness': 0.3, 'liveness': 0.4, 'mood': 'happy',
+    }
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = Path(directory.name)
+
+    def write(self, name, payload):
+        path = self.directory / name
+        path.write_bytes(payload)
+        return str(path)
+
+    def extract(self, path, **kwargs):
+        """
+        cached_extract_features with the analysis stubbed; returns (features, hit, analyses run).
+        """
+        with mock.patch('music.utils.feature_cache.extract_features', return_value=dict(self.features)) as extract:
+            features, hit = cached_extract_features(path, **kwargs)
+        return features, hit, extract.call_count
+
+    def test_identical_bytes_hit_the_cache(self):
+        original = self.write('original.wav', b'audio bytes')
+        reupload = self.write('reupload.wav', b'audio bytes')
+        other = self.write('other.wav', b'other audio bytes')
+
+        self.assertEqual(self.extract(original)[1:], (False, 1))
+        features, hit, analyses = self.extract(reupload)
+        self.assertEqual((hit, analyses), (True, 0))
+        self.assertEqual(features['energy'], 0.8)
+        self.assertEqual(self.extract(other)[1:], (False, 1))
+        self.assertEqual(FeatureCacheEntry.objects.count(), 2)
+
+    def test_analysis_settings_change_the_key(self):
+        window = AnalysisProfile(max_duration=30.0)
+
+        self.assertNotEqual(cache_key('abc', window, 0.0), cache_key('abc', window, 10.0))
+        self.assertNotEqual(cache_key('abc', window), cache_key('abc', AnalysisProfile(max_duration=60.0)))
+        self.assertEqual(cache_key('abc', AnalysisProfile.full(), 0.0), cache_key('abc', AnalysisProfile.full(), 10.0))
+        with mock.patch('music.utils.feature_cache.FEATURE_EXTRACTOR_VERSION', FEATURE_EXTRACTOR_VERSION + 1):
+            bumped = cache_key('abc', window)
+        self.assertNotEqual(bumped, cache_key('abc', window))
+
+
+def scalar_mood(energy, valence):
+    """
+    The if/elif rules predict_mood applied one track at a time before predict_moods.
+    """
+    if energy > 0.6 and valence > 0.5:
+        return 'happy'
+    elif energy < 0.4 and valence < 0.4:
+        return 'sad'
+    elif energy > 0.7:
+        return 'energetic'
+    elif valence > 0.6:
+        return 'romantic'
+    return 'chill'
+
+
+class MoodTests(TestCase):
+    def test_vectorized_rules_match_the_scalar_rules(self):
+        grid = np.linspace(0.0, 1.0, 21)
+        pairs = [(energy, valence) for energy in grid for valence in grid]
+
+        self.assertEqual(list(predict_moods(pairs)), [scalar_mood(energy, valence) for energy, valence in pairs])
+        self.assertEqual(predict_mood(0.9, 0.2), 'energetic')
+
+    def test_columns_and_threshold_overrides(self):
+        self.assertEqual(predict_moods([[0.55, 120.0, 0.65]], columns=['valence', 'tempo', 'energy'])[0], 'happy')
+        self.assertEqual(predict_moods([[0.65, 0.55]], thresholds={'happy_energy': 0.7})[0], 'chill')
+        with override_settings(MOOD_THRESHOLDS={'happy_energy': 0.7}):
+            self.assertEqual(predict_moods([[0.65, 0.55]])[0], 'chill')
+
+    def test_relabel_moods_rewrites_labels_and_embeddings(self):
+        artist = Artist.objects.create(user=make_user('artist'), display_name='Artist')
+        feature = make_feature(make_track(artist), energy=0.9, valence=0.9, mood='sad')
+
+        call_command('relabel_moods', dry_run=True, stdout=StringIO())
+        feature.refresh_from_db()
+        self.assertEqual(feature.mood, 'sad')
+
+        call_command('relabel_moods', stdout=StringIO())
+        feature.refresh_from_db()
+        self.assertEqual(feature.mood, 'happy')
+        np.testing.assert_allclose(feature.embedding, feature.generate_embedding(), rtol=1e-5, atol=1e-6)
+
+
+class RecommendationRunTests(MusicTestCase):
+    def like(self, user, track=None):
+        Interaction.objects.create(user=user, track=track or self.track, interaction_type='like')
+
+    def test_user_id_ranges_cover_each_liking_user_once(self):
+        fans = [make_user(f'fan{n}') for n in range(5)]
+        for fan in fans:
+            self.like(fan)
+        self.like(fans[0], make_track(self.artist, 'Other'))
+        make_user('lurker')
+
+        self.assertEqual(
+            user_id_ranges(2),
+            [(fans[0].id, fans[1].id + 1), (fans[2].id, fans[3].id + 1), (fans[4].id, fans[4].id + 1)],
+        )
+        self.assertEqual(user_id_shards(2), [(fans[0].id, fans[2].id + 1), (fans[3].id, fans[4].id + 1)])
+
+    def test_shard_task_reports_progress(self):
+        snapshot = mock.Mock(
+            version='v1', track_ids=np.array([self.track.id]), embeddings=np.zeros((1, 3), dtype=np.float32),
+        )
+
+        def generate(user_range, on_progress, embeddings):
+            on_progress(2, 4)
+            return {'users': 4, 'seconds': 1.5}
+
+        with mock.patch('music.tasks.open_snapshot', return_value=snapshot) as open_snapshot:
+            with mock.patch('music.tasks.generate_recommendations', side_effect=generate) as generate_recommendations:
+                with mock.patch.object(generate_recommendations_shard_task, 'update_state') as update_state:
+                    result = generate_recommendations_shard_task(1, 10, 20, 'v1')
+
+        open_snapshot.assert_called_once_with('v1')
+        self.assertEqual(generate_recommendations.call_args.kwargs['user_range'], (10, 20))
+        update_state.assert_called_once_with(state='PROGRESS', meta={'shard': 1, 'done': 2, 'total': 4})
+        self.assertEqual(
+            result,
+            {
+                'shard': 1, 'start': 10, 'stop': 20, 'attempts': 1, 'users': 4, 'seconds': 1.5,
+                'snapshot_version': 'v1', 'failed': False,
+            },
+        )
+
+    def run_shard(self, snapshot_version):
+        with mock.patch.object(generate_recommendations_shard_task, 'update_state'):
+            with self.assertLogs('music', 'WARNING'):
+                return generate_recommendations_shard_task(0, self.listener.id, self.listener.id + 1, snapshot_version)
+
+    def test_shard_falls_back_when_the_pinned_snapshot_was_pruned(self):
+        make_feature(self.track)
+        make_feature(make_track(self.artist, 'Other'))
+        self.like(self.listener)
+        pinned, _ = write_snapshot()
+        for _ in range(3):
+            latest, _ = write_snapshot()  # keeps the newest 3, so the pinned version is pruned
+
+        result = self.run_shard(pinned)
+
+        self.assertEqual((result['failed'], result['users'], result['snapshot_version']), (False, 1, latest))
+
+    def test_shard_falls_back_to_the_database_without_a_snapshot(self):
+        make_feature(self.track)
+        make_feature(make_track(self.artist, 'Other'))
+        self.like(self.listener)
+
+        result = self.run_shard('published-on-another-node')
+
+        self.assertEqual((result['failed'], result['users'], result['snapshot_version']), (False, 1, None))
+
+    def test_summary_totals_the_shard_results(self):
+        results = [
+            {'shard': 1, 'start': 4, 'stop': 9, 'attempts': 1, 'users': 2, 'seconds': 3.0, 'failed': False},
+            {'shard': 0, 'start': 1, 'stop': 4, 'attempts': 4, 'users': 0, 'seconds': 0.0, 'failed': True,
+             'error': 'boom'},
+        ]
+        with mock.patch('music.tasks.time.time', return_value=106.0):
+            with self.assertLogs('music', 'INFO'):
+                summary = summarize_recommendation_shards_task(results, 100.0)
+
+        self.assertEqual((summary['shards'], summary['users'], summary['failed_shards']), (2, 2, [0]))
+        self.assertEqual((summary['wall_seconds'], summary['parallelism']), (6.0, 0.5))
+        self.assertEqual([result['shard'] for result in summary['per_shard']], [0, 1])
+
+
+class VectorFieldTests(MusicTestCase):
+    def setUp(self):
+        super().setUp()
+        self.feature = make_feature(self.track)
+
+    def raw_embedding(self):
+        return TrackFeature.objects.filter(pk=self.feature.pk).values_list('embedding', flat=True).get()
+
+    def test_embedding_round_trips_as_packed_float32(self):
+        vector = [0.25, -1.5, 3.0]
+        TrackFeature.objects.filter(pk=self.feature.pk).update(embedding=vector)
+
+        self.assertEqual(self.raw_embedding(), vector)
+        self.assertEqual(pack_vector(vector), VECTOR_HEADER + np.array(vector, dtype='<f4').tobytes())
+        self.assertIsNone(unpack_vector(pack_vector([])))
+
+    def test_legacy_json_values_are_still_read(self):
+        TrackFeature.objects.filter(pk=self.feature.pk).update(embedding=b'[0.5, 1.0, -2.0]')
+
+        self.assertEqual(self.raw_embedding(), [0.5, 1.0, -2.0])
+        self.assertEqual(unpack_vector('[0.5]'), [0.5])
+        self.assertIsNone(unpack_vector('[]'))
+
+    def test_matrix_skips_rows_of_another_dimension(self):
+        expected = TrackFeature.objects.get(pk=self.feature.pk).embedding
+        legacy = make_feature(make_track(self.artist, 'Legacy'))
+        TrackFeature.objects.filter(pk=legacy.pk).update(embedding=json.dumps(expected).encode())
+        stale = make_feature(make_track(self.artist, 'Stale'))
+        TrackFeature.objects.filter(pk=stale.pk).update(embedding=[1.0, 2.0])
+
+        with self.assertLogs('music', 'WARNING') as logs:
+            track_ids, matrix = load_embedding_matrix()
+
+        self.assertEqual(sorted(track_ids.tolist()), [self.track.id, legacy.track_id])
+        np.testing.assert_allclose(matrix, [expected, expected], rtol=1e-6)
+        self.assertIn('Skipped 1 embeddings', logs.output[0])
+
+
+class EmbeddingMigrationTests(TransactionTestCase):
+    before = [('music', '0008_track_anghami_link_track_spotify_link_and_more')]
+    after = [('music', '0010_pack_trackfeature_embeddings')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        executor.migrate(executor.loader.graph.leaf_nodes())
+
+    def raw_embeddings(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT embedding FROM music_trackfeature ORDER BY id')
+            return [bytes(raw) if isinstance(raw, memoryview) else raw for raw, in cursor.fetchall()]
+
+    def test_json_embeddings_are_packed_and_unpacked(self):
+        artist = Artist.objects.create(user=make_user('artist'), display_name='Artist')
+        apps = self.migrate(self.before)
+        track = apps.get_model('music', 'Track').objects.create(artist_id=artist.id, title='Track')
+        apps.get_model('music', 'TrackFeature').objects.create(
+            track=track, danceability=0.5, energy=0.5, valence=0.5, tempo=120.0, speechiness=0.1,
+            instrumentalness=0.1, acousticness=0.1, liveness=0.1, mood='happy', embedding=[0.5, -1.0],
+        )
+
+        self.migrate(self.after)
+        [raw] = self.raw_embeddings()
+        self.assertEqual(raw, pack_vector([0.5, -1.0]))
+
+        self.migrate(self.before)
+        [raw] = self.raw_embeddings()
+        self.assertEqual(json.loads(raw), [0.5, -1.0])
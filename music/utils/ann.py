@@ -0,0 +1,167 @@
+# music/utils/ann.py
+
+from pathlib import Path
+
+import numpy as np
+
+# Below this many tracks a brute-force scan beats building an IVF index
+IVF_MIN_VECTORS = 10000
+
+
+def _normalize_rows(matrix, norms=None):
+    if norms is None:
+        norms = np.linalg.norm(matrix, axis=1)
+    return (matrix / np.maximum(norms, 1e-10)[:, None]).astype(np.float32, copy=False)
+
+
+def _normalize(vector):
+    vector = np.asarray(vector, dtype=np.float32).ravel()
+    return vector / max(float(np.linalg.norm(vector)), 1e-10)
+
+
+def _top_k(scores, k):
+    """
+    Positions of the k highest scores, best first (argpartition + small sort).
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+class ExactIndex:
+    """
+    Brute-force cosine search: one matrix-vector product plus argpartition.
+
+    Works directly on (possibly memory-mapped) vectors; pass precomputed
+    `norms` to avoid touching every row twice.
+    """
+
+    def __init__(self, vectors, norms=None):
+        self._vectors = vectors
+        self._norms = np.linalg.norm(vectors, axis=1) if norms is None else norms
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def search(self, query, k=10, exclude=None):
+        """
+        Returns (positions, scores) of the k most similar vectors, best first.
+        `exclude` is an iterable of positions to leave out.
+        """
+        query = _normalize(query)
+        scores = (self._vectors @ query) / np.maximum(self._norms, 1e-10)
+        if exclude is not None:
+            scores[np.fromiter(exclude, dtype=np.int64)] = -np.inf
+
+        top = _top_k(scores, k)
+        top = top[np.isfinite(scores[top])]
+        return top, scores[top]
+
+
+class IVFIndex:
+    """
+    Inverted-file index with a spherical k-means coarse quantizer.
+
+    Vectors are bucketed by their nearest of `n_lists` centroids. A query
+    scores the centroids, then scans only the `nprobe` closest buckets.
+    `nprobe` is the recall/latency knob: nprobe == n_lists is an exact scan.
+
+    The index keeps only the centroids, the vector positions sorted by
+    bucket and the bucket offsets; vectors are read from the caller's
+    (possibly memory-mapped) array at search time. `save` writes those
+    arrays and `from_arrays` reopens them, so the k-means build runs
+    offline (see write_snapshot) rather than in a request.
+    """
+
+    ARRAY_FILES = ('centroids', 'positions', 'offsets')
+
+    def __init__(self, vectors, norms=None, n_lists=None, nprobe=8, n_iter=10, sample_size=None, seed=0):
+        self._vectors = vectors
+        self._norms = np.linalg.norm(vectors, axis=1) if norms is None else norms
+        vectors = _normalize_rows(np.asarray(vectors, dtype=np.float32), self._norms)  # Training copy only
+        n = len(vectors)
+        if n_lists is None:
+            n_lists = int(4 * np.sqrt(n))
+        self.n_lists = max(1, min(n_lists, n))
+        self.nprobe = nprobe
+
+        rng = np.random.default_rng(seed)
+        if sample_size is None:
+            sample_size = max(self.n_lists * 64, 10000)
+        sample = vectors if n <= sample_size else vectors[rng.choice(n, sample_size, replace=False)]
+        self.centroids = self._train(sample, n_iter, rng)
+
+        # Sort positions by bucket so every inverted list is a contiguous slice
+        assignments = self._assign(vectors)
+        self.positions = np.argsort(assignments, kind='stable').astype(np.int64)
+        counts = np.bincount(assignments, minlength=self.n_lists)
+        self.offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    @classmethod
+    def from_arrays(cls, vectors, norms, centroids, positions, offsets, nprobe=8):
+        """
+        Reopens a saved index over the same `vectors` it was built from.
+        """
+        index = cls.__new__(cls)
+        index._vectors, index._norms = vectors, norms
+        index.centroids, index.positions, index.offsets = centroids, positions, offsets
+        index.n_lists = len(centroids)
+        index.nprobe = nprobe
+        return index
+
+    def save(self, directory, prefix='ivf_'):
+        for name in self.ARRAY_FILES:
+            np.save(Path(directory) / f'{prefix}{name}.npy', np.ascontiguousarray(getattr(self, name)))
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def _assign(self, vectors, chunk_size=65536):
+        assignments = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), chunk_size):
+            chunk = vectors[start:start + chunk_size]
+            assignments[start:start + chunk_size] = np.argmax(chunk @ self.centroids.T, axis=1)
+        return assignments
+
+    def _train(self, sample, n_iter, rng):
+        self.centroids = sample[rng.choice(len(sample), self.n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assignments = self._assign(sample)
+            sums = np.stack([
+                np.bincount(assignments, weights=sample[:, d], minlength=self.n_lists)
+                for d in range(sample.shape[1])
+            ], axis=1)
+            counts = np.bincount(assignments, minlength=self.n_lists)
+
+            # Re-seed empty buckets with random sample points
+            empty = np.flatnonzero(counts == 0)
+            if len(empty):
+                sums[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+
+            self.centroids = _normalize_rows(sums)
+        return self.centroids
+
+    def search(self, query, k=10, exclude=None, nprobe=None):
+        """
+        Returns (positions, scores) of the approximately k most similar vectors.
+        Positions index the vectors the index was built from.
+        """
+        query = _normalize(query)
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+
+        buckets = _top_k(self.centroids @ query, nprobe)
+        rows = np.concatenate([
+            np.arange(self.offsets[b], self.offsets[b + 1]) for b in buckets
+        ])
+
+        positions = np.sort(self.positions[rows])  # Sorted reads are kinder to a memory-mapped file
+        scores = (self._vectors[positions] @ query) / np.maximum(self._norms[positions], 1e-10)
+        if exclude is not None:
+            scores[np.isin(positions, np.fromiter(exclude, dtype=np.int64))] = -np.inf
+
+        top = _top_k(scores, k)
+        top = top[np.isfinite(scores[top])]
+        return positions[top], scores[top]
+
@@ -0,0 +1,140 @@
+# music/utils/audio_loading.py
+
+import numpy as np
+
+# librosa, soundfile and soxr are imported where audio is decoded, so the web
+# process (which imports this through music.tasks) never loads them
+
+
+class AnalysisProfile:
+    """
+    How much of a track feature extraction looks at, and at what rate.
+
+    sample_rate:      resample target in Hz (None keeps the file's native rate)
+    max_duration:     seconds analysed per track (None analyses the whole file)
+    segment_count:    split max_duration into this many segments placed around
+                      the track's demo_start_time
+    segment_spacing:  seconds between segment centres (default: 2x segment length)
+    block_size:       frames decoded per read; with max_duration set, peak
+                      memory is bounded by max_duration * sample_rate floats
+                      plus one block, however long the file is
+
+    Plain attributes only, so profiles pickle into spawned worker processes.
+    """
+
+    def __init__(self, sample_rate=22050, max_duration=120.0, segment_count=1, segment_spacing=None, block_size=65536):
+        self.sample_rate = sample_rate
+        self.max_duration = max_duration
+        self.segment_count = max(1, int(segment_count))
+        self.segment_spacing = segment_spacing
+        self.block_size = block_size
+
+    @classmethod
+    def from_dict(cls, options):
+        return cls(**(options or {}))
+
+    @classmethod
+    def full(cls):
+        """
+        The old behaviour: whole file at its native sample rate.
+        """
+        return cls(sample_rate=None, max_duration=None)
+
+    def windows(self, total_duration, anchor=0.0):
+        """
+        (start, duration) pairs in seconds to analyse for a file of total_duration.
+        """
+        budget = total_duration if self.max_duration is None else min(self.max_duration, total_duration)
+        if budget <= 0:
+            return []
+
+        if self.segment_count == 1:
+            # Start at the demo point, shifted back if it would run off the end
+            start = min(max(anchor, 0.0), total_duration - budget)
+            return [(start, budget)]
+
+        length = budget / self.segment_count
+        spacing = self.segment_spacing or 2 * length
+        span = (self.segment_count - 1) * spacing + length
+        if span > total_duration:
+            # Not enough room: spread the segments evenly over the whole file
+            spacing = (total_duration - length) / (self.segment_count - 1)
+            span = total_duration
+
+        # Centre the group of segments on the demo point, kept inside the file
+        first = anchor + length / 2 - span / 2
+        first = min(max(first, 0.0), total_duration - span)
+        return [(first + j * spacing, length) for j in range(self.segment_count)]
+
+
+def _read_window(sound_file, start, duration, target_sr, block_size):
+    """
+    Decodes one window block by block, downmixing and resampling as it goes.
+    """
+    import soxr
+
+    native_sr = sound_file.samplerate
+    out_sr = target_sr or native_sr
+    frames = int(round(duration * native_sr))
+    sound_file.seek(int(start * native_sr))
+
+    out = np.empty(int(np.ceil(frames * out_sr / native_sr)) + block_size, dtype=np.float32)
+    resampler = soxr.ResampleStream(native_sr, out_sr, 1, dtype='float32') if out_sr != native_sr else None
+    filled = 0
+
+    def append(chunk):
+        nonlocal filled
+        end = min(filled + len(chunk), len(out))
+        out[filled:end] = chunk[:end - filled]
+        filled = end
+
+    remaining = frames
+    while remaining > 0:
+        block = sound_file.read(min(block_size, remaining), dtype='float32', always_2d=True)
+        if not len(block):
+            break
+        remaining -= len(block)
+        mono = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+        append(resampler.resample_chunk(mono, last=remaining <= 0) if resampler else mono)
+
+    if resampler and remaining > 0:
+        append(resampler.resample_chunk(np.empty(0, dtype=np.float32), last=True))
+
+    return out[:filled]
+
+
+def load_analysis_audio(file_path, profile=None, anchor=0.0):
+    """
+    Loads the mono signal a profile asks for: the chosen windows, resampled.
+    Streams through soundfile in fixed-size blocks; formats soundfile cannot
+    open fall back to librosa.load with offset/duration per window.
+    Returns a tuple: (y, sr)
+    """
+    import soundfile as sf
+
+    profile = profile or AnalysisProfile()
+
+    try:
+        sound_file = sf.SoundFile(file_path)
+    except (sf.LibsndfileError, RuntimeError):
+        sound_file = None
+
+    if sound_file is None:
+        import librosa
+
+        total = librosa.get_duration(path=file_path)
+        sr = profile.sample_rate
+        parts = []
+        for start, duration in profile.windows(total, anchor):
+            y, sr = librosa.load(file_path, sr=profile.sample_rate, mono=True, offset=start, duration=duration)
+            parts.append(y)
+        return (np.concatenate(parts) if parts else np.empty(0, dtype=np.float32)), sr
+
+    with sound_file:
+        total = sound_file.frames / sound_file.samplerate
+        sr = profile.sample_rate or sound_file.samplerate
+        parts = [
+            _read_window(sound_file, start, duration, profile.sample_rate, profile.block_size)
+            for start, duration in profile.windows(total, anchor)
+        ]
+    return (np.concatenate(parts) if parts else np.empty(0, dtype=np.float32)), sr
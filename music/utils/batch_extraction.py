@@ -0,0 +1,216 @@
+# music/utils/batch_extraction.py
+
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from django.db import connections
+from django.db.models import Q
+from music.models import Track, TrackFeature
+from music.utils.feature_cache import cache_key, file_sha256, lookup_features, store_features
+from music.utils.feature_extraction import default_profile, extract_features_job, FEATURE_EXTRACTOR_VERSION
+from music.utils.embedding_snapshot import schedule_snapshot_rebuild
+from music.utils.track_index import bump_index_version
+
+FEATURE_FIELDS = [
+    'danceability',
+    'energy',
+    'valence',
+    'tempo',
+    'speechiness',
+    'instrumentalness',
+    'acousticness',
+    'liveness',
+    'mood',
+]
+
+
+def tracks_needing_features(force=False):
+    """
+    Approved tracks with audio that have no TrackFeature row, or one
+    extracted by an older FEATURE_EXTRACTOR_VERSION.
+    """
+    queryset = (
+        Track.objects.filter(approval_status='approved')
+        .exclude(audio_file='')
+        .exclude(audio_file=None)
+    )
+    if not force:
+        queryset = queryset.filter(
+            Q(trackfeature__isnull=True) | Q(trackfeature__extractor_version__lt=FEATURE_EXTRACTOR_VERSION)
+        )
+    return queryset.order_by('id')
+
+
+def save_feature_batch(results):
+    """
+    Writes {track_id: features} with one bulk_create and one bulk_update.
+    """
+    if not results:
+        return
+
+    existing = TrackFeature.objects.in_bulk(list(results), field_name='track_id')
+    to_create, to_update = [], []
+    for track_id, features in results.items():
+        feature = existing.get(track_id) or TrackFeature(track_id=track_id)
+        for key, value in features.items():
+            setattr(feature, key, value)
+        feature.extractor_version = FEATURE_EXTRACTOR_VERSION
+        # bulk operations skip save(), so build the embedding here
+        feature.embedding = feature.generate_embedding()
+        (to_update if feature.pk else to_create).append(feature)
+
+    TrackFeature.objects.bulk_create(to_create)
+    TrackFeature.objects.bulk_update(to_update, FEATURE_FIELDS + ['embedding', 'extractor_version'])
+
+
+class Checkpoint:
+    """
+    JSON file of finished and failed track ids, so an interrupted backfill
+    resumes where it stopped. Reset automatically when the extractor
+    version changes.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path) if path else None
+        self.done, self.failed = set(), set()
+        if self.path and self.path.exists():
+            data = json.loads(self.path.read_text())
+            if data.get('extractor_version') == FEATURE_EXTRACTOR_VERSION:
+                self.done = set(data.get('done', []))
+                self.failed = set(data.get('failed', []))
+
+    def save(self):
+        if not self.path:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(f'.{self.path.name}.tmp')
+        tmp.write_text(json.dumps({
+            'extractor_version': FEATURE_EXTRACTOR_VERSION,
+            'done': sorted(self.done),
+            'failed': sorted(self.failed),
+        }))
+        os.replace(tmp, self.path)
+
+
+def run_backfill(jobs, workers=None, batch_size=100, checkpoint=None, on_batch=None, profile=None):
+    """
+    Extracts features for `jobs` [(track_id, file_path, duration_seconds, demo_start_time), ...]
+    on a process pool and writes them back in batches as results stream in.
+    Every worker analyses with the same AnalysisProfile (default: settings).
+
+    Files whose content hash is already in the feature cache are never sent
+    to the pool; hashing and the cache lookup (one query per batch_size
+    jobs) happen here in the parent.
+
+    At most workers * 4 files are in flight at once, so memory stays bounded
+    however long the job list is. `on_batch(stats)` is called after every
+    batch write. Returns the final stats dict.
+    """
+    workers = workers or os.cpu_count() or 1
+    checkpoint = checkpoint or Checkpoint(None)
+    profile = profile or default_profile()
+    durations = {track_id: duration or 0.0 for track_id, _, duration, _ in jobs}
+    queued = [(track_id, path, anchor or 0.0, profile) for track_id, path, _, anchor in jobs]
+
+    stats = {'done': 0, 'failed': 0, 'cache_hits': 0, 'cache_misses': 0, 'audio_seconds': 0.0,
+             'elapsed': 0.0, 'tracks_per_sec': 0.0, 'audio_seconds_per_sec': 0.0}
+    started = time.perf_counter()
+    batch = {}
+    miss_keys = {}      # track_id -> (cache_key, content_hash) of jobs sent to the pool
+    cache_writes = {}   # cache_key -> (content_hash, features) not stored yet
+
+    def flush():
+        save_feature_batch(batch)
+        store_features(cache_writes)
+        checkpoint.done.update(batch)
+        checkpoint.save()
+        batch.clear()
+        cache_writes.clear()
+        stats['elapsed'] = time.perf_counter() - started
+        stats['tracks_per_sec'] = stats['done'] / max(stats['elapsed'], 1e-9)
+        stats['audio_seconds_per_sec'] = stats['audio_seconds'] / max(stats['elapsed'], 1e-9)
+        if on_batch:
+            on_batch(dict(stats))
+
+    def uncached_jobs():
+        """
+        Yields the jobs that miss the cache; hits go straight into the batch.
+        """
+        for start in range(0, len(queued), batch_size):
+            hashed = {}
+            for job in queued[start:start + batch_size]:
+                track_id, path, anchor, _ = job
+                try:
+                    content_hash = file_sha256(path)
+                except OSError:
+                    yield job  # the worker reports the missing file
+                    continue
+                hashed[track_id] = (cache_key(content_hash, profile, anchor), content_hash, job)
+
+            found = lookup_features(key for key, _, _ in hashed.values())
+            for track_id, (key, content_hash, job) in hashed.items():
+                if key in found:
+                    stats['cache_hits'] += 1
+                    stats['done'] += 1
+                    batch[track_id] = found[key]
+                else:
+                    stats['cache_misses'] += 1
+                    miss_keys[track_id] = (key, content_hash)
+                    yield job
+
+            if len(batch) >= batch_size:
+                flush()
+
+    pending = uncached_jobs()
+
+    # Forked workers must not inherit (and later close) our DB sockets
+    connections.close_all()
+
+    # Spawned (not forked) workers: forking after numba/BLAS threads have
+    # started can crash the child. The job function touches no models or
+    # database; its modules only read django.conf.settings, which configures
+    # itself from the inherited DJANGO_SETTINGS_MODULE without django.setup().
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        in_flight = set()
+
+        def top_up():
+            while len(in_flight) < workers * 4:
+                job = next(pending, None)
+                if job is None:
+                    return
+                in_flight.add(executor.submit(extract_features_job, job))
+
+        top_up()
+        while in_flight:
+            future = next(as_completed(in_flight))
+            in_flight.discard(future)
+            track_id, features, error = future.result()
+
+            if error:
+                stats['failed'] += 1
+                checkpoint.failed.add(track_id)
+            else:
+                stats['done'] += 1
+                stats['audio_seconds'] += durations.get(track_id, 0.0)
+                batch[track_id] = features
+                key, content_hash = miss_keys.pop(track_id, (None, None))
+                if key:
+                    cache_writes[key] = (content_hash, features)
+
+            if len(batch) >= batch_size:
+                flush()
+            top_up()
+
+    flush()
+
+    # Bulk writes skip the signals: tell the serving processes instead
+    if stats['done']:
+        bump_index_version()
+        schedule_snapshot_rebuild()
+
+    return stats
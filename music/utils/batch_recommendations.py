@@ -0,0 +1,233 @@
+# music/utils/batch_recommendations.py
+
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+from music.models import Interaction, Track
+from music.utils.recommendations import load_embedding_matrix
+from playlists.models import UserRecommendation
+from playlists.utils.recommendation_cache import cache_on_commit
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-10)
+
+
+def unapproved_positions(track_ids):
+    """
+    Positions in `track_ids` of tracks that are not approved. Their
+    embeddings still shape the profiles of users who liked them, but they
+    are never recommended.
+    """
+    unapproved = Track.objects.exclude(approval_status='approved').values_list('id', flat=True)
+    return np.flatnonzero(np.isin(track_ids, np.fromiter(unapproved, dtype=np.int64)))
+
+
+def load_like_matrix(track_ids, user_range=None):
+    """
+    Streams every 'like' into a sparse users x tracks 0/1 matrix.
+    Only users with at least one like on a known track get a row.
+    `user_range` = (start, stop) restricts it to start <= user_id < stop.
+    Returns a tuple: (user_ids array, csr_matrix)
+    """
+    from scipy import sparse
+
+    track_positions = {int(track_id): col for col, track_id in enumerate(track_ids)}
+    user_positions = {}
+    rows, cols = array('q'), array('q')
+
+    likes = Interaction.objects.filter(interaction_type='like').values_list('user_id', 'track_id')
+    if user_range is not None:
+        likes = likes.filter(user_id__gte=user_range[0], user_id__lt=user_range[1])
+    for user_id, track_id in likes.iterator(chunk_size=10000):
+        col = track_positions.get(track_id)
+        if col is None:
+            continue
+        rows.append(user_positions.setdefault(user_id, len(user_positions)))
+        cols.append(col)
+
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=np.float32), (np.frombuffer(rows, dtype=np.int64), np.frombuffer(cols, dtype=np.int64))),
+        shape=(len(user_positions), len(track_ids)),
+    )
+    matrix.data[:] = 1  # Liking a track twice still counts once
+    user_ids = np.fromiter(user_positions.keys(), dtype=np.int64, count=len(user_positions))
+    return user_ids, matrix
+
+
+def build_user_profiles(likes, embeddings):
+    """
+    Mean liked embedding for every user, as one sparse-dense product.
+    """
+    counts = np.asarray(likes.sum(axis=1)).ravel()
+    profiles = likes @ embeddings
+    return profiles / np.maximum(counts, 1)[:, None]
+
+
+def score_chunk(profiles, likes, normalized_embeddings, top_n=10, excluded=None):
+    """
+    Scores a chunk of users against every track and keeps each row's top_n.
+
+    `likes` is the chunk's rows of the like matrix; liked tracks are masked
+    out, and so are the `excluded` track positions for every user. Returns
+    a tuple of (positions, scores), each (users x top_n) and sorted best
+    first. Slots that could not be filled hold -inf scores.
+    """
+    scores = _normalize_rows(profiles) @ normalized_embeddings.T
+
+    liked_rows, liked_cols = likes.nonzero()
+    scores[liked_rows, liked_cols] = -np.inf
+    if excluded is not None:
+        scores[:, excluded] = -np.inf
+
+    k = min(top_n, scores.shape[1])
+    if k == 0:
+        empty = np.empty((scores.shape[0], 0))
+        return empty.astype(np.int64), empty
+
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    top_scores = np.take_along_axis(scores, top, axis=1)
+    order = np.argsort(-top_scores, axis=1)
+    return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_scores, order, axis=1)
+
+
+def _score_users(user_ids, likes, track_ids, embeddings, batch_size, workers, top_n):
+    """
+    Scores users batch_size at a time on a thread pool of `workers` threads
+    (NumPy releases the GIL inside the matrix products). Peak memory is
+    roughly workers * batch_size * n_tracks float32 scores.
+
+    Yields dicts of {user_id: [(track_id, score), ...]} in user order.
+    """
+    profiles = build_user_profiles(likes, embeddings)
+    normalized_embeddings = _normalize_rows(embeddings)
+    excluded = unapproved_positions(track_ids)
+
+    def run(start):
+        stop = start + batch_size
+        positions, scores = score_chunk(
+            profiles[start:stop], likes[start:stop], normalized_embeddings, top_n, excluded,
+        )
+        return {
+            int(user_id): [(int(track_ids[p]), float(s)) for p, s in zip(row_positions, row_scores) if np.isfinite(s)]
+            for user_id, row_positions, row_scores in zip(user_ids[start:stop], positions, scores)
+        }
+
+    starts = range(0, len(user_ids), batch_size)
+    if workers <= 1:
+        for start in starts:
+            yield run(start)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(run, starts)
+
+
+def generate_recommendations(user_range=None, batch_size=1024, workers=1, top_n=10, on_progress=None, embeddings=None):
+    """
+    Scores and stores recommendations for every user with likes, or only
+    those with start <= user_id < stop when `user_range` is given. This is
+    the in-process engine behind the generate_recommendations command and
+    the Celery fan-out.
+
+    `embeddings` = (track_ids, matrix) scores against those instead of
+    loading them from the database (e.g. a pinned snapshot version).
+    `on_progress(done, total)` is called after each stored chunk.
+    Returns stats: users, tracks, seconds.
+    """
+    started = time.perf_counter()
+    track_ids, embeddings = embeddings if embeddings is not None else load_embedding_matrix()
+    user_ids, likes = load_like_matrix(track_ids, user_range) if len(track_ids) else ([], None)
+
+    done = 0
+    if len(user_ids):
+        for chunk in _score_users(user_ids, likes, track_ids, embeddings, batch_size, workers, top_n):
+            save_user_recommendations(chunk)
+            done += len(chunk)
+            if on_progress:
+                on_progress(done, len(user_ids))
+
+    return {'users': done, 'tracks': len(track_ids), 'seconds': time.perf_counter() - started}
+
+
+def user_id_ranges(range_size):
+    """
+    Splits the users who have likes into consecutive [start, stop) id ranges
+    of about `range_size` users each, for fanning generation out.
+    """
+    user_ids = (
+        Interaction.objects.filter(interaction_type='like')
+        .order_by('user_id')
+        .values_list('user_id', flat=True)
+        .distinct()
+    )
+    ranges, start, count, last = [], None, 0, None
+    for user_id in user_ids.iterator(chunk_size=10000):
+        if start is None:
+            start = user_id
+        count += 1
+        last = user_id
+        if count == range_size:
+            ranges.append((start, user_id + 1))
+            start, count = None, 0
+    if start is not None:
+        ranges.append((start, last + 1))
+    return ranges
+
+
+def save_user_recommendations(recommendations):
+    """
+    Replaces UserRecommendation rows for the given users in bulk.
+
+    `recommendations` maps user_id to a ranked list of track ids or
+    (track_id, score) pairs, best first. Through rows are inserted in rank
+    order, and the rankings are pushed to the serving cache once the
+    transaction commits.
+    """
+    if not recommendations:
+        return
+
+    recommendations = {
+        user_id: [item if isinstance(item, tuple) else (item, None) for item in ranking]
+        for user_id, ranking in recommendations.items()
+    }
+    user_ids = list(recommendations)
+    now = timezone.now()
+    Through = UserRecommendation.tracks.through
+
+    with transaction.atomic():
+        existing = set(UserRecommendation.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+        UserRecommendation.objects.bulk_create(
+            [UserRecommendation(user_id=user_id) for user_id in user_ids if user_id not in existing]
+        )
+
+        # bulk_create doesn't return pks on MySQL, so look them up again
+        rec_ids = dict(UserRecommendation.objects.filter(user_id__in=user_ids).values_list('user_id', 'id'))
+
+        Through.objects.filter(userrecommendation_id__in=rec_ids.values()).delete()
+        Through.objects.bulk_create(
+            [
+                Through(userrecommendation_id=rec_ids[user_id], track_id=track_id)
+                for user_id, ranking in recommendations.items()
+                for track_id, _ in ranking
+            ],
+            batch_size=5000,
+        )
+        UserRecommendation.objects.filter(id__in=rec_ids.values()).update(updated_at=now)
+        cache_on_commit(recommendations, generated_at=now)
+
+
+def user_id_shards(shards):
+    """
+    Splits the users who have likes into `shards` consecutive [start, stop)
+    id ranges holding about the same number of users each.
+    """
+    users = Interaction.objects.filter(interaction_type='like').values('user_id').distinct().count()
+    if not users:
+        return []
+    return user_id_ranges(-(-users // max(1, shards)))
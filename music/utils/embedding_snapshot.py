@@ -0,0 +1,151 @@
+# music/utils/embedding_snapshot.py
+
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from music.utils.ann import IVF_MIN_VECTORS, ExactIndex, IVFIndex
+from music.utils.versioned_arrays import VersionedArrays
+
+ARRAY_FILES = ('track_ids', 'embeddings', 'norms')
+REBUILD_PENDING_KEY = 'embedding_snapshot_rebuild_pending'
+
+
+def snapshot_dir():
+    return Path(getattr(settings, 'EMBEDDING_SNAPSHOT_DIR', settings.BASE_DIR / 'snapshots' / 'embeddings'))
+
+
+def write_snapshot(directory=None, keep=3):
+    """
+    Writes the current embeddings as a new versioned snapshot and makes it current.
+
+    Layout: <dir>/<version>/{track_ids,embeddings,norms}.npy plus a
+    <dir>/CURRENT file naming the live version, published atomically by
+    VersionedArrays.write. Rows are sorted by track id so readers can find
+    a track with np.searchsorted. Only the newest `keep` versions are kept.
+
+    With TRACK_ANN_BACKEND 'ivf' and a catalog of at least IVF_MIN_VECTORS
+    tracks, the IVF index is trained here and saved alongside
+    (ivf_{centroids,positions,offsets}.npy), so no request ever runs k-means.
+
+    Returns a tuple: (version, number_of_tracks)
+    """
+    from music.utils.recommendations import load_embedding_matrix  # recommendations reads snapshots
+
+    track_ids, embeddings = load_embedding_matrix()
+    order = np.argsort(track_ids, kind='stable')
+    arrays = {
+        'track_ids': track_ids[order],
+        'embeddings': np.ascontiguousarray(embeddings[order], dtype=np.float32),
+    }
+    arrays['norms'] = np.linalg.norm(arrays['embeddings'], axis=1).astype(np.float32)
+
+    extra = None
+    if getattr(settings, 'TRACK_ANN_BACKEND', 'ivf') == 'ivf' and len(track_ids) >= IVF_MIN_VECTORS:
+        extra = IVFIndex(arrays['embeddings'], arrays['norms']).save
+
+    version = snapshots.write(arrays, extra=extra, directory=directory, keep=keep)
+    return version, len(track_ids)
+
+
+def schedule_snapshot_rebuild():
+    """
+    Queues one snapshot rebuild EMBEDDING_SNAPSHOT_REBUILD_SECONDS after the
+    current transaction commits, unless one is already queued: a burst of
+    feature writes (a backfill, a run of extractions) costs one rebuild.
+    Does nothing until a snapshot has been published; without one, readers
+    go to the database and are always current.
+    """
+    from music.tasks import build_embedding_snapshot_task  # tasks imports this module
+
+    if not snapshots.published():
+        return
+
+    delay = settings.EMBEDDING_SNAPSHOT_REBUILD_SECONDS
+
+    def enqueue():
+        # The marker outlives the countdown so a lost task only delays the next rebuild
+        if cache.add(REBUILD_PENDING_KEY, 1, timeout=delay + 300):
+            build_embedding_snapshot_task.apply_async(countdown=delay)
+
+    transaction.on_commit(enqueue)
+
+
+def clear_pending_rebuild():
+    """
+    Called when a rebuild starts, so writes arriving during it queue another.
+    """
+    cache.delete(REBUILD_PENDING_KEY)
+
+
+class EmbeddingSnapshot:
+    """
+    Read-only, memory-mapped view of one snapshot version.
+
+    Arrays are opened with np.load(mmap_mode='r'), so every process on the
+    node shares the same page-cache copy instead of holding its own.
+    """
+
+    def __init__(self, path, version):
+        self.version = version
+        for name in ARRAY_FILES:
+            setattr(self, name, np.load(Path(path) / f'{name}.npy', mmap_mode='r'))
+
+        # Saved IVF index, when write_snapshot built one
+        self.ivf_arrays = None
+        if (Path(path) / 'ivf_centroids.npy').exists():
+            self.ivf_arrays = {
+                name: np.load(Path(path) / f'ivf_{name}.npy', mmap_mode='r') for name in IVFIndex.ARRAY_FILES
+            }
+        self._search_index = None
+
+    def search_index(self):
+        """
+        Similarity index over this snapshot: the saved IVF index when
+        TRACK_ANN_BACKEND is 'ivf' and one was built, exact search otherwise.
+        Both only wrap the mapped arrays, so opening one is cheap.
+        """
+        if self._search_index is None:
+            if self.ivf_arrays is not None and getattr(settings, 'TRACK_ANN_BACKEND', 'ivf') == 'ivf':
+                self._search_index = IVFIndex.from_arrays(
+                    self.embeddings, self.norms, nprobe=getattr(settings, 'TRACK_ANN_NPROBE', 8), **self.ivf_arrays,
+                )
+            else:
+                self._search_index = ExactIndex(self.embeddings, self.norms)
+        return self._search_index
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    def position(self, track_id):
+        """
+        Row of track_id in the snapshot, or None.
+        """
+        row = int(np.searchsorted(self.track_ids, track_id))
+        if row < len(self.track_ids) and self.track_ids[row] == track_id:
+            return row
+        return None
+
+
+snapshots = VersionedArrays(snapshot_dir, EmbeddingSnapshot, 'EMBEDDING_SNAPSHOT_CHECK_SECONDS')
+
+
+def open_snapshot(version, directory=None):
+    """
+    Opens one specific snapshot version, e.g. to pin every shard of a run
+    to the same data regardless of later publishes.
+    """
+    return snapshots.open(version, directory)
+
+
+def current_snapshot(max_age=None):
+    """
+    Returns the live EmbeddingSnapshot for this process, or None if none exists.
+
+    The CURRENT pointer is re-read at most every `max_age` seconds
+    (EMBEDDING_SNAPSHOT_CHECK_SECONDS, default 5); when it names a new
+    version the process hot-swaps to it.
+    """
+    return snapshots.current(max_age)
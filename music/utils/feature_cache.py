@@ -0,0 +1,103 @@
+# music/utils/feature_cache.py
+
+import hashlib
+import json
+
+import numpy as np
+from music.models import FeatureCacheEntry
+from music.utils.feature_extraction import (
+    clean_features,
+    default_profile,
+    extract_features,
+    FEATURE_EXTRACTOR_VERSION,
+)
+from music.utils.mood import MOOD_FEATURES, predict_moods
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path, chunk_size=HASH_CHUNK_SIZE):
+    """
+    SHA-256 of a file's bytes, read in fixed-size chunks so memory stays
+    flat however large the upload is.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(content_hash, profile=None, anchor=0.0):
+    """
+    Key of one cached analysis: audio bytes + extractor version + what was
+    analysed. The profile and the demo anchor are part of the key because
+    they change which windows are decoded; the anchor is ignored when the
+    profile analyses the whole file.
+    """
+    profile = profile or default_profile()
+    analysis = dict(vars(profile))
+    analysis['anchor'] = None if profile.max_duration is None else round(float(anchor or 0.0), 3)
+    payload = json.dumps([content_hash, FEATURE_EXTRACTOR_VERSION, analysis], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def lookup_features(keys):
+    """
+    Cached features for `keys` in one query. Returns {cache_key: features}.
+    Moods are relabelled with the current thresholds, so retuning them
+    never needs a cache flush.
+    """
+    keys = list(set(keys))
+    if not keys:
+        return {}
+    found = dict(
+        FeatureCacheEntry.objects.filter(cache_key__in=keys).values_list('cache_key', 'features')
+    )
+    if found:
+        values = np.array([[features[name] for name in MOOD_FEATURES] for features in found.values()])
+        for features, mood in zip(found.values(), predict_moods(values)):
+            features['mood'] = mood
+    return found
+
+
+def store_features(entries):
+    """
+    Saves {cache_key: (content_hash, features)} with one bulk insert.
+    Keys another worker stored first are left as they are.
+    """
+    FeatureCacheEntry.objects.bulk_create(
+        [
+            FeatureCacheEntry(
+                cache_key=key,
+                content_hash=content_hash,
+                extractor_version=FEATURE_EXTRACTOR_VERSION,
+                features=features,
+            )
+            for key, (content_hash, features) in entries.items()
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def cached_extract_features(file_path, profile=None, anchor=0.0):
+    """
+    extract_features with the cache in front of it.
+    Returns a tuple: (cleaned features, hit). Failed extractions return
+    ({}, False) and are not cached.
+    """
+    profile = profile or default_profile()
+    content_hash = file_sha256(file_path)
+    key = cache_key(content_hash, profile, anchor)
+
+    cached = lookup_features([key]).get(key)
+    if cached is not None:
+        return cached, True
+
+    features = extract_features(file_path, profile=profile, anchor=anchor)
+    if not features:
+        return {}, False
+
+    features = clean_features(features)
+    store_features({key: (content_hash, features)})
+    return features, False
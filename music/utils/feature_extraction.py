@@ -1,55 +1,110 @@
-import librosa
+import os
 import numpy as np
+from django.conf import settings
+from music.utils.audio_loading import AnalysisProfile, load_analysis_audio
+from music.utils.mood import predict_moods
 
-def extract_features(file_path):
+# Bump whenever the feature definitions (or FEATURE_ANALYSIS_PROFILE) change;
+# rows extracted with an older version are picked up again by backfill_features.
+FEATURE_EXTRACTOR_VERSION = 2
+
+# Shared analysis frame settings (librosa's defaults, so values are unchanged)
+N_FFT = 2048
+HOP_LENGTH = 512
+
+def default_profile():
+    """
+    The AnalysisProfile configured by settings.FEATURE_ANALYSIS_PROFILE.
+    """
+    return AnalysisProfile.from_dict(getattr(settings, 'FEATURE_ANALYSIS_PROFILE', None))
+
+def extract_features(file_path, profile=None, anchor=0.0):
     """
     Extracts audio features from an audio file using librosa.
 
+    Only the windows chosen by `profile` (default: settings) are decoded,
+    starting around `anchor` seconds, usually the track's demo_start_time.
+
     Returns a dictionary ready to save into TrackFeature model.
     """
     try:
-        y, sr = librosa.load(file_path, sr=None, mono=True)
-
-        # Extract features
-        tempo, _ = librosa.beat.beat_track(y=y, sr=sr)
-        danceability = np.mean(librosa.feature.tempogram(y=y, sr=sr))
-        energy = np.mean(librosa.feature.rms(y=y))
-        valence = np.mean(librosa.feature.spectral_contrast(y=y, sr=sr))
-        speechiness = np.mean(librosa.feature.mfcc(y=y, sr=sr))
-        instrumentalness = np.mean(librosa.feature.spectral_bandwidth(y=y, sr=sr))
-        acousticness = np.mean(librosa.feature.zero_crossing_rate(y))
-        liveness = np.mean(librosa.feature.spectral_flatness(y=y))
-
-        # Decide mood (very basic initial version)
-        mood = predict_mood(energy, valence)
-
-        return {
-            'danceability': danceability,
-            'energy': energy,
-            'valence': valence,
-            'tempo': tempo,
-            'speechiness': speechiness,
-            'instrumentalness': instrumentalness,
-            'acousticness': acousticness,
-            'liveness': liveness,
-            'mood': mood,
-        }
+        y, sr = load_analysis_audio(file_path, profile or default_profile(), anchor)
+        return analyze_signal(y, sr)
 
     except Exception as e:
         print(f"Feature extraction error: {e}")
         return {}
 
+def analyze_signal(y, sr):
+    """
+    Computes every feature from one shared STFT and mel spectrogram.
+
+    Calling each librosa feature on `y` would redo the STFT (or the onset
+    envelope) per feature; here the magnitude spectrogram, log-mel
+    spectrogram and onset envelopes are computed once and passed in.
+    RMS and zero-crossing rate stay time-domain: they need no FFT.
+    """
+    # Imported here so loading music.tasks doesn't pull in librosa/numba/scipy
+    import librosa
+
+    # Shared intermediates
+    S = np.abs(librosa.stft(y, n_fft=N_FFT, hop_length=HOP_LENGTH))
+    mel_db = librosa.power_to_db(librosa.feature.melspectrogram(S=S ** 2, sr=sr))
+    # beat_track aggregates the onset envelope with a median, tempogram with a mean
+    onset_median = librosa.onset.onset_strength(S=mel_db, sr=sr, aggregate=np.median)
+    onset_mean = librosa.onset.onset_strength(S=mel_db, sr=sr)
+
+    # Extract features
+    tempo, _ = librosa.beat.beat_track(onset_envelope=onset_median, sr=sr, hop_length=HOP_LENGTH)
+    danceability = np.mean(librosa.feature.tempogram(onset_envelope=onset_mean, sr=sr, hop_length=HOP_LENGTH))
+    energy = np.mean(librosa.feature.rms(y=y, frame_length=N_FFT, hop_length=HOP_LENGTH))
+    valence = np.mean(librosa.feature.spectral_contrast(S=S, sr=sr))
+    speechiness = np.mean(librosa.feature.mfcc(S=mel_db, sr=sr))
+    instrumentalness = np.mean(librosa.feature.spectral_bandwidth(S=S, sr=sr))
+    acousticness = np.mean(librosa.feature.zero_crossing_rate(y, frame_length=N_FFT, hop_length=HOP_LENGTH))
+    liveness = np.mean(librosa.feature.spectral_flatness(S=S))
+
+    # Decide mood (very basic initial version)
+    mood = predict_mood(energy, valence)
+
+    return {
+        'danceability': danceability,
+        'energy': energy,
+        'valence': valence,
+        'tempo': tempo,
+        'speechiness': speechiness,
+        'instrumentalness': instrumentalness,
+        'acousticness': acousticness,
+        'liveness': liveness,
+        'mood': mood,
+    }
+
 def predict_mood(energy, valence):
     """
     Rough mood prediction based on energy and valence values.
+    Single-track form of music.utils.mood.predict_moods.
+    """
+    return predict_moods([[float(np.mean(energy)), float(np.mean(valence))]])[0]
+
+def clean_features(features):
+    """
+    Coerces librosa/NumPy outputs (0-d or 1-element arrays) into plain floats.
+    """
+    return {
+        key: value if key == 'mood' else float(np.mean(value))
+        for key, value in features.items()
+    }
+
+def extract_features_job(job):
+    """
+    Process-pool entry point:
+    (track_id, file_path, anchor, profile) -> (track_id, features, error).
+    Touches no models or database, so it is safe to run in spawned workers.
     """
-    if energy > 0.6 and valence > 0.5:
-        return 'happy'
-    elif energy < 0.4 and valence < 0.4:
-        return 'sad'
-    elif energy > 0.7:
-        return 'energetic'
-    elif valence > 0.6:
-        return 'romantic'
-    else:
-        return 'chill'
+    track_id, file_path, anchor, profile = job
+    if not os.path.exists(file_path):
+        return track_id, None, 'file not found'
+    features = extract_features(file_path, profile=profile, anchor=anchor)
+    if not features:
+        return track_id, None, 'extraction failed'
+    return track_id, clean_features(features), None
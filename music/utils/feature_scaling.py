@@ -0,0 +1,138 @@
+# music/utils/feature_scaling.py
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+# Column order of TrackFeature embeddings (see TrackFeature.raw_features)
+EMBEDDING_FEATURES = [
+    'danceability',
+    'energy',
+    'valence',
+    'tempo',
+    'speechiness',
+    'instrumentalness',
+    'acousticness',
+    'liveness',
+    'mood',
+]
+
+SCALING_METHODS = ('standard', 'minmax')
+CURRENT_FILE = 'CURRENT'
+
+
+def scaler_dir():
+    return Path(getattr(settings, 'FEATURE_SCALER_DIR', settings.BASE_DIR / 'artifacts' / 'feature_scaler'))
+
+
+class FeatureScaler:
+    """
+    Per-feature affine scaling fitted on the catalog: (x - center) / scale.
+
+    'standard' uses mean/std, 'minmax' uses min/(max - min). Without it
+    tempo (~60-200 BPM) dominates every cosine similarity next to the 0-1
+    features.
+    """
+
+    def __init__(self, center, scale, method='standard', version=None, n_samples=0, features=None):
+        self.center = np.asarray(center, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.method = method
+        self.version = version
+        self.n_samples = n_samples
+        self.features = list(features or EMBEDDING_FEATURES)
+
+    @classmethod
+    def fit(cls, matrix, method='standard'):
+        if method not in SCALING_METHODS:
+            raise ValueError(f"Unknown scaling method '{method}'. Choose from: {', '.join(SCALING_METHODS)}")
+        matrix = np.asarray(matrix, dtype=np.float64)
+        if method == 'standard':
+            center = matrix.mean(axis=0)
+            scale = matrix.std(axis=0)
+        else:
+            center = matrix.min(axis=0)
+            scale = matrix.max(axis=0) - center
+        # Constant columns would divide by zero; leave them centred at 0
+        scale = np.where(scale > 1e-12, scale, 1.0)
+        return cls(center, scale, method=method, n_samples=len(matrix))
+
+    def transform(self, matrix):
+        """
+        Scales an (N x features) matrix in one vectorized pass.
+        """
+        return (np.asarray(matrix, dtype=np.float64) - self.center) / self.scale
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'method': self.method,
+            'features': self.features,
+            'center': self.center.tolist(),
+            'scale': self.scale.tolist(),
+            'n_samples': self.n_samples,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['center'],
+            data['scale'],
+            method=data.get('method', 'standard'),
+            version=data.get('version'),
+            n_samples=data.get('n_samples', 0),
+            features=data.get('features'),
+        )
+
+    def save(self, directory=None):
+        """
+        Persists this scaler as a new version and makes it current.
+        Returns the version string.
+        """
+        directory = Path(directory or scaler_dir())
+        directory.mkdir(parents=True, exist_ok=True)
+
+        self.version = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        (directory / f'{self.version}.json').write_text(json.dumps(self.to_dict(), indent=2))
+
+        pointer = directory / f'.{CURRENT_FILE}.tmp'
+        pointer.write_text(self.version)
+        os.replace(pointer, directory / CURRENT_FILE)
+        return self.version
+
+
+_cache = {'stamp': None, 'scaler': None}
+
+
+def current_scaler():
+    """
+    Returns the current fitted FeatureScaler, or None if none has been fitted.
+    Reloaded whenever the CURRENT pointer changes.
+    """
+    pointer = scaler_dir() / CURRENT_FILE
+    try:
+        stamp = pointer.stat().st_mtime_ns
+    except FileNotFoundError:
+        _cache.update(stamp=None, scaler=None)
+        return None
+
+    if stamp != _cache['stamp']:
+        version = pointer.read_text().strip()
+        data = json.loads((pointer.parent / f'{version}.json').read_text())
+        _cache.update(stamp=stamp, scaler=FeatureScaler.from_dict(data))
+    return _cache['scaler']
+
+
+def scale_embeddings(matrix, scaler=None):
+    """
+    Applies `scaler` (default: the current one) to raw feature rows.
+    Raw rows are returned unchanged when no scaler has been fitted.
+    """
+    scaler = scaler or current_scaler()
+    if scaler is None:
+        return np.asarray(matrix, dtype=np.float64)
+    return scaler.transform(matrix)
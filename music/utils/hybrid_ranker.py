@@ -0,0 +1,162 @@
+# music/utils/hybrid_ranker.py
+
+import logging
+import time
+
+import numpy as np
+from django.conf import settings
+from music.models import Interaction
+from music.utils.implicit_mf import factor_recommendations
+from music.utils.item_cf import collaborative_recommendations
+from music.utils.recommendations import similarity_index, fetch_embedding_arrays
+from music.utils.trending import trending_snapshot
+
+music_logger = logging.getLogger('music')
+
+
+def liked_track_ids(user_id):
+    """
+    The user's liked tracks as a sorted, unique int64 array (one indexed query).
+    """
+    liked = Interaction.objects.filter(user_id=user_id, interaction_type='like').values_list('track_id', flat=True)
+    return np.unique(np.fromiter(liked.order_by().iterator(), dtype=np.int64))
+
+
+def content_candidates(user_id, liked, n):
+    """
+    Nearest tracks to the mean embedding of the user's likes.
+    """
+    if not len(liked):
+        return []
+    track_ids, embeddings, norms = fetch_embedding_arrays()
+    liked_rows = np.flatnonzero(np.isin(track_ids, liked))
+    if not len(liked_rows):
+        return []
+    profile = np.asarray(embeddings[liked_rows], dtype=np.float32).mean(axis=0)
+    positions, scores = similarity_index(track_ids, embeddings, norms).search(profile, k=n, exclude=liked_rows)
+    return list(zip(track_ids[positions].tolist(), scores.tolist()))
+
+
+def collaborative_candidates(user_id, liked, n):
+    return collaborative_recommendations(user_id, k=n, exclude=liked.tolist())
+
+
+def factor_candidates(user_id, liked, n):
+    return factor_recommendations(user_id, k=n, exclude=liked.tolist())
+
+
+def trending_candidates(user_id, liked, n):
+    return trending_snapshot.top_k(n)
+
+
+# Queried in descending HYBRID_WEIGHTS order (ties in this order), so the
+# sources skipped once the latency budget is spent are the least valuable
+SOURCES = {
+    'content': content_candidates,
+    'collaborative': collaborative_candidates,
+    'factors': factor_candidates,
+    'trending': trending_candidates,
+}
+
+
+def blend(candidates, weights, liked):
+    """
+    Merges {source: [(track_id, score), ...]} into one score per track.
+
+    Each source's scores are scaled to [0, 1] by its best score so sources
+    on different scales can be weighted against each other. Builds a
+    (tracks x sources) matrix and blends it with one product; liked tracks
+    are masked out with a sorted-array membership test.
+
+    Returns a tuple: (track_ids, blended scores, per-source contributions matrix, source names)
+    """
+    names = [name for name, pairs in candidates.items() if pairs]
+    if not names:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty((0, 0)), names
+
+    columns = [np.asarray(candidates[name], dtype=np.float64).reshape(-1, 2) for name in names]
+    track_ids = np.unique(np.concatenate([column[:, 0] for column in columns]).astype(np.int64))
+
+    matrix = np.zeros((len(track_ids), len(names)), dtype=np.float64)
+    for col, column in enumerate(columns):
+        scores = np.clip(column[:, 1], 0.0, None)
+        rows = np.searchsorted(track_ids, column[:, 0].astype(np.int64))
+        matrix[rows, col] = scores / max(float(scores.max()), 1e-10)
+
+    contributions = matrix * np.array([weights.get(name, 0.0) for name in names])
+    blended = contributions.sum(axis=1)
+    blended[np.isin(track_ids, liked, assume_unique=True)] = -np.inf
+    return track_ids, blended, contributions, names
+
+
+def rank_for_user(user_id, k=None, weights=None, budget_ms=None):
+    """
+    Hybrid top-k for one user from content, co-interaction neighbours,
+    matrix factors and trending candidates.
+
+    Sources with weight 0 are not queried; the rest run highest weight
+    first. Before each source after the first the elapsed time is checked
+    against `budget_ms` (HYBRID_LATENCY_BUDGET_MS); once it is spent the
+    remaining, lower-weighted sources are skipped and ranking proceeds with
+    what was gathered. The budget is best-effort: a source that has
+    started is never interrupted, so one slow source can still overrun it
+    (reported as over_budget).
+
+    Returns a dict:
+        items: [{'track_id', 'score', 'sources': {source: contribution}}, ...] best first
+        timings_ms: per stage plus 'total'
+        budget_ms, skipped (sources not run), over_budget
+    """
+    started = time.perf_counter()
+    k = k or settings.HYBRID_TOP_K
+    weights = {**settings.HYBRID_WEIGHTS, **(weights or {})}
+    budget_ms = budget_ms or settings.HYBRID_LATENCY_BUDGET_MS
+    n_candidates = max(settings.HYBRID_CANDIDATES, k)
+    timings = {}
+
+    def elapsed_ms():
+        return (time.perf_counter() - started) * 1000
+
+    liked = liked_track_ids(user_id)
+    timings['liked'] = elapsed_ms()
+
+    candidates, skipped = {}, []
+    active = [name for name in SOURCES if weights.get(name)]
+    for name in sorted(active, key=lambda name: -weights[name]):
+        if candidates and elapsed_ms() >= budget_ms:
+            skipped.append(name)
+            continue
+        stage_started = time.perf_counter()
+        candidates[name] = SOURCES[name](user_id, liked, n_candidates)
+        timings[name] = (time.perf_counter() - stage_started) * 1000
+
+    stage_started = time.perf_counter()
+    track_ids, blended, contributions, names = blend(candidates, weights, liked)
+    ranked = np.flatnonzero(np.isfinite(blended) & (blended > 0))
+    if len(ranked) > k:
+        ranked = ranked[np.argpartition(-blended[ranked], k - 1)[:k]]
+    ranked = ranked[np.argsort(-blended[ranked], kind='stable')]
+    items = [
+        {
+            'track_id': int(track_ids[row]),
+            'score': float(blended[row]),
+            'sources': {name: float(contributions[row, col]) for col, name in enumerate(names) if contributions[row, col]},
+        }
+        for row in ranked
+    ]
+    timings['blend'] = (time.perf_counter() - stage_started) * 1000
+    timings['total'] = elapsed_ms()
+
+    over_budget = timings['total'] > budget_ms
+    if over_budget or skipped:
+        music_logger.warning(
+            f"Hybrid ranking for user {user_id} took {timings['total']:.1f}ms "
+            f"(budget {budget_ms}ms), skipped: {', '.join(skipped) or 'none'}"
+        )
+    return {
+        'items': items,
+        'timings_ms': {stage: round(ms, 3) for stage, ms in timings.items()},
+        'budget_ms': budget_ms,
+        'skipped': skipped,
+        'over_budget': over_budget,
+    }
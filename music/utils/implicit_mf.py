@@ -0,0 +1,281 @@
+# music/utils/implicit_mf.py
+
+import json
+import multiprocessing
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from music.utils.versioned_arrays import VersionedArrays
+
+# No model imports here: spawned pool workers import this module without Django set up.
+# scipy is imported by the training code only, not by the serving path.
+
+ARRAY_FILES = ('user_ids', 'track_ids', 'user_factors', 'item_factors')
+
+
+def factors_dir():
+    return Path(getattr(settings, 'MF_DIR', settings.BASE_DIR / 'artifacts' / 'implicit_mf'))
+
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MB (ru_maxrss is KB on Linux).
+    """
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def solve_rows(matrix, fixed, gram, regularization, alpha):
+    """
+    One ALS half-step for every row of `matrix` (rows x items, implicit
+    strengths r) against the fixed factors of the other side.
+
+    Hu, Koren & Volinsky: confidence c = 1 + alpha * r on observed cells,
+    1 elsewhere; preference 1 on observed cells. Each row solves
+        (F^T F + F_i^T (C_i - I) F_i + reg * I) x = F_i^T c_i
+    where only the row's observed items enter the correction term, so the
+    cost per row is O(nnz * f^2 + f^3) and `gram` = F^T F is shared.
+    """
+    n_factors = fixed.shape[1]
+    base = gram + regularization * np.eye(n_factors, dtype=np.float64)
+    solved = np.zeros((matrix.shape[0], n_factors), dtype=np.float32)
+    for row in range(matrix.shape[0]):
+        lo, hi = matrix.indptr[row], matrix.indptr[row + 1]
+        if lo == hi:
+            continue
+        items = fixed[matrix.indices[lo:hi]].astype(np.float64)
+        confidence = 1.0 + alpha * matrix.data[lo:hi].astype(np.float64)
+        lhs = base + (items.T * (confidence - 1.0)) @ items
+        solved[row] = np.linalg.solve(lhs, items.T @ confidence)
+    return solved
+
+
+_worker_matrices = {}
+
+
+def _init_worker(matrix_paths):
+    from scipy import sparse
+
+    for side, path in matrix_paths.items():
+        _worker_matrices[side] = sparse.load_npz(path).tocsr()
+
+
+def _solve_block(side, start, stop, fixed_path, gram, regularization, alpha):
+    # Fixed factors are memory-mapped: every worker shares one page-cache copy
+    fixed = np.load(fixed_path, mmap_mode='r')
+    block = _worker_matrices[side][start:stop]
+    return start, solve_rows(block, fixed, gram, regularization, alpha), peak_rss_mb()
+
+
+def implicit_loss(matrix, user_factors, item_factors, regularization, alpha, chunk_size=100000):
+    """
+    The full implicit-feedback objective over all users x items cells,
+    without materialising the dense prediction matrix:
+        sum_all (x.y)^2 = trace(X^T X Y^T Y)
+    plus a correction on the observed cells only.
+    """
+    X = user_factors.astype(np.float64)
+    Y = item_factors.astype(np.float64)
+    loss = float(np.sum((X.T @ X) * (Y.T @ Y)))
+
+    coo = matrix.tocoo()
+    for start in range(0, coo.nnz, chunk_size):
+        rows = coo.row[start:start + chunk_size]
+        cols = coo.col[start:start + chunk_size]
+        predicted = np.einsum('ij,ij->i', X[rows], Y[cols])
+        confidence = 1.0 + alpha * coo.data[start:start + chunk_size].astype(np.float64)
+        loss += float(np.sum(confidence * (1.0 - predicted) ** 2 - predicted ** 2))
+
+    return loss + regularization * float(np.sum(X * X) + np.sum(Y * Y))
+
+
+def train_als(matrix, factors=None, regularization=None, alpha=None, iterations=None,
+              workers=None, block_size=1024, tolerance=1e-4, seed=0, on_iteration=None):
+    """
+    Implicit ALS on a users x items strength matrix.
+
+    Each iteration solves every user against fixed item factors, then
+    every item against the new user factors. Rows are cut into
+    `block_size` blocks solved across a spawn process pool; workers load
+    the matrix once and memory-map the fixed side from a temp file that is
+    rewritten every half-step. workers=1 solves in this process.
+
+    Stops early once the loss improves by less than `tolerance`
+    (relative). `on_iteration(stats)` gets, per iteration: iteration, loss,
+    improvement, seconds, rows_per_second, nnz_per_second, rss_mb and
+    worker_rss_mb (peaks).
+
+    Returns a tuple: (user_factors, item_factors, history list of stats)
+    """
+    from scipy import sparse
+
+    factors = factors or settings.MF_FACTORS
+    regularization = settings.MF_REGULARIZATION if regularization is None else regularization
+    alpha = settings.MF_ALPHA if alpha is None else alpha
+    iterations = iterations or settings.MF_ITERATIONS
+    workers = workers or os.cpu_count() or 1
+
+    matrix = sparse.csr_matrix(matrix, dtype=np.float32)
+    by_item = matrix.T.tocsr()
+    rng = np.random.default_rng(seed)
+    sides = {
+        'users': rng.normal(0, 0.01, (matrix.shape[0], factors)).astype(np.float32),
+        'items': rng.normal(0, 0.01, (matrix.shape[1], factors)).astype(np.float32),
+    }
+    history = []
+
+    with tempfile.TemporaryDirectory(prefix='implicit-mf-') as scratch:
+        executor = None
+        if workers > 1:
+            matrix_paths = {'users': os.path.join(scratch, 'users.npz'), 'items': os.path.join(scratch, 'items.npz')}
+            sparse.save_npz(matrix_paths['users'], matrix, compressed=False)
+            sparse.save_npz(matrix_paths['items'], by_item, compressed=False)
+            executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(matrix_paths,),
+            )
+
+        def half_step(side, other, rows_matrix, worker_rss):
+            fixed = sides[other]
+            gram = fixed.T.astype(np.float64) @ fixed.astype(np.float64)
+            if executor is None:
+                return solve_rows(rows_matrix, fixed, gram, regularization, alpha)
+
+            fixed_path = os.path.join(scratch, f'{other}.npy')
+            np.save(fixed_path, fixed)
+            solved = np.empty_like(sides[side])
+            futures = [
+                executor.submit(_solve_block, side, start, min(start + block_size, rows_matrix.shape[0]),
+                                fixed_path, gram, regularization, alpha)
+                for start in range(0, rows_matrix.shape[0], block_size)
+            ]
+            for future in futures:
+                start, block, rss = future.result()
+                solved[start:start + len(block)] = block
+                worker_rss.append(rss)
+            return solved
+
+        try:
+            previous = None
+            for iteration in range(1, iterations + 1):
+                started = time.perf_counter()
+                worker_rss = []
+                sides['users'] = half_step('users', 'items', matrix, worker_rss)
+                sides['items'] = half_step('items', 'users', by_item, worker_rss)
+                elapsed = time.perf_counter() - started
+
+                loss = implicit_loss(matrix, sides['users'], sides['items'], regularization, alpha)
+                improvement = None if previous is None else (previous - loss) / max(abs(previous), 1e-12)
+                stats = {
+                    'iteration': iteration,
+                    'loss': loss,
+                    'improvement': improvement,
+                    'seconds': elapsed,
+                    'rows_per_second': (matrix.shape[0] + matrix.shape[1]) / max(elapsed, 1e-9),
+                    'nnz_per_second': 2 * matrix.nnz / max(elapsed, 1e-9),
+                    'rss_mb': peak_rss_mb(),
+                    'worker_rss_mb': max(worker_rss, default=0.0),
+                }
+                history.append(stats)
+                if on_iteration:
+                    on_iteration(stats)
+                if improvement is not None and improvement < tolerance:
+                    break
+                previous = loss
+        finally:
+            if executor is not None:
+                executor.shutdown()
+
+    return sides['users'], sides['items'], history
+
+
+def save_factors(user_ids, track_ids, user_factors, item_factors, meta=None, directory=None, keep=3):
+    """
+    Publishes trained factors as a new version: <dir>/<version>/{user_ids,
+    track_ids,user_factors,item_factors}.npy plus meta.json and a CURRENT
+    pointer, published with VersionedArrays like the embedding snapshot.
+    user_ids/track_ids are the id map: row i of a factor matrix belongs to
+    the i-th id. Users are sorted so readers find them with searchsorted.
+
+    Returns the version.
+    """
+    order = np.argsort(user_ids, kind='stable')
+    arrays = {
+        'user_ids': np.asarray(user_ids, dtype=np.int64)[order],
+        'track_ids': np.asarray(track_ids, dtype=np.int64),
+        'user_factors': np.ascontiguousarray(user_factors[order], dtype=np.float32),
+        'item_factors': np.ascontiguousarray(item_factors, dtype=np.float32),
+    }
+
+    def write_meta(staging):
+        (staging / 'meta.json').write_text(json.dumps(meta or {}))
+
+    return factor_models.write(arrays, extra=write_meta, directory=directory, keep=keep)
+
+
+class FactorModel:
+    """
+    Read-only, memory-mapped view of one trained factor version.
+    """
+
+    def __init__(self, path, version):
+        self.version = version
+        for name in ARRAY_FILES:
+            setattr(self, name, np.load(Path(path) / f'{name}.npy', mmap_mode='r'))
+
+    def user_row(self, user_id):
+        row = int(np.searchsorted(self.user_ids, user_id))
+        if row < len(self.user_ids) and self.user_ids[row] == user_id:
+            return row
+        return None
+
+    def recommend(self, user_id, k=20, exclude=()):
+        """
+        Top-k tracks for a user: one matrix-vector product over every item
+        factor, then argpartition. Users unseen at training time get [].
+
+        Returns [(track_id, score), ...] best first.
+        """
+        row = self.user_row(user_id)
+        if row is None or not len(self.track_ids):
+            return []
+
+        scores = self.item_factors @ self.user_factors[row]
+        if exclude:
+            excluded = np.isin(self.track_ids, np.fromiter(exclude, dtype=np.int64))
+            scores[excluded] = -np.inf
+
+        k = min(k, int(np.isfinite(scores).sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return list(zip(self.track_ids[top].tolist(), scores[top].astype(float).tolist()))
+
+
+factor_models = VersionedArrays(factors_dir, FactorModel, 'MF_CHECK_SECONDS')
+
+
+def current_factors(max_age=None):
+    """
+    Returns the live FactorModel for this process, or None if none exists.
+    The CURRENT pointer is re-read at most every MF_CHECK_SECONDS.
+    """
+    return factor_models.current(max_age)
+
+
+def factor_recommendations(user_id, k=20, exclude=()):
+    """
+    Top-k tracks for a user from the live factor model, or [] when none exists.
+    """
+    model = current_factors()
+    if model is None:
+        return []
+    return model.recommend(user_id, k=k, exclude=exclude)
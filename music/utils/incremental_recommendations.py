@@ -0,0 +1,150 @@
+# music/utils/incremental_recommendations.py
+
+import logging
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q
+from music.models import Interaction, UserTasteProfile
+from music.utils.ann import ExactIndex
+from music.utils.batch_recommendations import save_user_recommendations, unapproved_positions
+from music.utils.embedding_snapshot import current_snapshot
+from music.utils.feature_scaling import current_scaler
+from music.utils.recommendations import fetch_embedding_arrays
+
+music_logger = logging.getLogger('music')
+
+
+def _pending_key(user_id):
+    return f'like_refresh_pending:{user_id}'
+
+
+def schedule_like_refresh(user_id):
+    """
+    Queues one recommendation refresh for the user LIKE_REFRESH_DEBOUNCE_SECONDS
+    from now, unless one is already queued: a burst of likes costs one
+    recompute that sees all of them. Both the marker and the task wait for
+    commit, so a rolled-back like neither queues a refresh nor blocks the
+    next one.
+    """
+    from music.tasks import refresh_user_recommendations_task  # tasks imports this module
+
+    debounce = settings.LIKE_REFRESH_DEBOUNCE_SECONDS
+
+    def enqueue():
+        # The marker outlives the countdown so a lost task only delays the next refresh
+        if cache.add(_pending_key(user_id), 1, timeout=debounce + 300):
+            refresh_user_recommendations_task.apply_async((user_id,), countdown=debounce)
+
+    transaction.on_commit(enqueue)
+
+
+def clear_pending_refresh(user_id):
+    """
+    Called when the refresh starts, so likes arriving during it queue another.
+    """
+    cache.delete(_pending_key(user_id))
+
+
+def embedding_arrays():
+    """
+    fetch_embedding_arrays plus the version of the embedding space they are
+    in: the snapshot version, or the scaler version when no snapshot is
+    published. Rescaling (reembed_track_features) and relabelling
+    (relabel_moods) both publish a new snapshot, so a profile folded under
+    another version no longer matches the embeddings.
+    Returns a tuple: (track_ids, embeddings, norms, version)
+    """
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        return snapshot.track_ids, snapshot.embeddings, snapshot.norms, f'snapshot:{snapshot.version}'
+
+    scaler = current_scaler()
+    return (*fetch_embedding_arrays(), f"scaler:{scaler.version if scaler else 'none'}")
+
+
+def refresh_user_recommendations(user_id, top_n=10):
+    """
+    Folds the user's likes newer than their taste profile into its running
+    mean, rescores the catalog with an exact cosine scan and replaces only
+    this user's stored recommendations.
+
+    The mean is updated as mean + (sum(new) - n_new * mean) / (n + n_new),
+    so only the new likes' embeddings are read. Each track counts once, as
+    in the batch generator: a new like of a track already folded in is
+    skipped, and so the ranking equals the batch one for the same user.
+    A user without a profile, or whose profile was folded in another
+    embedding version, is bootstrapped from all their likes once; removing
+    a like drops the profile so the next refresh rebuilds it. Likes of
+    tracks without an embedding yet are kept in pending_like_ids and
+    folded by a later refresh, once the track is embedded.
+
+    The profile row is locked for the whole fold, so concurrent refreshes
+    of one user run one after the other and each sees the other's
+    last_like_id, and an unlike's profile delete waits for the refresh to
+    commit instead of being overwritten by it.
+
+    Returns the stored [(track_id, score), ...], or None when nothing changed.
+    """
+    started = time.perf_counter()
+    track_ids, embeddings, norms, version = embedding_arrays()
+    if not len(track_ids):
+        return None
+
+    likes = Interaction.objects.filter(user_id=user_id, interaction_type='like').order_by()
+    with transaction.atomic():
+        profile, _ = UserTasteProfile.objects.select_for_update().get_or_create(user_id=user_id)
+        stale = profile.vector is None or len(profile.vector) != embeddings.shape[1]
+        if stale or profile.embedding_version != version:
+            profile.vector, profile.like_count, profile.last_like_id = None, 0, 0
+            profile.pending_like_ids, profile.embedding_version = [], version
+
+        pending = set(profile.pending_like_ids)
+        new_likes = list(
+            likes.filter(Q(id__gt=profile.last_like_id) | Q(id__in=pending)).values_list('id', 'track_id')
+        )
+        if not new_likes:
+            return None
+
+        new_track_ids = {track_id for _, track_id in new_likes}
+        if profile.last_like_id:
+            folded = likes.filter(id__lte=profile.last_like_id, track_id__in=new_track_ids).exclude(id__in=pending)
+            new_track_ids -= set(folded.values_list('track_id', flat=True))
+
+        new_rows = np.flatnonzero(np.isin(track_ids, list(new_track_ids)))
+        # Not embedded yet: retried on the next refresh instead of being skipped for good
+        unembedded = new_track_ids - set(track_ids[new_rows].tolist())
+        profile.pending_like_ids = sorted(like_id for like_id, track_id in new_likes if track_id in unembedded)
+        if not len(new_rows) and max(like_id for like_id, _ in new_likes) <= profile.last_like_id:
+            return None  # Only pending likes, still without an embedding
+
+        mean = np.zeros(embeddings.shape[1]) if profile.vector is None else np.asarray(profile.vector, dtype=np.float64)
+        if len(new_rows):
+            total = profile.like_count + len(new_rows)
+            new_sum = np.asarray(embeddings[new_rows], dtype=np.float64).sum(axis=0)
+            mean += (new_sum - len(new_rows) * mean) / total
+            profile.like_count = total
+        profile.vector = mean.astype(np.float32).tolist()
+        profile.last_like_id = max(profile.last_like_id, *(like_id for like_id, _ in new_likes))
+
+        if not profile.like_count:
+            profile.save()
+            return None  # None of the liked tracks has an embedding yet; they stay pending
+
+        # Liked and unapproved tracks are excluded by position; only their ids are read
+        liked_rows = np.flatnonzero(np.isin(track_ids, list(likes.values_list('track_id', flat=True))))
+        excluded = np.union1d(liked_rows, unapproved_positions(track_ids))
+        positions, scores = ExactIndex(embeddings, norms).search(mean, k=top_n, exclude=excluded)
+        ranking = list(zip(track_ids[positions].tolist(), scores.tolist()))
+
+        profile.save()
+        save_user_recommendations({user_id: ranking})
+
+    music_logger.info(
+        f"Recommendations for user {user_id} refreshed from {len(new_likes)} new likes "
+        f"in {(time.perf_counter() - started) * 1000:.1f}ms"
+    )
+    return ranking
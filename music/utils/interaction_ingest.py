@@ -0,0 +1,74 @@
+# music/utils/interaction_ingest.py
+
+from django.conf import settings
+from django.db import transaction
+from music.models import Interaction, Track
+from music.serializers import InteractionEventSerializer
+from music.utils.incremental_recommendations import schedule_like_refresh
+from music.utils.track_counters import apply_deltas, interaction_deltas
+from music.utils.trending import record_events
+
+
+def ingest_interactions(user, events, chunk_size=None):
+    """
+    Validates and stores a batch of interaction events for `user`.
+
+    Every event is validated without touching the database, all track ids
+    are resolved with one in_bulk query, and the valid events are written
+    with bulk_create in chunks of `chunk_size` inside one transaction,
+    together with their TrackStatistics and trending updates. A like of a
+    track the user already likes (or liked earlier in the batch) is not
+    stored again and gets the status 'duplicate'.
+
+    Returns a tuple: (results, created) where results holds one
+    {'index', 'status', ['errors']} dict per event, in request order;
+    status is 'created', 'duplicate' or 'invalid'.
+    """
+    chunk_size = chunk_size or settings.INTERACTION_BATCH_CHUNK_SIZE
+    results = [None] * len(events)
+    valid = []
+
+    for index, event in enumerate(events):
+        serializer = InteractionEventSerializer(data=event)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = {'index': index, 'status': 'invalid', 'errors': serializer.errors}
+
+    # ✅ One query for every referenced track
+    tracks = Track.objects.only('id').in_bulk({data['track'] for _, data in valid})
+    liked = set(
+        Interaction.objects.filter(
+            user=user, interaction_type='like',
+            track_id__in=[data['track'] for _, data in valid if data['interaction_type'] == 'like'],
+        ).values_list('track_id', flat=True)
+    )
+
+    to_create = []
+    for index, data in valid:
+        track = tracks.get(data['track'])
+        if track is None:
+            results[index] = {'index': index, 'status': 'invalid', 'errors': {'track': [f"Track {data['track']} does not exist."]}}
+            continue
+        if data['interaction_type'] == 'like':
+            if track.id in liked:
+                results[index] = {'index': index, 'status': 'duplicate'}
+                continue
+            liked.add(track.id)
+        to_create.append(Interaction(
+            user=user,
+            track=track,
+            interaction_type=data['interaction_type'],
+            comment_text=data['comment_text'],
+        ))
+        results[index] = {'index': index, 'status': 'created'}
+
+    with transaction.atomic():
+        Interaction.objects.bulk_create(to_create, batch_size=max(1, chunk_size))
+        # bulk_create skips signals, so update TrackStatistics and trending here
+        apply_deltas(interaction_deltas(to_create))
+        record_events((row.track_id, row.interaction_type, row.created_at) for row in to_create)
+        if any(row.interaction_type == 'like' for row in to_create):
+            schedule_like_refresh(user.id)
+
+    return results, len(to_create)
@@ -0,0 +1,256 @@
+# music/utils/item_cf.py
+
+import time
+from array import array
+from collections import defaultdict
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from music.models import Interaction, ListeningHistory, Track
+from music.utils.keyset import keyset_rows
+from music.utils.versioned_arrays import VersionedArrays
+
+# scipy.sparse is imported inside the build functions: serving only reads the
+# saved arrays, and web workers import this module through the hybrid ranker
+
+ARRAY_FILES = ('track_ids', 'indptr', 'neighbours', 'scores')
+
+
+def neighbours_dir():
+    return Path(getattr(settings, 'ITEM_CF_DIR', settings.BASE_DIR / 'artifacts' / 'item_cf'))
+
+
+def interaction_weights():
+    """
+    Weight of one event per kind: Interaction types plus 'listen' for ListeningHistory.
+    """
+    return settings.ITEM_CF_WEIGHTS
+
+
+def load_interaction_matrix(chunk_size=10000):
+    """
+    Streams Interaction and ListeningHistory into a sparse users x tracks
+    matrix, `chunk_size` rows per query. A cell is log1p of the summed event weights, so one like
+    outweighs a single play but a track on repeat does not drown out
+    everything else. Only approved tracks get a column; columns are in
+    ascending track id order.
+
+    Returns a tuple: (user_ids array, track_ids array, float32 csr_matrix)
+    """
+    from scipy import sparse
+
+    weights = interaction_weights()
+    track_ids = np.fromiter(
+        (track_id for track_id, in keyset_rows(Track.objects.filter(approval_status='approved'), ['id'], chunk_size)),
+        dtype=np.int64,
+    )
+    track_positions = {int(track_id): col for col, track_id in enumerate(track_ids)}
+    user_positions = {}
+    rows, cols, values = array('q'), array('q'), array('f')
+
+    def collect(events):
+        for user_id, track_id, kind in events:
+            col = track_positions.get(track_id)
+            weight = weights.get(kind)
+            if col is None or not weight:
+                continue
+            rows.append(user_positions.setdefault(user_id, len(user_positions)))
+            cols.append(col)
+            values.append(weight)
+
+    # ✅ Keyset chunks: .iterator() is buffered whole by mysqlclient
+    collect(keyset_rows(Interaction.objects.all(), ['user_id', 'track_id', 'interaction_type'], chunk_size))
+    collect(
+        (user_id, track_id, 'listen')
+        for user_id, track_id in keyset_rows(ListeningHistory.objects.all(), ['user_id', 'track_id'], chunk_size)
+    )
+
+    # Duplicate (user, track) pairs are summed by the COO -> CSR conversion
+    matrix = sparse.coo_matrix(
+        (
+            np.frombuffer(values, dtype=np.float32),
+            (np.frombuffer(rows, dtype=np.int64), np.frombuffer(cols, dtype=np.int64)),
+        ),
+        shape=(len(user_positions), len(track_ids)),
+    ).tocsr()
+    np.log1p(matrix.data, out=matrix.data)
+    user_ids = np.fromiter(user_positions.keys(), dtype=np.int64, count=len(user_positions))
+    return user_ids, track_ids, matrix
+
+
+def item_neighbours(matrix, k=None, chunk_size=2048):
+    """
+    Top-k cosine neighbours of every column of a users x tracks matrix.
+
+    Similarities are computed `chunk_size` items at a time as a sparse
+    product, so only pairs of tracks that share a user are ever touched and
+    memory stays bounded by the chunk. Each row keeps its k best
+    neighbours (itself excluded).
+
+    Returns a tuple of CSR arrays: (indptr int64, neighbours int32, scores float32)
+    """
+    from scipy import sparse
+
+    k = k or settings.ITEM_CF_NEIGHBOURS
+    n_items = matrix.shape[1]
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+    normalized = (matrix @ sparse.diags(1.0 / np.maximum(norms, 1e-10))).astype(np.float32).tocsc()
+    normalized_rows = normalized.tocsr()
+
+    counts = np.zeros(n_items, dtype=np.int64)
+    neighbour_chunks, score_chunks = [], []
+    for start in range(0, n_items, chunk_size):
+        stop = min(start + chunk_size, n_items)
+        similarities = (normalized[:, start:stop].T @ normalized_rows).tocsr()
+
+        for offset in range(stop - start):
+            lo, hi = similarities.indptr[offset], similarities.indptr[offset + 1]
+            row_items = similarities.indices[lo:hi]
+            other = row_items != start + offset
+            row_scores, row_items = similarities.data[lo:hi][other], row_items[other]
+            if len(row_scores) > k:
+                best = np.argpartition(-row_scores, k - 1)[:k]
+                row_scores, row_items = row_scores[best], row_items[best]
+            order = np.argsort(-row_scores, kind='stable')
+            neighbour_chunks.append(row_items[order].astype(np.int32))
+            score_chunks.append(row_scores[order].astype(np.float32))
+            counts[start + offset] = len(order)
+
+    indptr = np.zeros(n_items + 1, dtype=np.int64)
+    np.cumsum(counts, out=indptr[1:])
+    neighbours = np.concatenate(neighbour_chunks) if neighbour_chunks else np.empty(0, dtype=np.int32)
+    scores = np.concatenate(score_chunks) if score_chunks else np.empty(0, dtype=np.float32)
+    return indptr, neighbours, scores
+
+
+def write_neighbours(directory=None, k=None, chunk_size=2048, keep=3):
+    """
+    Builds the item-item neighbour table from all interactions and publishes
+    it as a new version.
+
+    Layout mirrors the embedding snapshot: <dir>/<version>/{track_ids,
+    indptr,neighbours,scores}.npy plus a CURRENT pointer (VersionedArrays). Row i of the CSR arrays holds the neighbours of
+    track_ids[i]; neighbours are stored as row positions (int32), so the
+    whole table costs 8 bytes per neighbour.
+
+    Returns stats: version, users, tracks, neighbours, bytes, seconds.
+    """
+    started = time.perf_counter()
+    user_ids, track_ids, matrix = load_interaction_matrix()
+    indptr, neighbours, scores = item_neighbours(matrix, k=k, chunk_size=chunk_size)
+    arrays = {'track_ids': track_ids, 'indptr': indptr, 'neighbours': neighbours, 'scores': scores}
+    version = neighbour_tables.write(arrays, directory=directory, keep=keep)
+
+    return {
+        'version': version,
+        'users': len(user_ids),
+        'tracks': len(track_ids),
+        'neighbours': len(neighbours),
+        'bytes': sum(values.nbytes for values in arrays.values()),
+        'seconds': time.perf_counter() - started,
+    }
+
+
+class ItemNeighbours:
+    """
+    Read-only, memory-mapped view of one neighbour table version.
+    """
+
+    def __init__(self, path, version):
+        self.version = version
+        for name in ARRAY_FILES:
+            setattr(self, name, np.load(Path(path) / f'{name}.npy', mmap_mode='r'))
+
+    def __len__(self):
+        return len(self.track_ids)
+
+    def recommend(self, history, k=20, exclude=()):
+        """
+        Scores tracks for a user from their weighted history {track_id: weight}.
+
+        A candidate's score is sum(weight * similarity) over the history
+        tracks that list it as a neighbour, so the work is
+        len(history) * ITEM_CF_NEIGHBOURS regardless of catalogue size.
+        History tracks and `exclude` are never returned.
+
+        Returns [(track_id, score), ...] best first.
+        """
+        if not history or not len(self.track_ids):
+            return []
+
+        history_ids = np.fromiter(history.keys(), dtype=np.int64, count=len(history))
+        history_weights = np.fromiter(history.values(), dtype=np.float32, count=len(history))
+        rows = np.searchsorted(self.track_ids, history_ids)
+        rows = np.minimum(rows, len(self.track_ids) - 1)
+        known = self.track_ids[rows] == history_ids
+        rows, history_weights = rows[known], history_weights[known]
+        if not len(rows):
+            return []
+
+        starts, stops = self.indptr[rows], self.indptr[rows + 1]
+        lengths = stops - starts
+        if not lengths.sum():
+            return []
+        # Gather every neighbour slice of the history rows in one fancy-index
+        slots = np.repeat(stops - lengths.cumsum(), lengths) + np.arange(lengths.sum())
+        candidates = self.neighbours[slots]
+        contributions = self.scores[slots] * np.repeat(history_weights, lengths)
+
+        candidates, inverse = np.unique(candidates, return_inverse=True)
+        totals = np.bincount(inverse, weights=contributions)
+        candidate_ids = self.track_ids[candidates]
+
+        excluded = np.fromiter({*history.keys(), *exclude}, dtype=np.int64)
+        keep = ~np.isin(candidate_ids, excluded)
+        candidate_ids, totals = candidate_ids[keep], totals[keep]
+        if not len(totals):
+            return []
+
+        k = min(k, len(totals))
+        top = np.argpartition(-totals, k - 1)[:k]
+        top = top[np.argsort(-totals[top], kind='stable')]
+        return list(zip(candidate_ids[top].tolist(), totals[top].tolist()))
+
+
+neighbour_tables = VersionedArrays(neighbours_dir, ItemNeighbours, 'ITEM_CF_CHECK_SECONDS')
+
+
+def current_neighbours(max_age=None):
+    """
+    Returns the live ItemNeighbours for this process, or None if none exists.
+    The CURRENT pointer is re-read at most every ITEM_CF_CHECK_SECONDS.
+    """
+    return neighbour_tables.current(max_age)
+
+
+def user_history(user_id, limit=None):
+    """
+    The user's most recent events folded into {track_id: weight}, weighted
+    and damped the same way as the training matrix. At most `limit`
+    (ITEM_CF_HISTORY_LIMIT) rows are read from each table.
+    """
+    limit = limit or settings.ITEM_CF_HISTORY_LIMIT
+    weights = interaction_weights()
+    totals = defaultdict(float)
+
+    interactions = Interaction.objects.filter(user_id=user_id).values_list('track_id', 'interaction_type')[:limit]
+    for track_id, kind in interactions:
+        totals[track_id] += weights.get(kind, 0.0)
+    listens = ListeningHistory.objects.filter(user_id=user_id).values_list('track_id', flat=True)[:limit]
+    for track_id in listens:
+        totals[track_id] += weights.get('listen', 0.0)
+
+    return {track_id: float(np.log1p(total)) for track_id, total in totals.items() if total > 0}
+
+
+def collaborative_recommendations(user_id, k=20, exclude=()):
+    """
+    Top-k tracks for a user from co-interaction neighbours: two indexed
+    queries for the history, then a lookup in the neighbour table.
+    Returns [(track_id, score), ...] best first, or [] when no table exists.
+    """
+    table = current_neighbours()
+    if table is None:
+        return []
+    return table.recommend(user_history(user_id), k=k, exclude=exclude)
@@ -0,0 +1,18 @@
+# music/utils/keyset.py
+
+
+def keyset_rows(queryset, fields, chunk_size):
+    """
+    Yields `fields` tuples in primary-key order, one bounded query per
+    chunk (WHERE pk > last ORDER BY pk LIMIT n). Unlike .iterator(), which
+    mysqlclient buffers whole on the client, memory stays at one chunk.
+    """
+    last = None
+    while True:
+        chunk = queryset if last is None else queryset.filter(pk__gt=last)
+        rows = list(chunk.order_by('pk').values_list('pk', *fields)[:chunk_size])
+        for row in rows:
+            yield row[1:]
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1][0]
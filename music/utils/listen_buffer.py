@@ -0,0 +1,217 @@
+# music/utils/listen_buffer.py
+
+import json
+import logging
+import time
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from music.models import ListeningHistory, Track
+from music.utils.track_counters import apply_deltas, listen_deltas
+from music.utils.trending import flush_buffered_events, record_events
+
+music_logger = logging.getLogger('music')
+
+BUFFER_KEY = 'listen_buffer:events'
+METRICS_KEY = 'listen_buffer:metrics'
+LOCK_KEY = 'listen_buffer:drain_lock'
+
+# Check-and-push in one step so concurrent writers can never overfill the buffer
+_PUSH_SCRIPT = """
+if redis.call('LLEN', KEYS[1]) >= tonumber(ARGV[2]) then
+    redis.call('HINCRBY', KEYS[2], 'rejected_total', 1)
+    return -1
+end
+return redis.call('RPUSH', KEYS[1], ARGV[1])
+"""
+
+# Release the drain lock only if we still hold it
+_RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+class BufferFull(Exception):
+    """
+    Raised when the buffer holds LISTEN_BUFFER_MAX_EVENTS events.
+    """
+
+
+_client = None
+
+
+def get_client():
+    """
+    Shared Redis client for the buffer, or None when buffering is disabled
+    or the redis package is missing.
+    """
+    global _client
+    if not settings.LISTEN_BUFFER_ENABLED:
+        return None
+    if _client is None:
+        try:
+            import redis
+        except ImportError:
+            return None
+        _client = redis.Redis.from_url(settings.LISTEN_BUFFER_REDIS_URL, socket_timeout=2)
+    return _client
+
+
+def buffer_listen(user_id, track_id, listened_at=None):
+    """
+    Queues one listen for the next drain.
+
+    Returns True when buffered, False when buffering is unavailable (disabled
+    or Redis unreachable) and the caller should write the row itself.
+    Raises BufferFull when the buffer is at capacity.
+    """
+    client = get_client()
+    if client is None:
+        return False
+
+    event = json.dumps({
+        'user': user_id,
+        'track': track_id,
+        'at': (listened_at or timezone.now()).isoformat(),
+    })
+    try:
+        depth = client.eval(_PUSH_SCRIPT, 2, BUFFER_KEY, METRICS_KEY, event, settings.LISTEN_BUFFER_MAX_EVENTS)
+    except Exception as exc:
+        music_logger.warning(f"Listen buffer unavailable, writing synchronously: {exc}")
+        return False
+
+    if depth < 0:
+        raise BufferFull()
+    return True
+
+
+def _decode(raw_events):
+    events = []
+    for raw in raw_events:
+        try:
+            event = json.loads(raw)
+            events.append((int(event['user']), int(event['track']), parse_datetime(event['at'])))
+        except (ValueError, KeyError, TypeError):
+            continue
+    return events
+
+
+def _write_events(events):
+    """
+    bulk_creates decoded events, dropping ones whose user or track is gone,
+    and adds them to TrackStatistics.plays_count and the trending scores.
+    Returns the rows written.
+    """
+    track_ids = Track.objects.filter(pk__in={track for _, track, _ in events}).values_list('pk', flat=True)
+    user_ids = get_user_model().objects.filter(pk__in={user for user, _, _ in events}).values_list('pk', flat=True)
+    track_ids, user_ids = set(track_ids), set(user_ids)
+
+    rows = [
+        ListeningHistory(user_id=user, track_id=track, listened_at=listened_at or timezone.now())
+        for user, track, listened_at in events
+        if user in user_ids and track in track_ids
+    ]
+    with transaction.atomic():
+        ListeningHistory.objects.bulk_create(rows)
+        # bulk_create skips signals: one aggregated counter update per batch
+        apply_deltas(listen_deltas(rows))
+        record_events((row.track_id, 'listen', row.listened_at) for row in rows)
+    return rows
+
+
+def drain(max_events=None, batch_size=None):
+    """
+    Moves buffered listens into ListeningHistory with bulk_create.
+
+    Events are read with LRANGE and trimmed only after their batch is
+    committed, so a crash mid-drain re-delivers the batch (at-least-once).
+    A short Redis lock keeps concurrent drains from writing the same batch.
+    The trending increments queued by buffer_events are written in the same
+    drain.
+
+    Returns the stats of this drain, also recorded in buffer_metrics().
+    """
+    client = get_client()
+    if client is None:
+        return {'flushed': 0, 'dropped': 0, 'batches': 0, 'seconds': 0.0, 'lag_seconds': 0.0, 'depth': 0}
+
+    batch_size = batch_size or settings.LISTEN_BUFFER_DRAIN_BATCH
+    token = uuid.uuid4().hex
+    if not client.set(LOCK_KEY, token, nx=True, ex=settings.LISTEN_BUFFER_LOCK_SECONDS):
+        return {'flushed': 0, 'dropped': 0, 'batches': 0, 'seconds': 0.0, 'lag_seconds': 0.0,
+                'depth': client.llen(BUFFER_KEY), 'skipped': 'another drain is running'}
+
+    started = time.perf_counter()
+    stats = {'flushed': 0, 'dropped': 0, 'batches': 0, 'lag_seconds': 0.0}
+    try:
+        while max_events is None or stats['flushed'] + stats['dropped'] < max_events:
+            size = batch_size if max_events is None else min(batch_size, max_events - stats['flushed'] - stats['dropped'])
+            raw_events = client.lrange(BUFFER_KEY, 0, size - 1)
+            if not raw_events:
+                break
+
+            events = _decode(raw_events)
+            rows = _write_events(events)
+            client.ltrim(BUFFER_KEY, len(raw_events), -1)
+            client.expire(LOCK_KEY, settings.LISTEN_BUFFER_LOCK_SECONDS)
+
+            stats['batches'] += 1
+            stats['flushed'] += len(rows)
+            stats['dropped'] += len(raw_events) - len(rows)
+            if rows:
+                oldest = min(row.listened_at for row in rows)
+                stats['lag_seconds'] = max(stats['lag_seconds'], (timezone.now() - oldest).total_seconds())
+
+        # Likes and synchronous listens queue their trending increments in Redis too
+        stats['trending'] = flush_buffered_events(client)
+    finally:
+        client.eval(_RELEASE_SCRIPT, 1, LOCK_KEY, token)
+
+    stats['seconds'] = time.perf_counter() - started
+    stats['depth'] = client.llen(BUFFER_KEY)
+
+    if stats['batches']:
+        pipe = client.pipeline()
+        pipe.hincrby(METRICS_KEY, 'flushed_total', stats['flushed'])
+        pipe.hincrby(METRICS_KEY, 'dropped_total', stats['dropped'])
+        pipe.hset(METRICS_KEY, mapping={
+            'last_flush_at': timezone.now().isoformat(),
+            'last_flush_events': stats['flushed'],
+            'last_flush_seconds': round(stats['seconds'], 4),
+            'last_flush_lag_seconds': round(stats['lag_seconds'], 3),
+        })
+        pipe.execute()
+        music_logger.info(
+            f"Listen buffer drained {stats['flushed']} events ({stats['dropped']} dropped) "
+            f"in {stats['seconds']:.3f}s, max lag {stats['lag_seconds']:.1f}s, {stats['depth']} left"
+        )
+    return stats
+
+
+def buffer_metrics():
+    """
+    Current depth plus flush counters and the latency of the last drain.
+    """
+    client = get_client()
+    if client is None:
+        return {'enabled': False}
+
+    metrics = {key.decode(): value.decode() for key, value in client.hgetall(METRICS_KEY).items()}
+    for key in ('flushed_total', 'dropped_total', 'rejected_total', 'last_flush_events'):
+        metrics[key] = int(metrics.get(key, 0))
+    for key in ('last_flush_seconds', 'last_flush_lag_seconds'):
+        if key in metrics:
+            metrics[key] = float(metrics[key])
+    metrics.update(
+        enabled=True,
+        depth=client.llen(BUFFER_KEY),
+        capacity=settings.LISTEN_BUFFER_MAX_EVENTS,
+    )
+    return metrics
@@ -0,0 +1,55 @@
+# music/utils/mood.py
+
+import numpy as np
+from django.conf import settings
+
+# Features the mood rules read, in the column order predict_moods expects by default
+MOOD_FEATURES = ['energy', 'valence']
+
+DEFAULT_MOOD_THRESHOLDS = {
+    'happy_energy': 0.6,
+    'happy_valence': 0.5,
+    'sad_energy': 0.4,
+    'sad_valence': 0.4,
+    'energetic_energy': 0.7,
+    'romantic_valence': 0.6,
+}
+
+DEFAULT_MOOD = 'chill'
+
+
+def mood_thresholds(overrides=None):
+    """
+    DEFAULT_MOOD_THRESHOLDS updated with settings.MOOD_THRESHOLDS, then `overrides`.
+    """
+    thresholds = dict(DEFAULT_MOOD_THRESHOLDS)
+    thresholds.update(getattr(settings, 'MOOD_THRESHOLDS', None) or {})
+    thresholds.update(overrides or {})
+    return thresholds
+
+
+def predict_moods(matrix, columns=None, thresholds=None):
+    """
+    Labels every row of an (N x features) matrix in one vectorized pass.
+
+    `columns` names the matrix columns (default: MOOD_FEATURES); only energy
+    and valence are read. Rules are checked in order, first match wins:
+    happy, sad, energetic, romantic, otherwise chill.
+
+    Returns an object ndarray of N mood labels.
+    """
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float64))
+    columns = list(columns or MOOD_FEATURES)
+    t = mood_thresholds(thresholds)
+
+    energy = matrix[:, columns.index('energy')]
+    valence = matrix[:, columns.index('valence')]
+
+    conditions = [
+        (energy > t['happy_energy']) & (valence > t['happy_valence']),
+        (energy < t['sad_energy']) & (valence < t['sad_valence']),
+        energy > t['energetic_energy'],
+        valence > t['romantic_valence'],
+    ]
+    labels = np.array(['happy', 'sad', 'energetic', 'romantic'], dtype=object)
+    return np.select(conditions, labels, default=DEFAULT_MOOD)
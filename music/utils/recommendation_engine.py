@@ -1,8 +1,8 @@
 # music/utils/recommendation_engine.py
 
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from music.models import TrackFeature, Interaction
+from music.models import Track, TrackFeature, Interaction
+from music.utils.recommendations import load_embedding_matrix
 from users.models import User
 
 def generate_user_recommendations(user_id, top_n=10):
@@ -22,30 +22,22 @@ def generate_user_recommendations(user_id, top_n=10):
         return []  # No likes yet
 
     # Get embeddings of liked tracks
-    liked_embeddings = []
-    for track_feature in TrackFeature.objects.filter(track_id__in=liked_track_ids):
-        if track_feature.embedding:
-            liked_embeddings.append(np.array(track_feature.embedding))
+    liked_track_ids = list(liked_track_ids)
+    _, liked_embeddings = load_embedding_matrix(TrackFeature.objects.filter(track_id__in=liked_track_ids))
 
-    if not liked_embeddings:
+    if not len(liked_embeddings):
         return []
 
-    liked_embeddings = np.vstack(liked_embeddings)
-
     # Get all candidate tracks (excluding liked tracks)
-    candidate_tracks = TrackFeature.objects.exclude(track_id__in=liked_track_ids)
-
-    candidates = []
-    candidate_embeddings = []
-    for track_feature in candidate_tracks:
-        if track_feature.embedding:
-            candidates.append(track_feature.track)
-            candidate_embeddings.append(np.array(track_feature.embedding))
+    candidate_ids, candidate_embeddings = load_embedding_matrix(
+        TrackFeature.objects.exclude(track_id__in=liked_track_ids)
+    )
 
-    if not candidate_embeddings:
+    if not len(candidate_embeddings):
         return []
 
-    candidate_embeddings = np.vstack(candidate_embeddings)
+    # sklearn is only needed here; importing it with the module would load it into every web worker
+    from sklearn.metrics.pairwise import cosine_similarity
 
     # Calculate cosine similarity between liked embeddings and candidate embeddings
     similarities = cosine_similarity(candidate_embeddings, liked_embeddings)
@@ -56,6 +48,8 @@ def generate_user_recommendations(user_id, top_n=10):
     # Sort candidates by similarity
     top_indices = np.argsort(avg_similarities)[::-1][:top_n]
 
-    recommended_tracks = [candidates[i] for i in top_indices]
+    top_track_ids = [int(candidate_ids[i]) for i in top_indices]
+    tracks_by_id = Track.objects.in_bulk(top_track_ids)
+    recommended_tracks = [tracks_by_id[track_id] for track_id in top_track_ids if track_id in tracks_by_id]
 
     return recommended_tracks
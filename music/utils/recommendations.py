@@ -1,51 +1,119 @@
 # music/utils/recommendations.py
 
+import logging
+
 import numpy as np
+from django.db.models import BinaryField, ExpressionWrapper, F
 from music.models import TrackFeature
+from music.fields import VECTOR_DTYPE, vector_payload
+from music.utils.feature_scaling import EMBEDDING_FEATURES
+from music.utils.embedding_snapshot import current_snapshot
+from music.utils.ann import ExactIndex
 
-def fetch_all_embeddings():
+music_logger = logging.getLogger('music')
+
+def load_embedding_matrix(queryset=None, dimension=len(EMBEDDING_FEATURES)):
     """
-    Fetches all track features embeddings from the database.
-    Returns a tuple: (track_ids_list, embeddings_matrix)
+    Bulk-loads embeddings straight from the packed column.
+    Skips the per-row decode: payloads are joined and viewed with a single
+    np.frombuffer call. Rows that don't have `dimension` values (e.g. left
+    over from an older feature set) are skipped and counted in a warning.
+    Returns a tuple: (track_ids int64 array, contiguous float32 matrix)
     """
-    track_features = TrackFeature.objects.all()
+    if queryset is None:
+        queryset = TrackFeature.objects.all()
+
+    rows = (
+        queryset.exclude(embedding=None)
+        .annotate(raw_embedding=ExpressionWrapper(F('embedding'), output_field=BinaryField()))
+        .values_list('track_id', 'raw_embedding')
+    )
+
     track_ids = []
-    embeddings = []
+    payloads = []
+    row_size = dimension * VECTOR_DTYPE.itemsize
+    skipped = 0
+    for track_id, raw in rows.iterator(chunk_size=5000):
+        payload = vector_payload(raw)
+        if payload is None:
+            continue
+        if len(payload) != row_size:
+            skipped += 1
+            continue
+        track_ids.append(track_id)
+        payloads.append(payload)
+
+    if skipped:
+        music_logger.warning(
+            f"Skipped {skipped} embeddings without {dimension} values; re-extract or rescale those tracks"
+        )
+
+    if not payloads:
+        return np.empty(0, dtype=np.int64), np.empty((0, dimension), dtype=np.float32)
+
+    matrix = np.frombuffer(b''.join(payloads), dtype=VECTOR_DTYPE).reshape(len(payloads), dimension)
+    return np.asarray(track_ids, dtype=np.int64), matrix.astype(np.float32, copy=False)
+
+def fetch_embedding_arrays():
+    """
+    Returns (track_ids, embeddings, norms) arrays for every embedded track.
+    Served from the shared memory-mapped snapshot when one exists, so no
+    database scan is needed; otherwise loaded from the database.
+    """
+    snapshot = current_snapshot()
+    if snapshot is not None:
+        return snapshot.track_ids, snapshot.embeddings, snapshot.norms
 
-    for feature in track_features:
-        if feature.embedding:
-            track_ids.append(feature.track.id)
-            embeddings.append(np.array(feature.embedding, dtype=np.float32))
+    track_ids, embeddings = load_embedding_matrix()
+    return track_ids, embeddings, np.linalg.norm(embeddings, axis=1)
 
-    return track_ids, np.array(embeddings)
+def fetch_all_embeddings():
+    """
+    Fetches all track features embeddings (snapshot first, then database).
+    Returns a tuple: (track_ids_list, embeddings_matrix)
+    """
+    track_ids, embeddings, _ = fetch_embedding_arrays()
+    return track_ids.tolist(), embeddings
 
-def compute_cosine_similarity(query_embedding, all_embeddings):
+def compute_cosine_similarity(query_embedding, all_embeddings, all_norms=None):
     """
     Computes cosine similarity between a query embedding and all stored embeddings.
+    Pass precomputed `all_norms` (e.g. from the snapshot) to skip recomputing them.
     """
     query_norm = np.linalg.norm(query_embedding)
-    all_norms = np.linalg.norm(all_embeddings, axis=1)
+    if all_norms is None:
+        all_norms = np.linalg.norm(all_embeddings, axis=1)
 
     similarities = np.dot(all_embeddings, query_embedding) / (all_norms * query_norm + 1e-10)
     return similarities
 
+def similarity_index(track_ids, embeddings, norms):
+    """
+    Search index for the current embeddings.
+    Arrays from the snapshot use the index saved with it (built offline by
+    write_snapshot); database-loaded arrays get an exact index.
+    """
+    snapshot = current_snapshot()
+    if snapshot is None or snapshot.track_ids is not track_ids:
+        return ExactIndex(embeddings, norms)
+    return snapshot.search_index()
+
 def get_top_k_similar_tracks(track_id, k=5):
     """
     Given a track_id, returns the top k most similar track IDs based on embedding similarity.
     """
-    track_ids, embeddings = fetch_all_embeddings()
+    track_ids, embeddings, norms = fetch_embedding_arrays()
 
-    if track_id not in track_ids:
+    matches = np.flatnonzero(track_ids == track_id)
+    if not len(matches):
         return []  # Track not found
 
-    track_index = track_ids.index(track_id)
+    track_index = int(matches[0])
     query_embedding = embeddings[track_index]
 
-    similarities = compute_cosine_similarity(query_embedding, embeddings)
-    sorted_indices = np.argsort(similarities)[::-1]
-
     # Exclude the track itself
-    recommended_indices = [i for i in sorted_indices if i != track_index][:k]
-    recommended_track_ids = [track_ids[i] for i in recommended_indices]
+    index = similarity_index(track_ids, embeddings, norms)
+    recommended_indices, _ = index.search(query_embedding, k=k, exclude=[track_index])
+    recommended_track_ids = [int(track_ids[i]) for i in recommended_indices]
 
     return recommended_track_ids
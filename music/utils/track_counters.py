@@ -0,0 +1,173 @@
+# music/utils/track_counters.py
+
+import random
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Sum
+from django.utils import timezone
+from music.models import Interaction, ListeningHistory, TrackStatistics, TrackStatisticsShard
+
+COUNTER_FIELDS = ['plays_count', 'likes_count', 'comments_count']
+
+# Which counter an Interaction type feeds; streams are counted through
+# ListeningHistory (plays_count), so they do not feed a counter here.
+INTERACTION_COUNTERS = {
+    'like': 'likes_count',
+    'comment': 'comments_count',
+}
+
+
+def interaction_deltas(interactions, sign=1):
+    """
+    {track_id: Counter(field=delta)} for a batch of Interaction rows.
+    """
+    deltas = defaultdict(Counter)
+    for interaction in interactions:
+        field = INTERACTION_COUNTERS.get(interaction.interaction_type)
+        if field:
+            deltas[interaction.track_id][field] += sign
+    return deltas
+
+
+def listen_deltas(listens, sign=1):
+    """
+    {track_id: Counter(plays_count=delta)} for a batch of ListeningHistory rows.
+    """
+    deltas = defaultdict(Counter)
+    for listen in listens:
+        deltas[listen.track_id]['plays_count'] += sign
+    return deltas
+
+
+def apply_deltas(deltas, shards=None):
+    """
+    Adds {track_id: {field: delta}} to the tracks' counters with atomic F()
+    updates on one random TrackStatisticsShard per call (`shards` defaults
+    to settings.TRACK_COUNTER_SHARDS).
+
+    Tracks that share the same deltas (the common case: +1 play each) are
+    updated with a single UPDATE ... WHERE track_id IN (...). The first
+    increment on a shard creates it (and the track's TrackStatistics row).
+    Decrements never create rows, so one racing a track deletion cannot
+    recreate its statistics; they fall back to the TrackStatistics row.
+    """
+    deltas = {
+        track_id: {field: value for field, value in counts.items() if value}
+        for track_id, counts in deltas.items()
+    }
+    deltas = {track_id: counts for track_id, counts in deltas.items() if counts}
+    if not deltas:
+        return
+
+    shards = max(1, shards or settings.TRACK_COUNTER_SHARDS)
+    groups = defaultdict(list)
+    for track_id, counts in deltas.items():
+        groups[tuple(sorted(counts.items()))].append(track_id)
+
+    now = timezone.now()
+    for counts, track_ids in groups.items():
+        shard = random.randrange(shards)
+        values = {field: F(field) + value for field, value in counts}
+        rows = TrackStatisticsShard.objects.filter(shard=shard)
+
+        updated = rows.filter(track_id__in=track_ids).update(updated_at=now, **values)
+        if updated == len(track_ids):
+            continue
+
+        existing = set(rows.filter(track_id__in=track_ids).values_list('track_id', flat=True))
+        missing = [track_id for track_id in track_ids if track_id not in existing]
+        if all(value < 0 for _, value in counts):
+            TrackStatistics.objects.filter(track_id__in=missing).update(updated_at=now, **values)
+            continue
+
+        # Create zeroed rows, then increment: concurrent creators cannot lose a delta
+        TrackStatistics.objects.bulk_create(
+            [TrackStatistics(track_id=track_id) for track_id in missing],
+            ignore_conflicts=True,
+        )
+        TrackStatisticsShard.objects.bulk_create(
+            [TrackStatisticsShard(track_id=track_id, shard=shard) for track_id in missing],
+            ignore_conflicts=True,
+        )
+        rows.filter(track_id__in=missing).update(updated_at=now, **values)
+
+
+def shard_totals(track_ids=None):
+    """
+    Sum of every counter across shards, one GROUP BY.
+    Returns {track_id: {field: total, 'updated_at': latest}}.
+    """
+    rows = TrackStatisticsShard.objects.all()
+    if track_ids is not None:
+        rows = rows.filter(track_id__in=track_ids)
+    rows = (
+        rows.values('track_id')
+        .annotate(updated=Max('updated_at'), **{field: Sum(field) for field in COUNTER_FIELDS})
+        .order_by()
+    )
+    return {
+        row['track_id']: {**{field: row[field] or 0 for field in COUNTER_FIELDS}, 'updated_at': row['updated']}
+        for row in rows
+    }
+
+
+def _cache_key(track_id):
+    return f'track_counts:{track_id}'
+
+
+def track_counts(track_ids):
+    """
+    Current counters for `track_ids`: the TrackStatistics row plus its shards.
+
+    Served from the cache for TRACK_COUNTER_CACHE_SECONDS; misses are loaded
+    with two queries for the whole batch. Returns
+    {track_id: {'plays_count', 'likes_count', 'comments_count', 'updated_at'}}
+    for tracks that have a TrackStatistics row.
+    """
+    track_ids = list(dict.fromkeys(track_ids))
+    cached = cache.get_many([_cache_key(track_id) for track_id in track_ids])
+    counts = {track_id: cached[_cache_key(track_id)] for track_id in track_ids if _cache_key(track_id) in cached}
+
+    missing = [track_id for track_id in track_ids if track_id not in counts]
+    if missing:
+        shards = shard_totals(missing)
+        loaded = {}
+        for track_id, updated_at, *values in TrackStatistics.objects.filter(track_id__in=missing).values_list(
+            'track_id', 'updated_at', *COUNTER_FIELDS
+        ):
+            extra = shards.get(track_id, {})
+            loaded[track_id] = {
+                **{field: value + extra.get(field, 0) for field, value in zip(COUNTER_FIELDS, values)},
+                'updated_at': max(filter(None, [updated_at, extra.get('updated_at')])),
+            }
+        cache.set_many(
+            {_cache_key(track_id): value for track_id, value in loaded.items()},
+            timeout=settings.TRACK_COUNTER_CACHE_SECONDS,
+        )
+        counts.update(loaded)
+    return counts
+
+
+def recount_statistics():
+    """
+    True counter values for every track with activity, from one GROUP BY
+    per source table. Returns {track_id: {field: count}}.
+    """
+    counts = defaultdict(lambda: dict.fromkeys(COUNTER_FIELDS, 0))
+
+    rows = (
+        Interaction.objects.filter(interaction_type__in=INTERACTION_COUNTERS)
+        .values_list('track_id', 'interaction_type')
+        .annotate(total=Count('id'))
+        .order_by()
+    )
+    for track_id, interaction_type, total in rows:
+        counts[track_id][INTERACTION_COUNTERS[interaction_type]] = total
+
+    rows = ListeningHistory.objects.values_list('track_id').annotate(total=Count('id')).order_by()
+    for track_id, total in rows:
+        counts[track_id]['plays_count'] = total
+
+    return counts
@@ -0,0 +1,250 @@
+# music/utils/track_index.py
+
+import threading
+import time
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from music.models import TrackFeature
+
+# Every index created in this process, so signals can keep them all fresh
+_registry = []
+
+# Bumped by every write that changes indexed tracks; indexes in other
+# processes compare it with the version they loaded and reload when it moved
+VERSION_KEY = 'track_index_version'
+
+
+def shared_index_version():
+    return cache.get(VERSION_KEY, 0)
+
+
+def bump_index_version(applied=()):
+    """
+    Tells every process that indexed tracks changed. Indexes in `applied`
+    already hold the change (the signals upsert in place), so they adopt
+    the new version instead of reloading, provided they had seen every
+    earlier change. Call after the write has committed.
+
+    Reaching other processes needs a shared cache (CACHE_REDIS_URL).
+    """
+    cache.add(VERSION_KEY, 0, timeout=None)
+    version = cache.incr(VERSION_KEY)
+    for index in applied:
+        index.adopt_version(version)
+    return version
+
+
+def registered_indexes(loaded_only=False):
+    """
+    Returns every TrackVectorIndex instantiated in this process.
+    """
+    if loaded_only:
+        return [index for index in _registry if index.loaded]
+    return list(_registry)
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-10)
+
+
+class TrackVectorIndex:
+    """
+    Process-wide, pre-normalized matrix of approved tracks' vectors.
+
+    `vectorize` turns a TrackFeature (with its track loaded) into a 1-D
+    vector, or returns None to leave the track out of the index. Scoring a
+    query against the whole catalog is one matrix-vector product followed
+    by `argpartition`, so no per-track queries or similarity calls happen
+    at request time.
+
+    The index loads lazily on first use. Writes in this process are applied
+    in place by the signals in music/signals.py (`upsert` / `remove`);
+    writes anywhere else (Celery, other web workers, bulk updates that skip
+    signals) bump the shared version, which is checked at most every
+    TRACK_INDEX_CHECK_SECONDS and triggers a reload.
+    """
+
+    def __init__(self, vectorize, name=None):
+        self.name = name or getattr(vectorize, '__name__', 'index')
+        self._vectorize = vectorize
+        self._lock = threading.RLock()
+        self._matrix = None          # (capacity, dim) float32, rows L2-normalized
+        self._track_ids = None       # (capacity,) int64
+        self._positions = {}         # track_id -> row
+        self._size = 0
+        self._loaded = False
+        self._version = None         # shared version the contents reflect
+        self._checked_at = float('-inf')
+        _registry.append(self)
+
+    # ------------------------------
+    # Loading
+    # ------------------------------
+    def _queryset(self):
+        return (
+            TrackFeature.objects
+            .filter(track__approval_status='approved')
+            .select_related('track')
+        )
+
+    def load(self):
+        """
+        (Re)builds the index from the database in a single query.
+        """
+        # Read before the query: a write landing during the load bumps past it
+        version = shared_index_version()
+        track_ids = []
+        vectors = []
+        for feature in self._queryset().iterator(chunk_size=2000):
+            vector = self._vectorize(feature)
+            if vector is not None:
+                track_ids.append(feature.track_id)
+                vectors.append(np.asarray(vector, dtype=np.float32).ravel())
+
+        with self._lock:
+            if vectors:
+                self._matrix = _normalize_rows(np.vstack(vectors).astype(np.float32))
+            else:
+                self._matrix = None
+            self._track_ids = np.asarray(track_ids, dtype=np.int64)
+            self._positions = {track_id: row for row, track_id in enumerate(track_ids)}
+            self._size = len(track_ids)
+            self._loaded = True
+            self._version = version
+            self._checked_at = time.monotonic()
+
+    def invalidate(self):
+        """
+        Drops the in-memory matrix; the next query reloads it.
+        """
+        with self._lock:
+            self._loaded = False
+            self._matrix = None
+            self._track_ids = None
+            self._positions = {}
+            self._size = 0
+
+    def adopt_version(self, version):
+        with self._lock:
+            if self._loaded and self._version == version - 1:
+                self._version = version
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+            return
+
+        now = time.monotonic()
+        if now - self._checked_at < settings.TRACK_INDEX_CHECK_SECONDS:
+            return
+        self._checked_at = now
+        if shared_index_version() != self._version:
+            self.load()
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def __len__(self):
+        with self._lock:
+            self._ensure_loaded()
+            return self._size
+
+    # ------------------------------
+    # In-place updates
+    # ------------------------------
+    def upsert(self, feature):
+        """
+        Inserts or replaces a single track's row. Unapproved tracks are removed.
+        """
+        with self._lock:
+            if not self._loaded:
+                return  # Nothing cached yet; the next load picks it up
+
+            if feature.track.approval_status != 'approved':
+                self.remove(feature.track_id)
+                return
+
+            vector = self._vectorize(feature)
+            if vector is None:
+                self.remove(feature.track_id)
+                return
+
+            row_vector = _normalize_rows(np.asarray(vector, dtype=np.float32).ravel())
+
+            if self._matrix is None:
+                self._matrix = np.zeros((16, row_vector.shape[0]), dtype=np.float32)
+                self._track_ids = np.zeros(16, dtype=np.int64)
+            elif row_vector.shape[0] != self._matrix.shape[1]:
+                self.invalidate()  # Vector layout changed, rebuild from scratch
+                return
+
+            row = self._positions.get(feature.track_id)
+            if row is None:
+                row = self._append_row()
+                self._track_ids[row] = feature.track_id
+                self._positions[feature.track_id] = row
+            self._matrix[row] = row_vector
+
+    def _append_row(self):
+        capacity = self._matrix.shape[0]
+        if self._size == capacity:
+            new_capacity = max(16, capacity * 2)
+            matrix = np.zeros((new_capacity, self._matrix.shape[1]), dtype=np.float32)
+            matrix[:capacity] = self._matrix
+            track_ids = np.zeros(new_capacity, dtype=np.int64)
+            track_ids[:capacity] = self._track_ids
+            self._matrix, self._track_ids = matrix, track_ids
+        row = self._size
+        self._size += 1
+        return row
+
+    def remove(self, track_id):
+        """
+        Drops a track's row by moving the last row into its slot.
+        """
+        with self._lock:
+            row = self._positions.pop(track_id, None)
+            if row is None:
+                return
+            last = self._size - 1
+            if row != last:
+                moved_id = int(self._track_ids[last])
+                self._matrix[row] = self._matrix[last]
+                self._track_ids[row] = moved_id
+                self._positions[moved_id] = row
+            self._size = last
+
+    # ------------------------------
+    # Queries
+    # ------------------------------
+    def top_k(self, query, k=10, exclude_ids=None):
+        """
+        Returns up to k (track_id, cosine_similarity) pairs, best first.
+        """
+        query = np.asarray(query, dtype=np.float32).ravel()
+        query = query / max(float(np.linalg.norm(query)), 1e-10)
+
+        with self._lock:
+            self._ensure_loaded()
+            if self._size == 0 or self._matrix is None:
+                return []
+            track_ids = self._track_ids[:self._size]
+            scores = self._matrix[:self._size] @ query
+
+            if exclude_ids:
+                scores[np.isin(track_ids, np.fromiter(exclude_ids, dtype=np.int64))] = -np.inf
+
+            k = min(k, self._size)
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            return [
+                (int(track_ids[i]), float(scores[i]))
+                for i in top
+                if np.isfinite(scores[i])
+            ]
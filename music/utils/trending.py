@@ -0,0 +1,237 @@
+# music/utils/trending.py
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from music.models import Track, TrackTrend
+
+music_logger = logging.getLogger('music')
+
+# Redis hash of queued increments: '<track_id>:<epoch timestamp>' -> summed forward weight
+BUFFER_KEY = 'trending:pending'
+
+# Scores below 2 ** -SNAPSHOT_HALF_LIVES of their peak are left out of the snapshot
+SNAPSHOT_HALF_LIVES = 10
+
+
+def half_life_seconds():
+    return settings.TRENDING_HALF_LIFE_HOURS * 3600.0
+
+
+def current_epoch(now=None):
+    """
+    Start of the current TRENDING_EPOCH_DAYS period. Derived from the clock,
+    so every process agrees on it without coordination.
+    """
+    now = now or timezone.now()
+    period = settings.TRENDING_EPOCH_DAYS * 86400
+    return datetime.fromtimestamp(now.timestamp() // period * period, tz=dt_timezone.utc)
+
+
+def forward_weight(weight, at, epoch):
+    """
+    An event's contribution to a score stored relative to `epoch`.
+    """
+    return weight * 2.0 ** ((at - epoch).total_seconds() / half_life_seconds())
+
+
+def decayed(score, epoch, now):
+    """
+    The live value of a stored score at `now`.
+    """
+    return score * 2.0 ** (-(now - epoch).total_seconds() / half_life_seconds())
+
+
+def record_events(events, now=None):
+    """
+    Adds events [(track_id, kind, at), ...] to the trending scores; `kind`
+    is a TRENDING_WEIGHTS key ('like', 'comment', 'stream', 'listen').
+
+    Each track costs one UPDATE score = score + w, whatever its history:
+    events are folded per track first. A row whose epoch is from an older
+    period (or that does not exist yet) goes through a locked slow path once
+    per period to be rebased.
+    """
+    epoch = current_epoch(now)
+    increments, latest = _fold_events(events, epoch)
+    _add_increments(increments, latest, epoch)
+
+
+def _fold_events(events, epoch):
+    """
+    Per-track sums of the events' forward weights, and each track's latest event time.
+    """
+    weights = settings.TRENDING_WEIGHTS
+    increments = defaultdict(float)
+    latest = {}
+    for track_id, kind, at in events:
+        weight = weights.get(kind)
+        if not weight:
+            continue
+        increments[track_id] += forward_weight(weight, at, epoch)
+        latest[track_id] = max(at, latest.get(track_id, at))
+    return increments, latest
+
+
+def _add_increments(increments, latest, epoch):
+    for track_id, increment in increments.items():
+        updated = TrackTrend.objects.filter(track_id=track_id, epoch=epoch).update(
+            score=F('score') + increment,
+            updated_at=Greatest(F('updated_at'), latest[track_id]),
+        )
+        if not updated:
+            _rebase_and_add(track_id, increment, latest[track_id], epoch)
+
+
+def buffer_events(events, now=None):
+    """
+    record_events for the request path. A popular track's TrackTrend row is
+    updated by every event, so a like or listen would queue on its row lock.
+
+    Once the transaction commits, the events' increments are added to a
+    Redis hash with HINCRBYFLOAT (the listen buffer's client) and written
+    by the next listen-buffer drain, one UPDATE per track per drain.
+    Without Redis they are recorded directly, as before.
+    """
+    from music.utils.listen_buffer import get_client  # listen_buffer imports this module
+
+    epoch = current_epoch(now)
+    increments, latest = _fold_events(events, epoch)
+    if not increments:
+        return
+
+    def push():
+        client = get_client()
+        if client is not None:
+            try:
+                pipe = client.pipeline()
+                for track_id, increment in increments.items():
+                    pipe.hincrbyfloat(BUFFER_KEY, f'{track_id}:{int(epoch.timestamp())}', increment)
+                pipe.execute()
+                return
+            except Exception as exc:
+                music_logger.warning(f"Trending buffer unavailable, recording directly: {exc}")
+        _add_increments(increments, latest, epoch)
+
+    transaction.on_commit(push)
+
+
+def flush_buffered_events(client, now=None):
+    """
+    Writes the increments buffer_events queued in Redis. The hash is read
+    and cleared in one MULTI; if the write fails the increments are put
+    back. A track's updated_at becomes the flush time, at most one drain
+    interval after its events.
+
+    Returns the number of (track, epoch) increments written.
+    """
+    pipe = client.pipeline()
+    pipe.hgetall(BUFFER_KEY)
+    pipe.delete(BUFFER_KEY)
+    pending, _ = pipe.execute()
+    if not pending:
+        return 0
+
+    now = now or timezone.now()
+    by_epoch = defaultdict(dict)
+    for field, value in pending.items():
+        track_id, epoch = field.decode().split(':')
+        by_epoch[int(epoch)][int(track_id)] = float(value)
+    # Tracks deleted since their events were queued have no row to update
+    existing = set(
+        Track.objects.filter(pk__in={track_id for tracks in by_epoch.values() for track_id in tracks})
+        .values_list('pk', flat=True)
+    )
+
+    try:
+        for epoch, increments in by_epoch.items():
+            epoch = datetime.fromtimestamp(epoch, tz=dt_timezone.utc)
+            increments = {track_id: value for track_id, value in increments.items() if track_id in existing}
+            _add_increments(increments, dict.fromkeys(increments, now), epoch)
+    except Exception:
+        pipe = client.pipeline()
+        for field, value in pending.items():
+            pipe.hincrbyfloat(BUFFER_KEY, field, float(value))
+        pipe.execute()
+        raise
+    return len(pending)
+
+
+def _rebase_and_add(track_id, increment, at, epoch):
+    try:
+        with transaction.atomic():
+            trend = TrackTrend.objects.select_for_update().filter(track_id=track_id).first()
+            if trend is None:
+                TrackTrend.objects.create(track_id=track_id, score=increment, epoch=epoch, updated_at=at)
+                return
+            if trend.epoch != epoch:
+                # Re-express the stored score relative to the new epoch
+                trend.score = decayed(trend.score, trend.epoch, epoch) if trend.epoch < epoch else trend.score
+                trend.epoch = max(trend.epoch, epoch)
+            trend.score += forward_weight(1.0, epoch, trend.epoch) * increment
+            trend.updated_at = max(trend.updated_at, at)
+            trend.save(update_fields=['score', 'epoch', 'updated_at'])
+    except IntegrityError:
+        # Another writer created the row first; it now has this epoch
+        TrackTrend.objects.filter(track_id=track_id, epoch=epoch).update(
+            score=F('score') + increment,
+            updated_at=Greatest(F('updated_at'), at),
+        )
+
+
+class TrendingSnapshot:
+    """
+    Sorted top TRENDING_SNAPSHOT_SIZE approved tracks, rebuilt at most every
+    TRENDING_SNAPSHOT_SECONDS. Reads are a slice of a ready-made list.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._built_at = float('-inf')
+        self._ranking = []
+
+    def build(self, now=None):
+        now = now or timezone.now()
+        horizon = now - timedelta(seconds=half_life_seconds() * SNAPSHOT_HALF_LIVES)
+        rows = list(
+            TrackTrend.objects.filter(updated_at__gte=horizon, track__approval_status='approved')
+            .values_list('track_id', 'score', 'epoch')
+        )
+        if not rows:
+            return []
+
+        track_ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        ages = np.fromiter(((now - row[2]).total_seconds() for row in rows), dtype=np.float64, count=len(rows))
+        scores = np.fromiter((row[1] for row in rows), dtype=np.float64, count=len(rows))
+        scores *= np.exp2(-ages / half_life_seconds())
+
+        k = min(settings.TRENDING_SNAPSHOT_SIZE, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return list(zip(track_ids[top].tolist(), scores[top].tolist()))
+
+    def top_k(self, k=20):
+        """
+        [(track_id, score), ...] best first.
+        """
+        if time.monotonic() - self._built_at >= settings.TRENDING_SNAPSHOT_SECONDS:
+            with self._lock:
+                if time.monotonic() - self._built_at >= settings.TRENDING_SNAPSHOT_SECONDS:
+                    self._ranking = self.build()
+                    self._built_at = time.monotonic()
+        return self._ranking[:k]
+
+    def invalidate(self):
+        self._built_at = float('-inf')
+
+
+trending_snapshot = TrendingSnapshot()
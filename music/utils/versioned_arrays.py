@@ -0,0 +1,126 @@
+# music/utils/versioned_arrays.py
+
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+CURRENT_FILE = 'CURRENT'
+
+
+class VersionedArrays:
+    """
+    A directory of immutable, versioned .npy array sets plus a CURRENT
+    pointer naming the live one: <dir>/<version>/<name>.npy.
+
+    Writers publish a whole version at once; each process serving from it
+    keeps one memory-mapped view, re-reading CURRENT at most every
+    `check_setting` seconds and hot-swapping when it names a new version.
+    Used by the embedding snapshot, the item-CF neighbour table and the
+    implicit-MF factors.
+
+    `directory` is a callable so settings overrides are honoured;
+    `opener(path, version)` builds the read-only view of one version.
+    """
+
+    def __init__(self, directory, opener, check_setting, default_check_seconds=5):
+        self._directory = directory
+        self.opener = opener
+        self.check_setting = check_setting
+        self.default_check_seconds = default_check_seconds
+        self._lock = threading.Lock()
+        self._current = None
+        self._checked_at = float('-inf')
+
+    def directory(self):
+        return Path(self._directory())
+
+    def write(self, arrays, extra=None, directory=None, keep=3):
+        """
+        Publishes `arrays` ({name: ndarray}) as a new version and makes it current.
+
+        The version directory and CURRENT are both swapped in with
+        os.replace, so readers never see a half-written version.
+        `extra(staging)` may write more files into the version before it
+        is published. Only the newest `keep` versions are kept; readers
+        that already mapped an old one keep their open mapping.
+
+        Returns the version.
+        """
+        directory = Path(directory or self.directory())
+        directory.mkdir(parents=True, exist_ok=True)
+
+        version = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        staging = directory / f'.{version}.tmp'
+        staging.mkdir()
+        for name, values in arrays.items():
+            np.save(staging / f'{name}.npy', values)
+        if extra is not None:
+            extra(staging)
+        os.replace(staging, directory / version)
+
+        pointer = directory / f'.{CURRENT_FILE}.tmp'
+        pointer.write_text(version)
+        os.replace(pointer, directory / CURRENT_FILE)
+
+        versions = sorted(p.name for p in directory.iterdir() if p.is_dir() and not p.name.startswith('.'))
+        for old in versions[:-keep]:
+            shutil.rmtree(directory / old, ignore_errors=True)
+
+        return version
+
+    def open(self, version, directory=None):
+        """
+        Opens one specific version, regardless of CURRENT.
+        """
+        return self.opener(Path(directory or self.directory()) / version, version)
+
+    def published(self):
+        """
+        True once any version has been made current.
+        """
+        return (self.directory() / CURRENT_FILE).exists()
+
+    def current(self, max_age=None):
+        """
+        Returns the live view for this process, or None if nothing is published.
+        """
+        if max_age is None:
+            max_age = getattr(settings, self.check_setting, self.default_check_seconds)
+
+        now = time.monotonic()
+        if now - self._checked_at < max_age:
+            return self._current
+
+        with self._lock:
+            if now - self._checked_at < max_age:
+                return self._current
+            self._checked_at = now
+
+            directory = self.directory()
+            try:
+                version = (directory / CURRENT_FILE).read_text().strip()
+            except FileNotFoundError:
+                self._current = None
+                return None
+
+            if self._current is None or self._current.version != version:
+                try:
+                    self._current = self.open(version, directory)
+                except FileNotFoundError:
+                    pass  # Pruned between reading CURRENT and opening it; keep the old one
+
+            return self._current
+
+    def invalidate(self):
+        """
+        Forgets the cached view, so the next current() re-reads CURRENT.
+        """
+        with self._lock:
+            self._current = None
+            self._checked_at = float('-inf')
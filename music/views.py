@@ -22,12 +22,19 @@ from music.serializers import (
 )
 from rest_framework.decorators import action
 from rest_framework.response import Response
-from mutagen import File as MutagenFile
 from django.shortcuts import get_object_or_404
 from django.db import transaction
+from django.db.models import Max
+from django.db.models.functions import Coalesce, Greatest
 from rest_framework.decorators import action
 from rest_framework.parsers import JSONParser, MultiPartParser
 from rest_framework import status
+from django.conf import settings
+from django.utils import timezone
+from music.parsers import NDJSONParser
+from music.utils.interaction_ingest import ingest_interactions
+from music.utils.listen_buffer import BufferFull, buffer_listen, buffer_metrics
+from music.utils.trending import trending_snapshot
 
 # ----------------------------
 # Artist Endpoints
@@ -115,7 +122,9 @@ class TrackViewSet(viewsets.ModelViewSet):
         duration = None
 
         if audio_file:
-            # Read duration using mutagen
+            # Read duration using mutagen (imported on first upload, not at startup)
+            from mutagen import File as MutagenFile
+
             audio = MutagenFile(audio_file)
             if audio and audio.info:
                 duration = audio.info.length  # in seconds (float)
@@ -389,6 +398,59 @@ class InteractionViewSet(viewsets.ModelViewSet):
     def create(self, request, *args, **kwargs):
         return super().create(request, *args, **kwargs)
 
+    @swagger_auto_schema(
+        tags=['Interactions'],
+        operation_summary="Ingest a batch of interactions",
+        operation_description=(
+            "Record many likes, streams, or comments for the authenticated user in one request. "
+            "The body is a JSON array or NDJSON (application/x-ndjson), one event per item: "
+            "{track, interaction_type, comment_text?}. Valid events are stored even when others fail, "
+            "and likes of tracks the user already likes are skipped as duplicates; "
+            "the response lists a status per item, in request order."
+        ),
+        request_body=openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                required=['track', 'interaction_type'],
+                properties={
+                    'track': openapi.Schema(type=openapi.TYPE_INTEGER, description='Track ID'),
+                    'interaction_type': openapi.Schema(type=openapi.TYPE_STRING, enum=['like', 'stream', 'comment']),
+                    'comment_text': openapi.Schema(type=openapi.TYPE_STRING, description='Required for comments'),
+                },
+            ),
+        ),
+        responses={
+            201: "Per-item results",
+            200: "Per-item results; nothing new was stored",
+            400: "Bad Request, or every event was invalid",
+        }
+    )
+    @action(
+        detail=False,
+        methods=['post'],
+        url_path='batch',
+        parser_classes=[JSONParser, NDJSONParser],
+    )
+    def batch(self, request):
+        events = request.data
+        if not isinstance(events, list):
+            return Response({'detail': 'Expected a JSON array or NDJSON body of events.'}, status=400)
+        if not events:
+            return Response({'detail': 'No events supplied.'}, status=400)
+        if len(events) > settings.INTERACTION_BATCH_MAX_EVENTS:
+            return Response(
+                {'detail': f'At most {settings.INTERACTION_BATCH_MAX_EVENTS} events per request.'},
+                status=400,
+            )
+
+        results, created = ingest_interactions(request.user, events)
+        failed = sum(result['status'] == 'invalid' for result in results)
+        return Response(
+            {'created': created, 'duplicates': len(events) - created - failed, 'failed': failed, 'results': results},
+            status=201 if created else 400 if failed == len(events) else 200,
+        )
+
 
 # ----------------------------
 # Listening History Endpoints
@@ -414,12 +476,70 @@ class ListeningHistoryViewSet(viewsets.ModelViewSet):
     @swagger_auto_schema(
         tags=['Listening History'],
         operation_summary="Create listening history entry",
-        operation_description="Log a user’s listening event for a track.",
-        request_body=ListeningHistorySerializer,
-        responses={201: ListeningHistorySerializer}
+        operation_description=(
+            "Log a user’s listening event for a track. Listens are queued and written in bulk "
+            "a few seconds later: the answer is 202 with {track, listened_at, status: 'queued'} "
+            "instead of the created row, which has no id yet. When buffering is disabled or Redis "
+            "is unreachable the row is written at once and returned with 201, as before. "
+            "When the queue is full the API answers 503 with Retry-After."
+        ),
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['track'],
+            properties={'track': openapi.Schema(type=openapi.TYPE_INTEGER, description='Track ID')},
+        ),
+        responses={
+            201: ListeningHistorySerializer,
+            202: openapi.Response('Queued', openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'track': openapi.Schema(type=openapi.TYPE_INTEGER),
+                    'listened_at': openapi.Schema(type=openapi.TYPE_STRING, format=openapi.FORMAT_DATETIME),
+                    'status': openapi.Schema(type=openapi.TYPE_STRING, enum=['queued']),
+                },
+            )),
+            400: "Bad Request (missing or unknown track)",
+            503: "Buffer full – retry later",
+        }
     )
     def create(self, request, *args, **kwargs):
-        return super().create(request, *args, **kwargs)
+        try:
+            track_id = int(request.data.get('track'))
+        except (TypeError, ValueError):
+            return Response({'track': ['A valid track ID is required.']}, status=400)
+
+        # Checked up front: the drain would otherwise drop the listen silently
+        if not Track.objects.filter(pk=track_id).exists():
+            return Response({'track': [f'Invalid pk "{track_id}" - object does not exist.']}, status=400)
+
+        listened_at = timezone.now()
+        try:
+            buffered = buffer_listen(request.user.id, track_id, listened_at)
+        except BufferFull:
+            return Response(
+                {'detail': 'Too many listens queued, retry shortly.'},
+                status=503,
+                headers={'Retry-After': str(settings.LISTEN_BUFFER_DRAIN_SECONDS)},
+            )
+
+        if buffered:
+            return Response({'track': track_id, 'listened_at': listened_at, 'status': 'queued'}, status=202)
+
+        # ✅ Buffer disabled or unreachable: write synchronously
+        entry = ListeningHistory.objects.create(user=request.user, track_id=track_id, listened_at=listened_at)
+        return Response(ListeningHistorySerializer(entry).data, status=201)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='buffer-metrics',
+        permission_classes=[IsAuthenticated]
+    )
+    def buffer_stats(self, request):
+        # only moderators & admins may see pipeline metrics
+        if request.user.role not in ['moderator', 'admin']:
+            return Response({'detail': 'Forbidden'}, status=403)
+        return Response(buffer_metrics())
 
 
 # ----------------------------
@@ -429,7 +549,10 @@ class TrackStatisticsViewSet(viewsets.ReadOnlyModelViewSet):
     """
     Read-only access for TrackStatistics.
     """
-    queryset = TrackStatistics.objects.all()
+    # Counters move on the shard rows, so order by their latest update too
+    queryset = TrackStatistics.objects.annotate(
+        last_activity=Greatest('updated_at', Coalesce(Max('track__statistics_shards__updated_at'), 'updated_at')),
+    ).order_by('-last_activity', '-id')
     serializer_class = TrackStatisticsSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
     filter_backends = [DjangoFilterBackend]
@@ -506,3 +629,42 @@ class TracksByArtistView(APIView):
         serializer = TrackSerializer(tracks, many=True)
         return Response(serializer.data)
     
+
+
+class TrendingTracksView(APIView):
+    """
+    Top approved tracks by time-decayed activity, served from an in-memory snapshot.
+    """
+    permission_classes = [IsAuthenticatedOrReadOnly]
+
+    @swagger_auto_schema(
+        tags=['Music Tracks'],
+        operation_summary="List trending tracks",
+        operation_description=(
+            "Returns the approved tracks with the highest exponentially decayed score over recent "
+            "likes, comments, streams and listens, best first. Refreshed every few seconds."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'limit',
+                openapi.IN_QUERY,
+                description="Number of tracks (default 20, max 100)",
+                type=openapi.TYPE_INTEGER
+            )
+        ],
+        responses={200: "List of {track, score}"}
+    )
+    def get(self, request):
+        try:
+            limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response({'limit': ['A valid integer is required.']}, status=400)
+
+        ranking = trending_snapshot.top_k(limit)
+        # One query; the snapshot may predate a rejection, so re-check approval
+        tracks = Track.objects.filter(approval_status='approved').in_bulk([track_id for track_id, _ in ranking])
+        return Response([
+            {'track': TrackSerializer(tracks[track_id]).data, 'score': round(score, 4)}
+            for track_id, score in ranking
+            if track_id in tracks
+        ])
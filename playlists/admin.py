@@ -10,7 +10,7 @@ class PlaylistAdmin(admin.ModelAdmin):
 
 @admin.register(PlaylistTrack)
 class PlaylistTrackAdmin(admin.ModelAdmin):
-    list_display  = ['playlist', 'track', 'added_at']
+    list_display  = ['playlist', 'track', 'position', 'added_at']
     list_filter   = ['playlist', 'added_at']
     search_fields = ['playlist__name', 'track__title']
     ordering      = ['-added_at']
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlists', '0005_userrecommendation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='playlisttrack',
+            name='position',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.7 on 2026-10-18 07:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlists', '0006_playlisttrack_position'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='playlisttrack',
+            options={'ordering': [models.OrderBy(models.F('position'), nulls_last=True), '-added_at']},
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 5.1.7 on 2026-10-18 08:18
+
+import django.db.models.functions.comparison
+from django.conf import settings
+from django.db import migrations, models
+
+
+def merge_public_duplicates(apps, schema_editor):
+    """
+    Fold repeated public playlists into the oldest one of each name so the
+    constraint can be added. Their tracks move over unless already present.
+    """
+    Playlist = apps.get_model('playlists', 'Playlist')
+    PlaylistTrack = apps.get_model('playlists', 'PlaylistTrack')
+    kept = {}
+    for playlist in Playlist.objects.filter(user=None).order_by('created_at', 'pk'):
+        if playlist.name not in kept:
+            kept[playlist.name] = playlist.pk
+            continue
+        present = PlaylistTrack.objects.filter(playlist_id=kept[playlist.name]).values_list('track_id', flat=True)
+        PlaylistTrack.objects.filter(playlist=playlist).exclude(track_id__in=present).update(
+            playlist_id=kept[playlist.name],
+        )
+        playlist.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('playlists', '0007_playlisttrack_position_ordering'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_public_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='playlist',
+            constraint=models.UniqueConstraint(models.F('name'), django.db.models.functions.comparison.Coalesce('user', models.Value(0)), name='unique_playlist_name_per_owner'),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
 from django.conf import settings
 from music.models import Track
 from users.models import User
@@ -31,10 +33,17 @@ class Playlist(models.Model):
 
     class Meta:
         unique_together = ('name', 'user')
+        constraints = [
+            # unique_together lets NULL users repeat; this also covers public playlists
+            models.UniqueConstraint(
+                F('name'), Coalesce('user', Value(0)),
+                name='unique_playlist_name_per_owner',
+            ),
+        ]
         ordering = ['-created_at']             # default ordering
 
     def __str__(self):
-        return f"{self.get_name_display()} ({self.user.username})"
+        return f"{self.get_name_display()} ({self.user.username if self.user else 'public'})"
 
 
 # Playlist Tracks Model
@@ -55,10 +64,15 @@ class PlaylistTrack(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    position = models.PositiveIntegerField(
+        null=True,
+        blank=True                             # rank in generated playlists (most_liked)
+    )
 
     class Meta:
         unique_together = ('playlist', 'track')
-        ordering = ['-added_at']
+        # Ranked playlists in rank order; hand-built ones (no position) newest first
+        ordering = [F('position').asc(nulls_last=True), '-added_at']
 
     def __str__(self):
         return f"{self.playlist} → {self.track}"
@@ -26,8 +26,8 @@ class PlaylistTrackSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = PlaylistTrack
-        fields = ['id', 'playlist', 'track', 'added_at']
-        read_only_fields = ['added_at']
+        fields = ['id', 'playlist', 'track', 'added_at', 'position']
+        read_only_fields = ['added_at', 'position']
 
     def validate(self, data):
         request = self.context.get('request')
@@ -55,18 +55,41 @@ class RecommendationSerializer(serializers.ModelSerializer):
 # ----------------------------
 # Track Basic Serializer
 # ----------------------------
-class TrackBasicSerializer(serializers.ModelSerializer):
-    class Meta:
-        model = Track
-        fields = ['id', 'title', 'artist', 'artwork_file', 'audio_file']
+class TrackBasicSerializer(serializers.Serializer):
+    """
+    Plain (non-model) serializer for hot read paths: fixed fields, no model
+    introspection per call. Pair with .only(*TrackBasicSerializer.FIELDS).
+    """
+    FIELDS = ['id', 'title', 'artist_id', 'artwork_file', 'audio_file']
+
+    id = serializers.IntegerField(read_only=True)
+    title = serializers.CharField(read_only=True)
+    artist = serializers.IntegerField(source='artist_id', read_only=True)
+    artwork_file = serializers.FileField(read_only=True)
+    audio_file = serializers.FileField(read_only=True)
 
 # ----------------------------
-# User Recommendation Serializer (✅ FINAL FORM)
+# User Recommendation Serializer
 # ----------------------------
-class UserRecommendationSerializer(serializers.ModelSerializer):
+class UserRecommendationSerializer(serializers.Serializer):
+    """
+    One ranked item from the recommendation cache: {'user', 'rank', 'score', 'created_at', 'track'}.
+    created_at is when the ranking was generated.
+    """
+    user = serializers.IntegerField(read_only=True)
+    rank = serializers.IntegerField(read_only=True)
+    score = serializers.FloatField(read_only=True, allow_null=True)
+    created_at = serializers.DateTimeField(read_only=True, allow_null=True)
     track = TrackBasicSerializer(read_only=True)
 
-    class Meta:
-        model = UserRecommendation
-        fields = ['user', 'track', 'score', 'created_at']
-        read_only_fields = ['user', 'created_at']
+# ----------------------------
+# Hybrid Recommendation Item Serializer
+# ----------------------------
+class HybridRecommendationItemSerializer(serializers.Serializer):
+    """
+    One item from rank_for_user with its hydrated track: {'track_id', 'score', 'sources', 'track'}.
+    """
+    track_id = serializers.IntegerField(read_only=True)
+    score = serializers.FloatField(read_only=True)
+    sources = serializers.DictField(child=serializers.FloatField(), read_only=True)
+    track = TrackBasicSerializer(read_only=True)
@@ -0,0 +1,9 @@
+from celery import shared_task
+from playlists.utils.most_liked import rebuild_most_liked_playlist
+
+@shared_task
+def rebuild_most_liked_playlist_task():
+    """
+    Celery beat task: refresh the public most_liked playlist.
+    """
+    return rebuild_most_liked_playlist()
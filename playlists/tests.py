@@ -1,3 +1,149 @@
+from datetime import datetime, timezone as dt_timezone
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from music.models import Interaction, Track
+from playlists.models import Playlist, UserRecommendation
+from playlists.utils.most_liked import rebuild_most_liked_playlist
+from playlists.utils.recommendation_cache import (
+    RankedTracks, _pack, _unpack, get_recommendations, local_cache, store_recommendations,
+)
+from users.models import Artist, User
+
+
+def make_user(name):
+    return User.objects.create_user(username=name, email=f'{name}@example.com', password='x')
+
+
+class PlaylistTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        local_cache.clear()
+        self.addCleanup(local_cache.clear)
+        self.listener = make_user('listener')
+        self.artist = Artist.objects.create(user=make_user('artist'), display_name='Artist')
+        self.tracks = [
+            Track.objects.create(artist=self.artist, title=f'Track {n}', approval_status='approved')
+            for n in range(3)
+        ]
+
+
+class MostLikedPlaylistTests(PlaylistTestCase):
+    def test_tracks_are_listed_by_rank(self):
+        # Track 2 gets three likes, track 0 two, track 1 one
+        fans = [make_user(f'fan{n}') for n in range(3)]
+        for track, likes in zip(self.tracks, (2, 1, 3)):
+            for fan in fans[:likes]:
+                Interaction.objects.create(user=fan, track=track, interaction_type='like')
+        rebuild_most_liked_playlist()
+
+        response = APIClient().get('/api/v1/playlists/')
+        playlist_id = response.data['results'][0]['id']
+        response = APIClient().get(f'/api/v1/playlists/{playlist_id}/tracks/')
+
+        self.assertEqual(response.status_code, 200)
+        rows = response.data['results']
+        self.assertEqual([row['position'] for row in rows], [1, 2, 3])
+        self.assertEqual(
+            [row['track']['id'] for row in rows],
+            [self.tracks[2].id, self.tracks[0].id, self.tracks[1].id],
+        )
+
+    def test_public_playlist_exists_once(self):
+        Interaction.objects.create(user=self.listener, track=self.tracks[0], interaction_type='like')
+        rebuild_most_liked_playlist()
+        stats = rebuild_most_liked_playlist()
+
+        self.assertEqual((stats['added'], stats['kept']), (0, 1))
+        self.assertEqual(Playlist.objects.filter(name='most_liked', user=None).count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Playlist.objects.create(name='most_liked', user=None)
+        Playlist.objects.create(name='most_liked', user=self.listener)
+
+
+class HybridRecommendationViewTests(PlaylistTestCase):
+    def test_tracks_are_hydrated_in_one_query_and_unapproved_dropped(self):
+        self.tracks[1].approval_status = 'rejected'
+        self.tracks[1].save()
+        items = [
+            {'track_id': track.id, 'score': 1.0 - n / 10, 'sources': {'content': 1.0 - n / 10}}
+            for n, track in enumerate(self.tracks)
+        ]
+        ranking = {'items': items, 'timings_ms': {}, 'budget_ms': 50.0, 'skipped': [], 'over_budget': False}
+        client = APIClient()
+        client.force_authenticate(self.listener)
+
+        with mock.patch('playlists.views.rank_for_user', return_value=ranking), self.assertNumQueries(1):
+            response = client.get('/api/v1/hybrid-recommendations/')
+
+        self.assertEqual(response.status_code, 200)
+        rows = response.data['items']
+        self.assertEqual([row['track']['id'] for row in rows], [self.tracks[0].id, self.tracks[2].id])
+        self.assertEqual(rows[0]['track']['artist'], self.artist.id)
+        self.assertEqual(rows[0]['sources'], {'content': 1.0})
+
+
+class RecommendationCacheTests(PlaylistTestCase):
+    def store_in_database(self, tracks):
+        recommendation = UserRecommendation.objects.create(user=self.listener)
+        # Through rows are inserted in rank order
+        for track in tracks:
+            recommendation.tracks.add(track)
+
+    def test_pack_round_trip(self):
+        generated_at = datetime(2024, 5, 1, 12, 30, tzinfo=dt_timezone.utc)
+        ranked = RankedTracks([7, 3, 2 ** 40], [0.5, 0.25, -1.0], generated_at)
+        self.assertEqual(_unpack(_pack(ranked)), ranked)
+
+        unscored = RankedTracks([7, 3], [None, None], None)
+        self.assertEqual(_unpack(_pack(unscored)), unscored)
+        self.assertEqual(_unpack(_pack(RankedTracks([], [], None))), RankedTracks([], [], None))
+
+    def test_lookup_falls_back_from_local_to_shared_cache_to_database(self):
+        self.store_in_database([self.tracks[2], self.tracks[0], self.tracks[1]])
+        expected = [self.tracks[2].id, self.tracks[0].id, self.tracks[1].id]
+
+        with self.assertNumQueries(2):
+            self.assertEqual(get_recommendations(self.listener.id).track_ids, expected)
+
+        # Served from the local LRU: neither the shared cache nor the database is read
+        with self.assertNumQueries(0), mock.patch('playlists.utils.recommendation_cache.cache') as shared:
+            self.assertEqual(get_recommendations(self.listener.id).track_ids, expected)
+        shared.get.assert_not_called()
+
+        local_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_recommendations(self.listener.id).track_ids, expected)
+
+    def test_store_replaces_the_ranking_without_filling_the_local_cache(self):
+        self.store_in_database(self.tracks)
+        get_recommendations(self.listener.id)
+
+        store_recommendations({self.listener.id: [(self.tracks[1].id, 0.9), (self.tracks[0].id, 0.4)]})
+
+        self.assertIsNone(local_cache.get(f'user_recs:{self.listener.id}'))
+        ranked = get_recommendations(self.listener.id)
+        self.assertEqual(ranked.track_ids, [self.tracks[1].id, self.tracks[0].id])
+        # Scores are packed as float32
+        self.assertEqual([round(score, 6) for score in ranked.scores], [0.9, 0.4])
+
+    def test_views_keep_their_shapes_and_skip_unapproved_tracks(self):
+        store_recommendations({self.listener.id: [(track.id, 1.0) for track in reversed(self.tracks)]})
+        Track.objects.filter(pk=self.tracks[1].pk).update(approval_status='rejected')
+        client = APIClient()
+        client.force_authenticate(self.listener)
+
+        rows = client.get('/api/v1/user-recommendations/').data
+        self.assertEqual([row['track']['id'] for row in rows], [self.tracks[2].id, self.tracks[0].id])
+        self.assertEqual([row['rank'] for row in rows], [1, 3])
+        self.assertEqual(set(rows[0]), {'user', 'rank', 'score', 'created_at', 'track'})
+        self.assertEqual(rows[0]['user'], self.listener.id)
+        self.assertEqual(rows[0]['track']['artist'], self.artist.id)
 
-# Create your tests here.
+        rows = client.get('/api/v1/recommended-tracks/').data
+        self.assertEqual([row['id'] for row in rows], [self.tracks[2].id, self.tracks[0].id])
+        self.assertIn('approval_status', rows[0])
@@ -0,0 +1,102 @@
+# playlists/utils/most_liked.py
+
+import logging
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, FloatField, Sum, Value, When
+from django.utils import timezone
+from music.models import Interaction
+from playlists.models import Playlist, PlaylistTrack
+
+music_logger = logging.getLogger('music')
+
+
+def decay_weight(now, window_days, half_life_days):
+    """
+    Per-like weight that halves every `half_life_days`, as one CASE
+    expression over daily buckets: a like aged d whole days counts
+    0.5 ** (d / half_life_days). Likes older than the window count 0.
+    """
+    whens = [
+        When(created_at__gte=now - timedelta(days=day + 1), then=Value(0.5 ** (day / half_life_days)))
+        for day in range(window_days)
+    ]
+    return Case(*whens, default=Value(0.0), output_field=FloatField())
+
+
+def top_liked_tracks(size=None, window_days=None, half_life_days=None, now=None):
+    """
+    The `size` approved tracks with the highest time-decayed like score,
+    best first, from one aggregate query. Returns [(track_id, score), ...].
+    """
+    size = size or settings.MOST_LIKED_PLAYLIST_SIZE
+    window_days = window_days or settings.MOST_LIKED_WINDOW_DAYS
+    half_life_days = half_life_days or settings.MOST_LIKED_HALF_LIFE_DAYS
+    now = now or timezone.now()
+
+    rows = (
+        Interaction.objects.filter(
+            interaction_type='like',
+            created_at__gte=now - timedelta(days=window_days),
+            track__approval_status='approved',
+        )
+        .values('track_id')
+        .annotate(score=Sum(decay_weight(now, window_days, half_life_days)))
+        .order_by('-score', 'track_id')[:size]
+    )
+    return [(row['track_id'], row['score']) for row in rows]
+
+
+def rebuild_most_liked_playlist(size=None, window_days=None, half_life_days=None):
+    """
+    Brings the public most_liked playlist in line with top_liked_tracks by
+    diffing its PlaylistTrack rows: only dropped tracks are deleted, only
+    new ones inserted, and kept tracks whose rank moved get their position
+    updated. Everything happens in one transaction, so readers see either
+    the old or the new playlist.
+
+    Returns stats: added, removed, moved, kept, size, seconds.
+    """
+    started = time.perf_counter()
+    ranking = [track_id for track_id, _ in top_liked_tracks(size, window_days, half_life_days)]
+    positions = {track_id: position for position, track_id in enumerate(ranking, start=1)}
+
+    with transaction.atomic():
+        # A concurrent creator hits unique_playlist_name_per_owner; get_or_create then re-reads its row
+        playlist, _ = Playlist.objects.select_for_update().get_or_create(name='most_liked', user=None)
+
+        current = {row.track_id: row for row in PlaylistTrack.objects.filter(playlist=playlist)}
+
+        removed = [track_id for track_id in current if track_id not in positions]
+        added = [track_id for track_id in ranking if track_id not in current]
+        moved = [
+            row for track_id, row in current.items()
+            if track_id in positions and row.position != positions[track_id]
+        ]
+        for row in moved:
+            row.position = positions[row.track_id]
+
+        if removed:
+            PlaylistTrack.objects.filter(playlist=playlist, track_id__in=removed).delete()
+        PlaylistTrack.objects.bulk_update(moved, ['position'])
+        PlaylistTrack.objects.bulk_create([
+            PlaylistTrack(playlist=playlist, track_id=track_id, position=positions[track_id])
+            for track_id in added
+        ])
+
+    stats = {
+        'added': len(added),
+        'removed': len(removed),
+        'moved': len(moved),
+        'kept': len(current) - len(removed),
+        'size': len(ranking),
+        'seconds': time.perf_counter() - started,
+    }
+    music_logger.info(
+        f"most_liked playlist rebuilt in {stats['seconds']:.3f}s: {stats['size']} tracks, "
+        f"+{stats['added']} -{stats['removed']} ~{stats['moved']} moved"
+    )
+    return stats
@@ -0,0 +1,170 @@
+# playlists/utils/recommendation_cache.py
+
+import threading
+import time
+from array import array
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from playlists.models import UserRecommendation
+
+# track_ids and scores are in rank order; scores are None when only the stored order is known
+RankedTracks = namedtuple('RankedTracks', ['track_ids', 'scores', 'generated_at'])
+
+EMPTY = RankedTracks([], [], None)
+
+
+def _cache_key(user_id):
+    return f'user_recs:{user_id}'
+
+
+def _pack(ranked):
+    """
+    Compact cache value: (generated_at timestamp, int64 ids bytes, float32 scores bytes).
+    """
+    generated_at = ranked.generated_at.timestamp() if ranked.generated_at else None
+    scores = b'' if any(score is None for score in ranked.scores) else array('f', ranked.scores).tobytes()
+    return generated_at, array('q', ranked.track_ids).tobytes(), scores
+
+
+def _unpack(value):
+    generated_at, id_bytes, score_bytes = value
+    track_ids = array('q')
+    track_ids.frombytes(id_bytes)
+    if score_bytes:
+        scores = array('f')
+        scores.frombytes(score_bytes)
+        scores = scores.tolist()
+    else:
+        scores = [None] * len(track_ids)
+    return RankedTracks(
+        track_ids.tolist(),
+        scores,
+        datetime.fromtimestamp(generated_at, tz=dt_timezone.utc) if generated_at is not None else None,
+    )
+
+
+class LocalLRU:
+    """
+    Small thread-safe LRU with a per-entry TTL, kept in front of the shared
+    cache so hot users are served without a network round trip. Entries
+    written by other processes become visible once the local copy expires.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalLRU(settings.RECOMMENDATION_LRU_SIZE, settings.RECOMMENDATION_LRU_SECONDS)
+
+
+def _load_from_database(user_id):
+    """
+    Rebuilds a ranking from the stored M2M rows. Through rows are inserted
+    in rank order, so ordering by their id restores it; scores are not
+    stored there.
+    """
+    recommendation = UserRecommendation.objects.filter(user_id=user_id).values_list('id', 'updated_at').first()
+    if recommendation is None:
+        return EMPTY
+    rec_id, updated_at = recommendation
+    track_ids = list(
+        UserRecommendation.tracks.through.objects.filter(userrecommendation_id=rec_id)
+        .order_by('id')
+        .values_list('track_id', flat=True)
+    )
+    return RankedTracks(track_ids, [None] * len(track_ids), updated_at)
+
+
+def store_recommendations(rankings, generated_at=None):
+    """
+    Caches {user_id: [(track_id, score), ...]} rankings, best first, in the
+    shared cache. Call after the database write has committed (see
+    cache_on_commit).
+
+    Writers are mostly Celery workers, which never serve these users, so
+    the local LRU is only cleared of the old ranking; web processes fill
+    theirs on read.
+    """
+    if not rankings:
+        return
+    generated_at = generated_at or datetime.now(tz=dt_timezone.utc)
+    values = {}
+    for user_id, ranking in rankings.items():
+        ranked = RankedTracks(
+            [int(track_id) for track_id, _ in ranking],
+            [None if score is None else float(score) for _, score in ranking],
+            generated_at,
+        )
+        values[_cache_key(user_id)] = _pack(ranked)
+        local_cache.delete(_cache_key(user_id))
+    cache.set_many(values, timeout=settings.RECOMMENDATION_CACHE_SECONDS)
+
+
+def cache_on_commit(rankings, generated_at=None):
+    """
+    Schedules store_recommendations for when the surrounding transaction
+    commits, so readers never see a ranking the database rolled back.
+    """
+    transaction.on_commit(lambda: store_recommendations(rankings, generated_at))
+
+
+def get_recommendations(user_id):
+    """
+    The user's ranking as RankedTracks: local LRU first, then the shared
+    cache, then two indexed queries whose result is cached for next time.
+    Users with no recommendations get an empty ranking (also cached).
+    """
+    key = _cache_key(user_id)
+    ranked = local_cache.get(key)
+    if ranked is not None:
+        return ranked
+
+    value = cache.get(key)
+    if value is not None:
+        ranked = _unpack(value)
+    else:
+        ranked = _load_from_database(user_id)
+        cache.set(key, _pack(ranked), timeout=settings.RECOMMENDATION_CACHE_SECONDS)
+
+    local_cache.set(key, ranked)
+    return ranked
+
+
+def invalidate_recommendations(user_ids):
+    for user_id in user_ids:
+        local_cache.delete(_cache_key(user_id))
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
@@ -1,19 +1,26 @@
 from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import PermissionDenied
 from django_filters.rest_framework import DjangoFilterBackend
 from drf_yasg.utils import swagger_auto_schema
+from drf_yasg import openapi
 
-from playlists.models import Playlist, PlaylistTrack, Recommendation, UserRecommendation
+from playlists.models import Playlist, PlaylistTrack, Recommendation
 from playlists.serializers import (
+    HybridRecommendationItemSerializer,
     PlaylistSerializer,
     PlaylistTrackSerializer,
     RecommendationSerializer,
+    TrackBasicSerializer,
     UserRecommendationSerializer,
 )
+from music.models import Track
 from music.serializers import TrackSerializer
+from music.utils.hybrid_ranker import rank_for_user
+from playlists.utils.recommendation_cache import get_recommendations
 
 from django.db.models import Q
 
@@ -44,6 +51,23 @@ class PlaylistViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    @swagger_auto_schema(
+        operation_summary="List a playlist's tracks",
+        operation_description=(
+            "Tracks of a playlist you can see (public or your own), in playlist order: "
+            "ranked playlists such as most_liked by `position`, others newest first."
+        ),
+        responses={200: PlaylistTrackSerializer(many=True)}
+    )
+    @action(detail=True, methods=['get'])
+    def tracks(self, request, pk=None):
+        playlist = self.get_object()
+        rows = PlaylistTrack.objects.filter(playlist=playlist).select_related('track')
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(PlaylistTrackSerializer(page, many=True).data)
+        return Response(PlaylistTrackSerializer(rows, many=True).data)
+
 # ----------------------------
 # Playlist Track ViewSet
 # ----------------------------
@@ -99,13 +123,41 @@ class RecommendationViewSet(viewsets.ModelViewSet):
 # ----------------------------
 # Personalized User Recommendations View
 # ----------------------------
+def _ranked_tracks(user_id, limit=None, fields=TrackBasicSerializer.FIELDS):
+    """
+    The user's cached ranking hydrated with one in_bulk query over approved
+    tracks, loading only `fields` (None loads every column).
+    Returns a tuple: (generated_at, [{'rank', 'score', 'track'}, ...])
+    """
+    ranked = get_recommendations(user_id)
+    pairs = list(zip(ranked.track_ids, ranked.scores))[:limit]
+    tracks = Track.objects.filter(approval_status='approved')
+    if fields:
+        tracks = tracks.only(*fields)
+    tracks = tracks.in_bulk([track_id for track_id, _ in pairs])
+    items = [
+        {'rank': rank, 'score': score, 'track': tracks[track_id]}
+        for rank, (track_id, score) in enumerate(pairs, start=1)
+        if track_id in tracks
+    ]
+    return ranked.generated_at, items
+
+
 class UserRecommendationView(APIView):
     permission_classes = [IsAuthenticated]
 
-    @swagger_auto_schema(operation_summary="Get personalized recommendations for the logged-in user")
+    @swagger_auto_schema(
+        operation_summary="Get personalized recommendations for the logged-in user",
+        operation_description=(
+            "Ranked tracks served from cache, best first: "
+            "[{'user', 'rank', 'score', 'created_at', 'track'}, ...]. created_at is when the ranking was generated."
+        ),
+    )
     def get(self, request):
-        user_recommendations = UserRecommendation.objects.filter(user=request.user).select_related('track').order_by('created_at')
-        serializer = UserRecommendationSerializer(user_recommendations, many=True)
+        generated_at, items = _ranked_tracks(request.user.id)
+        for item in items:
+            item.update(user=request.user.id, created_at=generated_at)
+        serializer = UserRecommendationSerializer(items, many=True)
         return Response(serializer.data)
 
 # ----------------------------
@@ -116,7 +168,49 @@ class RecommendedTracksView(APIView):
 
     @swagger_auto_schema(operation_summary="Get 10 recommended tracks for the user")
     def get(self, request):
-        user_recommendations = UserRecommendation.objects.filter(user=request.user).select_related('track').order_by('created_at')[:10]
-        tracks = [rec.track for rec in user_recommendations]
-        serializer = TrackSerializer(tracks, many=True)
+        _, items = _ranked_tracks(request.user.id, limit=10, fields=None)
+        serializer = TrackSerializer([item['track'] for item in items], many=True)
         return Response(serializer.data)
+
+# ----------------------------
+# Hybrid Ranked Recommendations (live)
+# ----------------------------
+class HybridRecommendationView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @swagger_auto_schema(
+        operation_summary="Rank tracks for the user from content, collaborative and trending signals",
+        operation_description=(
+            "Blends content similarity, co-interaction neighbours, matrix factors and trending with the "
+            "weights in HYBRID_WEIGHTS. Each item carries its per-source contributions; the response "
+            "also reports stage timings against the latency budget and any sources skipped to meet it."
+        ),
+        manual_parameters=[
+            openapi.Parameter(
+                'limit',
+                openapi.IN_QUERY,
+                description="Number of tracks (default HYBRID_TOP_K, max 100)",
+                type=openapi.TYPE_INTEGER
+            )
+        ],
+    )
+    def get(self, request):
+        try:
+            limit = request.query_params.get('limit')
+            limit = min(max(int(limit), 1), 100) if limit else None
+        except ValueError:
+            return Response({'limit': ['A valid integer is required.']}, status=400)
+
+        ranking = rank_for_user(request.user.id, k=limit)
+        tracks = (
+            Track.objects.filter(approval_status='approved')
+            .only(*TrackBasicSerializer.FIELDS)
+            .in_bulk([item['track_id'] for item in ranking['items']])
+        )
+        items = [
+            {**item, 'track': tracks[item['track_id']]}
+            for item in ranking['items']
+            if item['track_id'] in tracks
+        ]
+        serializer = HybridRecommendationItemSerializer(items, many=True, context={'request': request})
+        return Response({**ranking, 'items': serializer.data})